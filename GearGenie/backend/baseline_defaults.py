@@ -0,0 +1,111 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+log = logging.getLogger("geargenie.defaults")
+
+
+# -------------------------------------------------------
+# PRECOMPUTED BASELINE DEFAULTS (fallback values for missing fields)
+# -------------------------------------------------------
+# Missing payload fields fall back to the column medians of
+# baseline/synthetic_hierarchical_data.csv. ML/training_RUL.py writes them to
+# MODEL_DIR/baseline_defaults.json next to the models it trains, so the ML
+# engine reads a ~1 KB JSON at startup instead of parsing the whole CSV with
+# pandas:
+#
+#   {"format_version": 1, "version": "<sha256 of the CSV, 12 chars>",
+#    "source": "synthetic_hierarchical_data.csv", "rows": 4604, "defaults": {...}}
+#
+# `python baseline_defaults.py` rebuilds the file without retraining. A
+# missing or unreadable artifact, or one with another format_version, falls
+# back to the CSV as before.
+
+FORMAT_VERSION = 1
+ARTIFACT_NAME = "baseline_defaults.json"
+
+
+def _sha256_file(path: str):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_defaults(df):
+    """{column: median} over the numeric columns, mileage_km exposed as odometer_reading."""
+    if 'mileage_km' in df.columns and 'odometer_reading' not in df.columns:
+        df = df.rename(columns={'mileage_km': 'odometer_reading'})
+    medians = df.select_dtypes(include="number").median()
+    return {str(column): float(value) for column, value in medians.items()}
+
+
+def build_artifact(df, source_path: str):
+    return {
+        "format_version": FORMAT_VERSION,
+        "version": _sha256_file(source_path)[:12],
+        "source": os.path.basename(source_path),
+        "rows": int(len(df)),
+        "defaults": compute_defaults(df)
+    }
+
+
+def write_artifact(artifact: dict, path: str):
+    """Write atomically, so a server starting mid-write never reads half a file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(artifact, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def read_artifact(path: str):
+    """The artifact dict, or None if it is missing, unreadable or another format_version."""
+    try:
+        with open(path) as f:
+            artifact = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if artifact.get("format_version") != FORMAT_VERSION or not isinstance(artifact.get("defaults"), dict):
+        log.warning("⚠ Ignoring %s: format_version %s, expected %d",
+                    path, artifact.get("format_version"), FORMAT_VERSION)
+        return None
+    return artifact
+
+
+def load_defaults(artifact_path: str, csv_path: str):
+    """(defaults dict, description) from the artifact, else computed from the CSV."""
+    artifact = read_artifact(artifact_path)
+    if artifact is not None:
+        return artifact["defaults"], {"source": artifact_path, "version": artifact["version"]}
+
+    import pandas as pd  # only needed for the fallback
+
+    log.warning("⚠ %s not found, computing defaults from %s", artifact_path, csv_path)
+    artifact = build_artifact(pd.read_csv(csv_path), csv_path)
+    try:
+        # Write it back so only the first start after a fresh checkout pays for the CSV
+        write_artifact(artifact, artifact_path)
+        log.info("✅ Wrote %s (version %s)", artifact_path, artifact["version"])
+    except OSError as e:
+        log.warning("⚠ Could not write %s: %s", artifact_path, e)
+    return artifact["defaults"], {"source": csv_path, "version": artifact["version"]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the ML engine's missing-field defaults")
+    parser.add_argument("--csv", default="baseline/synthetic_hierarchical_data.csv")
+    parser.add_argument("--output", default=os.path.join(os.getenv("MODEL_DIR", "../../saved_models"),
+                                                         ARTIFACT_NAME))
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    artifact = build_artifact(pd.read_csv(args.csv), args.csv)
+    write_artifact(artifact, args.output)
+    print(f"✅ {len(artifact['defaults'])} defaults (version {artifact['version']}) -> {args.output}")
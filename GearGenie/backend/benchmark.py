@@ -0,0 +1,239 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# -------------------------------------------------------
+# PREDICTION / PDF HOT-PATH BENCHMARKS
+# -------------------------------------------------------
+# Run from GearGenie/backend (main.py loads its CSVs and models relative to it):
+#
+#   python benchmark.py --output bench.json                  # measure
+#   python benchmark.py --output bench.json --save-baseline  # ... and store as the baseline
+#   python benchmark.py --baseline benchmark_baseline.json --threshold 0.15
+#
+# Each case reports p50/p95/p99 latency, throughput and the process peak RSS
+# seen so far. With --baseline, any compared metric that is worse than the
+# baseline by more than --threshold (a fraction) is listed and the run exits 1.
+#
+# The prediction and PDF caches are disabled unless --with-caches is given, so
+# the numbers measure the model and rendering work rather than cache hits.
+
+LABEL_COLUMNS = ("vehicle_id", "timestamp", "component", "failure_category",
+                 "RUL_Engine", "RUL_Brake", "RUL_Battery")
+SAMPLE_FILES = ("../../obd-samples.csv", "baseline/synthetic_hierarchical_data.csv")
+DEFAULT_BATCH_SIZES = (1, 10, 100, 1000, 10000)
+HIGHER_IS_WORSE = {"p50_ms", "p95_ms", "p99_ms", "mean_ms", "peak_rss_mb"}
+
+
+def load_rows(files=SAMPLE_FILES, seed: int = 0):
+    """OBD payload dicts from the sample CSVs, NaNs dropped, in a fixed shuffled order."""
+    frames = [pd.read_csv(f) for f in files if os.path.exists(f)]
+    if not frames:
+        raise FileNotFoundError(f"none of {files} found; run from GearGenie/backend")
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop(columns=[c for c in LABEL_COLUMNS if c in df.columns and c != "vehicle_id"])
+    df = df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    return [{k: v for k, v in row.items() if not pd.isna(v)} for row in df.to_dict("records")]
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(latencies_s, items: int, wall_s: float):
+    ms = np.asarray(latencies_s) * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "calls": len(ms),
+        "items": items,
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "throughput_per_s": round(items / wall_s, 2) if wall_s else 0.0,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def run_case(fn, args_list, items_per_call: int = 1, warmup: int = 3):
+    """Call fn(*args) for every args in args_list and summarize the per-call latencies."""
+    for args in args_list[:warmup]:
+        fn(*args)
+    latencies = []
+    start = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        latencies.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+    return summarize(latencies, items_per_call * len(args_list), wall)
+
+
+def cycle(rows, n: int, offset: int = 0):
+    return [rows[(offset + i) % len(rows)] for i in range(n)]
+
+
+def _ok(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+    if response.headers.get("content-type", "").startswith("application/json") and "error" in response.json():
+        raise RuntimeError(response.json()["error"])
+    return response
+
+
+def run_benchmarks(main, rows, iterations: int, batch_sizes, batch_row_budget: int, pattern=None):
+    from fastapi.testclient import TestClient
+    from pdf_renderer import render_service_pdf
+
+    results = {}
+
+    def case(name, fn, args_list, items_per_call=1):
+        if pattern and not re.search(pattern, name):
+            return
+        results[name] = run_case(fn, args_list, items_per_call)
+        r = results[name]
+        print(f"{name:<40} p50={r['p50_ms']:>9.3f}ms p95={r['p95_ms']:>9.3f}ms "
+              f"p99={r['p99_ms']:>9.3f}ms {r['throughput_per_s']:>11.1f}/s rss={r['peak_rss_mb']}MB",
+              file=sys.stderr)
+
+    sample = cycle(rows, iterations)
+
+    # ---------------- direct calls ----------------
+    for sub in main.component_features:
+        case(f"direct/predict_subsystem/{sub}", main.predict_subsystem, [(sub, r) for r in sample])
+
+    for n in batch_sizes:
+        calls = max(3, min(iterations, batch_row_budget // n))
+        case(f"direct/predict_vehicles/batch={n}", main.predict_vehicles,
+             [(cycle(rows, n, i * n),) for i in range(calls)], items_per_call=n)
+
+    results_per_row = [main.predict_vehicles([r])[0][0] for r in sample]
+    case("direct/build_batch_service_estimates", main.build_batch_service_estimates,
+         [([r],) for r in results_per_row])
+    case("direct/render_service_pdf", render_service_pdf,
+         [(main.service_rows(r),) for r in results_per_row[:max(10, iterations // 4)]])
+
+    # ---------------- in-process HTTP ----------------
+    with TestClient(main.app) as client:
+        case("http/predict", lambda r: _ok(client.post("/predict", json={"data": r})), [(r,) for r in sample])
+        case("http/service-estimate", lambda r: _ok(client.post("/service-estimate", json={"data": r})),
+             [(r,) for r in sample[:max(10, iterations // 4)]])
+        for n in batch_sizes:
+            calls = max(3, min(iterations, batch_row_budget // n))
+            case(f"http/predict/batch={n}",
+                 lambda vehicles: _ok(client.post("/predict/batch", json={"vehicles": vehicles})),
+                 [(cycle(rows, n, i * n),) for i in range(calls)], items_per_call=n)
+    return results
+
+
+def compare(current: dict, baseline: dict, threshold: float, metrics):
+    """List of regressions: (case, metric, baseline, current, relative change)."""
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for metric in metrics:
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old if metric in HIGHER_IS_WORSE else (old - new) / old
+            if change > threshold:
+                regressions.append((name, metric, old, new, round(change, 4)))
+    return regressions
+
+
+def _git_commit():
+    with contextlib.suppress(Exception):
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    return None
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ML engine's prediction and PDF hot paths")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON report path")
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also write the report to --baseline "
+                        "(default benchmark_baseline.json)")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("BENCH_THRESHOLD", "0.2")),
+                        help="allowed relative regression before failing (default 0.2 = 20%%)")
+    parser.add_argument("--compare-metrics", default="p50_ms,p95_ms,throughput_per_s")
+    parser.add_argument("--iterations", type=int, default=200, help="calls per single-payload case")
+    parser.add_argument("--batch-sizes", default=",".join(map(str, DEFAULT_BATCH_SIZES)))
+    parser.add_argument("--batch-row-budget", type=int, default=20000,
+                        help="rows scored per batch-size case (at least 3 calls each)")
+    parser.add_argument("--cases", default=None, help="regex selecting which cases run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--with-caches", action="store_true", help="keep the prediction/PDF caches enabled")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not args.with_caches:
+        os.environ["PREDICTION_CACHE_SIZE"] = "0"
+        os.environ["PDF_CACHE_SIZE"] = "0"
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import main
+
+    rows = load_rows(seed=args.seed)
+    batch_sizes = [int(n) for n in args.batch_sizes.split(",") if n]
+    models = main.model_registry.current()
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "backend": models.backend,
+            "model_version": models.version,
+            "caches": args.with_caches,
+            "rows": len(rows),
+            "iterations": args.iterations,
+            "batch_sizes": batch_sizes,
+            "seed": args.seed
+        },
+        "results": run_benchmarks(main, rows, args.iterations, batch_sizes, args.batch_row_budget, args.cases)
+    }
+    report["meta"]["peak_rss_mb"] = peak_rss_mb()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Wrote {args.output}", file=sys.stderr)
+
+    baseline_path = args.baseline or "benchmark_baseline.json"
+    if args.save_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Saved baseline {baseline_path}", file=sys.stderr)
+        return 0
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold, args.compare_metrics.split(","))
+    if regressions:
+        print(f"❌ {len(regressions)} regressions beyond {args.threshold:.0%} vs {args.baseline}:", file=sys.stderr)
+        for name, metric, old, new, change in regressions:
+            print(f"   {name} {metric}: {old} -> {new} ({change:+.1%})", file=sys.stderr)
+        return 1
+    print(f"✅ No regressions beyond {args.threshold:.0%} vs {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
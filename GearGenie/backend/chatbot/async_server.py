@@ -0,0 +1,335 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+import server as core  # prompts, retrieval, response cache and session histories
+from chat_metrics import LatencyStats
+from llm_backends import make_backend
+
+
+# -------------------------------------------------------
+# ASYNC CHATBOT SERVER (same API as server.py, port 5001)
+# -------------------------------------------------------
+# server.py runs on Flask's dev server, where each /chat holds a worker for
+# the whole Groq call. This serves the same endpoints from one event loop:
+#
+#   - Mongo retrieval (pymongo, blocking) runs on a dedicated pool of
+#     CHAT_MONGO_WORKERS threads. The MongoClient pool is sized to match, so
+#     the event loop never waits on the database
+#   - the LLM is an llm_backends backend. For groq, one AsyncGroq client and
+#     one pooled httpx.AsyncClient (CHAT_LLM_MAX_CONNECTIONS) serve every
+#     request
+#   - at most CHAT_MAX_CONCURRENCY chats are in flight. A request that can't
+#     get a slot within CHAT_QUEUE_TIMEOUT seconds gets 503
+#   - each chat must finish within CHAT_REQUEST_TIMEOUT seconds, or it
+#     gets 504 (or an `error` event when streaming)
+#
+# CHAT_LLM_BACKEND=fake answers deterministically without network access
+# (CHAT_FAKE_FIRST_TOKEN_DELAY / CHAT_FAKE_TOKEN_DELAY simulate generation).
+# Without MONGO_URI the server runs with no database records. For a
+# throughput test:
+#
+#   CHAT_LLM_BACKEND=fake CHAT_CACHE_SIZE=0 python async_server.py
+#   python ../loadgen.py --url http://127.0.0.1:5001 --mix chat=1 --rps 200
+
+CHAT_LLM_BACKEND = os.getenv("CHAT_LLM_BACKEND", "groq")
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "64"))
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "5"))
+CHAT_REQUEST_TIMEOUT = float(os.getenv("CHAT_REQUEST_TIMEOUT", "60"))
+CHAT_MONGO_WORKERS = int(os.getenv("CHAT_MONGO_WORKERS", "16"))
+CHAT_LLM_MAX_CONNECTIONS = int(os.getenv("CHAT_LLM_MAX_CONNECTIONS", "64"))
+CHAT_LLM_TIMEOUT = float(os.getenv("CHAT_LLM_TIMEOUT", "30"))
+
+app = FastAPI(title="GearGenie Chatbot")
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+llm = None
+mongo_pool = ThreadPoolExecutor(max_workers=CHAT_MONGO_WORKERS, thread_name_prefix="chat-mongo")
+chat_metrics = LatencyStats(("total_ms",))
+
+
+class ChatRequest(BaseModel):
+    message: str = ""
+    session_id: str = "default"
+
+
+class ClearRequest(BaseModel):
+    session_id: str = "default"
+
+
+# -------------------------------------------------------
+# CONCURRENCY LIMIT
+# -------------------------------------------------------
+class ServerBusy(Exception):
+    pass
+
+
+class ConcurrencyLimit:
+    """Caps in-flight chats; waiting for a slot is bounded by `queue_timeout`."""
+
+    def __init__(self, limit, queue_timeout):
+        self.limit = int(limit)
+        self.queue_timeout = float(queue_timeout)
+        self._semaphore = None  # created on first use, inside the running loop
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+
+    async def acquire(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise ServerBusy() from None
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return Slot(self)
+
+    def _release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self):
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting,
+                "rejected": self.rejected, "queue_timeout_s": self.queue_timeout}
+
+
+class Slot:
+    """One acquired slot; release() is idempotent so every exit path can call it."""
+
+    def __init__(self, limit):
+        self._limit = limit
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._limit._release()
+
+
+limiter = ConcurrencyLimit(CHAT_MAX_CONCURRENCY, CHAT_QUEUE_TIMEOUT)
+
+
+def busy_response():
+    return JSONResponse({'error': 'Server busy, please retry'}, status_code=503,
+                        headers={'Retry-After': str(max(1, int(CHAT_QUEUE_TIMEOUT)))})
+
+
+# -------------------------------------------------------
+# STARTUP / SHUTDOWN
+# -------------------------------------------------------
+def backend_options(name):
+    if name == "groq":
+        return {"api_key": os.getenv("GROQ_API_KEY"), "base_url": os.getenv("GROQ_BASE_URL"),
+                "max_connections": CHAT_LLM_MAX_CONNECTIONS, "timeout": CHAT_LLM_TIMEOUT}
+    if name == "fake":
+        return {"first_token_delay": float(os.getenv("CHAT_FAKE_FIRST_TOKEN_DELAY", "0")),
+                "token_delay": float(os.getenv("CHAT_FAKE_TOKEN_DELAY", "0"))}
+    return {}
+
+
+@app.on_event("startup")
+async def startup():
+    global llm
+    llm = make_backend(CHAT_LLM_BACKEND, **backend_options(CHAT_LLM_BACKEND))
+    print(f"✓ LLM backend: {CHAT_LLM_BACKEND}")
+
+    mongo_uri = os.getenv("MONGO_URI")
+    if mongo_uri:
+        await asyncio.get_running_loop().run_in_executor(
+            mongo_pool, lambda: core.connect_database(mongo_uri, maxPoolSize=CHAT_MONGO_WORKERS))
+    else:
+        print("⚠ MONGO_URI not set; answering without database records")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if llm is not None:
+        await llm.aclose()
+    mongo_pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def get_context(message):
+    """core.get_context_from_mongo on the Mongo thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(mongo_pool, core.get_context_from_mongo, message)
+
+
+# -------------------------------------------------------
+# ENDPOINTS
+# -------------------------------------------------------
+async def answer(user_message, session_id):
+    database_context, has_results = await get_context(user_message)
+
+    cache_scope = core.response_cache.scope(database_context, core.chat_histories[session_id])
+    response = core.response_cache.get(user_message, cache_scope)
+    cached = response is not None
+
+    if not cached:
+        messages = core.build_messages(session_id, database_context, has_results, user_message)
+        response = await llm.complete(messages, model=core.LLM_MODEL, **core.LLM_PARAMS)
+        core.cache_reply(user_message, cache_scope, database_context, response)
+
+    core.remember_turn(session_id, user_message, response)
+    return response, cached
+
+
+@app.post("/chat")
+async def chat(req: ChatRequest):
+    """Same contract as server.py's /chat."""
+    started = time.perf_counter()
+    user_message = req.message.strip()
+    if not user_message:
+        return JSONResponse({'error': 'Message is required'}, status_code=400)
+    core.chat_histories.setdefault(req.session_id, [])
+
+    try:
+        slot = await limiter.acquire()
+    except ServerBusy:
+        return busy_response()
+
+    outcome = 'errors'
+    try:
+        response, cached = await asyncio.wait_for(answer(user_message, req.session_id), CHAT_REQUEST_TIMEOUT)
+        outcome = 'completed'
+    except asyncio.TimeoutError:
+        outcome = 'timeouts'
+        return JSONResponse({'error': 'The request timed out',
+                             'details': f'no reply within {CHAT_REQUEST_TIMEOUT:g}s'}, status_code=504)
+    except Exception as e:
+        print(f"Error in chat endpoint: {str(e)}")
+        return JSONResponse({'error': 'An error occurred processing your request',
+                             'details': str(e)}, status_code=500)
+    finally:
+        slot.release()
+        # Failed and timed-out chats count towards latency too, or the tail looks better than it is
+        chat_metrics.record(outcome, total_ms=(time.perf_counter() - started) * 1000.0)
+
+    return {'response': response, 'cached': cached, 'status': 'success'}
+
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """Same event stream as server.py's /chat/stream; the timeout covers the whole reply."""
+    started = time.perf_counter()
+    deadline = started + CHAT_REQUEST_TIMEOUT
+    user_message = req.message.strip()
+    session_id = req.session_id
+    if not user_message:
+        return JSONResponse({'error': 'Message is required'}, status_code=400)
+    core.chat_histories.setdefault(session_id, [])
+
+    try:
+        slot = await limiter.acquire()
+    except ServerBusy:
+        return busy_response()
+
+    def remaining():
+        left = deadline - time.perf_counter()
+        if left <= 0:
+            raise asyncio.TimeoutError()
+        return left
+
+    async def events():
+        ttft_ms = total_ms = None
+        outcome = 'errors'
+        try:
+            database_context, has_results = await asyncio.wait_for(get_context(user_message), remaining())
+            cache_scope = core.response_cache.scope(database_context, core.chat_histories[session_id])
+            response = core.response_cache.get(user_message, cache_scope)
+            cached = response is not None
+
+            if cached:
+                ttft_ms = (time.perf_counter() - started) * 1000.0
+                yield core.sse('token', {'content': response})
+            else:
+                messages = core.build_messages(session_id, database_context, has_results, user_message)
+                stream = llm.stream(messages, model=core.LLM_MODEL, **core.LLM_PARAMS)
+                parts = []
+                try:
+                    while True:
+                        try:
+                            content = await asyncio.wait_for(stream.__anext__(), remaining())
+                        except StopAsyncIteration:
+                            break
+                        if ttft_ms is None:
+                            ttft_ms = (time.perf_counter() - started) * 1000.0
+                        parts.append(content)
+                        yield core.sse('token', {'content': content})
+                finally:
+                    await stream.aclose()
+                response = "".join(parts)
+                core.cache_reply(user_message, cache_scope, database_context, response)
+
+            # Only a completed reply becomes part of the conversation
+            core.remember_turn(session_id, user_message, response)
+            total_ms = (time.perf_counter() - started) * 1000.0
+            ttft_ms = ttft_ms if ttft_ms is not None else total_ms
+            outcome = 'completed'
+            yield core.sse('done', {'response': response, 'cached': cached,
+                                    'ttft_ms': round(ttft_ms, 1), 'total_ms': round(total_ms, 1)})
+
+        except asyncio.TimeoutError:
+            outcome = 'timeouts'
+            yield core.sse('error', {'error': 'The request timed out',
+                                     'details': f'no reply within {CHAT_REQUEST_TIMEOUT:g}s'})
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = 'disconnects'
+            raise
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            yield core.sse('error', {'error': 'An error occurred processing your request',
+                                     'details': str(e)})
+        finally:
+            slot.release()
+            if total_ms is None:
+                total_ms = (time.perf_counter() - started) * 1000.0
+            core.stream_metrics.record(outcome, ttft_ms=ttft_ms, total_ms=total_ms)
+
+    # The background task releases the slot too, in case the stream never started
+    return StreamingResponse(events(), media_type='text/event-stream', background=BackgroundTask(slot.release),
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.get("/health")
+async def health():
+    return {
+        'status': 'healthy',
+        'mode': 'async',
+        'llm': llm.stats() if llm is not None else None,
+        'mongodb_connected': core.collection is not None,
+        'concurrency': limiter.stats(),
+        'request_timeout_s': CHAT_REQUEST_TIMEOUT,
+        'retrieval': core.retriever.stats() if core.retriever is not None else None,
+        'vector_index': core.vector_index.stats() if core.vector_index is not None else None,
+        'response_cache': core.response_cache.stats(),
+        'chat': chat_metrics.stats(),
+        'streaming': core.stream_metrics.stats()
+    }
+
+
+@app.post("/clear-history")
+async def clear_history(req: ClearRequest):
+    if req.session_id in core.chat_histories:
+        core.chat_histories[req.session_id] = []
+    return {'status': 'success', 'message': 'Chat history cleared'}
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("\n" + "="*60)
+    print("    🚗 GEARGENIE ASYNC SERVER 🚗")
+    print("="*60)
+    print("\nServer starting on http://0.0.0.0:5001\n")
+    uvicorn.run(app, host='0.0.0.0', port=5001, log_level=os.getenv("LOG_LEVEL", "info").lower())
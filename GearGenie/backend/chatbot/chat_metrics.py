@@ -0,0 +1,49 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+
+# -------------------------------------------------------
+# LATENCY METRICS (GET /health)
+# -------------------------------------------------------
+# Keeps the last `window` samples of each timing (e.g. ttft_ms, total_ms).
+# Reports mean / p50 / p95 / max over those samples, plus a running counter
+# per outcome (completed, errors, timeouts, disconnects, ...). Failed requests
+# are recorded too, so the tail includes them.
+
+class LatencyStats:
+    def __init__(self, fields, window=1000):
+        self.fields = tuple(fields)
+        self._samples = {field: deque(maxlen=window) for field in self.fields}
+        self._counters = {"completed": 0}
+        self._lock = threading.Lock()
+
+    def record(self, outcome="completed", **timings):
+        """Count one request under `outcome` and keep its timings (None = not measured)."""
+        with self._lock:
+            self._counters[outcome] = self._counters.get(outcome, 0) + 1
+            for field, value in timings.items():
+                if value is not None:
+                    self._samples[field].append(float(value))
+
+    def count(self, counter, n=1):
+        with self._lock:
+            self._counters[counter] = self._counters.get(counter, 0) + n
+
+    def stats(self):
+        with self._lock:
+            report = dict(self._counters)
+            for field, samples in self._samples.items():
+                if not samples:
+                    report[field] = None
+                    continue
+                values = np.fromiter(samples, dtype=np.float64, count=len(samples))
+                report[field] = {
+                    "mean": round(float(values.mean()), 1),
+                    "p50": round(float(np.percentile(values, 50)), 1),
+                    "p95": round(float(np.percentile(values, 95)), 1),
+                    "max": round(float(values.max()), 1),
+                    "samples": len(samples)
+                }
+            return report
@@ -2,6 +2,7 @@ import os
 from pymongo import MongoClient
 from groq import Groq
 from dotenv import load_dotenv
+from retrieval import VehicleRetriever, format_context
 import sys
 
 # Load environment variables
@@ -44,45 +45,19 @@ def initialize_connections():
         print(f"ERROR: Failed to initialize connections: {e}")
         sys.exit(1)
 
-def get_context_from_mongo(collection, query):
+def get_context_from_mongo(retriever, query):
     """
-    Intelligent search across multiple fields in MongoDB.
-    Searches for: Vehicle IDs, Service Types, Customer Names, Failure Categories.
+    Indexed search of the vehicles collection (see retrieval.py).
+    Matches vehicle IDs, makes, models and failure categories exactly, then
+    the text index for the remaining words, and ranks the hits.
     """
     try:
-        # Clean and prepare query
-        clean_query = query.strip()
-        
-        # Build flexible search query
-        search_query = {"$or": [
-            {"vehicle_id": {"$regex": clean_query, "$options": "i"}},
-            {"make": {"$regex": clean_query, "$options": "i"}},
-            {"model": {"$regex": clean_query, "$options": "i"}},
-            {"service_type": {"$regex": clean_query, "$options": "i"}},
-            {"failure_category": {"$regex": clean_query, "$options": "i"}},
-            {"customer_name": {"$regex": clean_query, "$options": "i"}},
-            {"repair_justification": {"$regex": clean_query, "$options": "i"}}
-        ]}
-        
-        # Find matching documents
-        results = list(collection.find(search_query).limit(5))
+        results = retriever.search(query)
         
         if not results:
             return "No matching vehicle records found in database.", False
         
-        # Format context with all relevant information
-        context_text = "=== DATABASE RECORDS FOUND ===\n\n"
-        for idx, doc in enumerate(results, 1):
-            doc.pop('_id', None)  # Remove MongoDB internal ID
-            context_text += f"RECORD #{idx}:\n"
-            
-            # Format each field clearly
-            for key, value in doc.items():
-                formatted_key = key.replace('_', ' ').title()
-                context_text += f"  • {formatted_key}: {value}\n"
-            context_text += "\n" + "="*50 + "\n\n"
-        
-        return context_text, True
+        return format_context(results), True
         
     except Exception as e:
         return f"Database search error: {str(e)}", False
@@ -190,6 +165,7 @@ def chat():
     
     # Initialize connections
     client, collection = initialize_connections()
+    retriever = VehicleRetriever(collection)
     
     print("\n" + "="*60)
     print("System Ready! Type 'exit', 'quit', or 'stop' to end session.")
@@ -213,7 +189,7 @@ def chat():
                 break
             
             # Search database for relevant context
-            database_context, has_results = get_context_from_mongo(collection, user_input)
+            database_context, has_results = get_context_from_mongo(retriever, user_input)
             
             # Create system prompt with context
             system_prompt = create_system_prompt(database_context, has_results)
@@ -0,0 +1,113 @@
+import argparse
+import hashlib
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# -------------------------------------------------------
+# FAKE GROQ / OPENAI-COMPATIBLE LLM SERVER (local testing, no network)
+# -------------------------------------------------------
+# Serves POST /openai/v1/chat/completions (Groq's path) and
+# /v1/chat/completions with a deterministic reply built from the last user
+# message and the number of records in the system prompt. Supports both
+# plain JSON and `stream: true` (SSE chunks ending with `data: [DONE]`).
+# --first-token-delay and --token-delay simulate generation time.
+#
+#   python fake_llm_server.py --port 8089 --token-delay 0.02
+#   GROQ_BASE_URL=http://127.0.0.1:8089 GROQ_API_KEY=fake python server.py
+#   curl -N -X POST localhost:5001/chat/stream -H 'Content-Type: application/json' \
+#        -d '{"message": "how much is a brake job"}'
+
+COMPLETION_PATHS = ("/openai/v1/chat/completions", "/v1/chat/completions")
+
+
+def fake_reply(messages):
+    """Deterministic reply text: same messages in, same words out."""
+    user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+    records = system.count("RECORD #")
+    digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()[:8]
+    return (f"Thanks for asking about \"{user}\". I looked through {records} matching records "
+            f"and a typical repair like this takes around a few hours. (fake reply {digest})")
+
+
+def split_tokens(text):
+    """Word-sized pieces that join back into `text` exactly."""
+    words = text.split(" ")
+    return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    first_token_delay = 0.0
+    token_delay = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path not in COMPLETION_PATHS:
+            self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        reply = fake_reply(request.get("messages", []))
+        base = {"id": "chatcmpl-fake", "created": int(time.time()), "model": request.get("model", "fake")}
+        time.sleep(self.first_token_delay)
+
+        if not request.get("stream"):
+            time.sleep(self.token_delay * len(split_tokens(reply)))
+            self._json(200, {
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": reply}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(split_tokens(reply)),
+                          "total_tokens": len(split_tokens(reply))}
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        chunk = {**base, "object": "chat.completion.chunk"}
+        for i, token in enumerate(split_tokens(reply)):
+            if i:
+                time.sleep(self.token_delay)
+            delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+            event = {**chunk, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+        event = {**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(event)}\n\ndata: [DONE]\n\n".encode())
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def make_server(host="127.0.0.1", port=8089, first_token_delay=0.0, token_delay=0.0):
+    """A ready-to-serve fake; port=0 picks a free port (see server.server_address)."""
+    handler = type("Handler", (FakeLLMHandler,),
+                   {"first_token_delay": first_token_delay, "token_delay": token_delay})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic local stand-in for the Groq chat API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--first-token-delay", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between tokens")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.first_token_delay, args.token_delay)
+    print(f"✓ Fake LLM listening on http://{args.host}:{server.server_address[1]}")
+    server.serve_forever()
@@ -0,0 +1,113 @@
+import asyncio
+from typing import Protocol
+
+import httpx
+
+from fake_llm_server import fake_reply, split_tokens
+
+
+# -------------------------------------------------------
+# PLUGGABLE LLM BACKENDS (async_server.py, CHAT_LLM_BACKEND)
+# -------------------------------------------------------
+# Every backend answers the same two calls:
+#
+#   await backend.complete(messages, model=..., **params)  -> full reply text
+#   async for piece in backend.stream(messages, ...)       -> reply in pieces
+#
+#   groq  AsyncGroq sharing one pooled httpx.AsyncClient, so connections
+#         (and their TLS sessions) are reused across requests
+#   fake  deterministic, in-process and offline: the same reply as
+#         fake_llm_server.py, with optional simulated latency. For load
+#         tests and local development without network access
+#
+# Register new backends in BACKENDS; make_backend() picks one by name.
+
+class LLMBackend(Protocol):
+    """What async_server.py needs from a backend; GroqBackend and FakeBackend implement it."""
+    name: str
+
+    async def complete(self, messages, model=None, **params): ...
+
+    def stream(self, messages, model=None, **params): ...  # async iterator of reply pieces
+
+    async def aclose(self): ...
+
+    def stats(self): ...
+
+
+class GroqBackend:
+    name = "groq"
+
+    def __init__(self, api_key, base_url=None, max_connections=64, timeout=30.0, max_retries=2):
+        from groq import AsyncGroq
+
+        if not api_key:
+            raise ValueError("GROQ_API_KEY is required for the groq backend")
+        self.max_connections = int(max_connections)
+        self.timeout = float(timeout)
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.max_connections,
+                                max_keepalive_connections=self.max_connections),
+            timeout=self.timeout
+        )
+        self.client = AsyncGroq(api_key=api_key, base_url=base_url or None, http_client=self.http_client,
+                                timeout=self.timeout, max_retries=max_retries)
+
+    async def complete(self, messages, model=None, **params):
+        completion = await self.client.chat.completions.create(model=model, messages=messages, **params)
+        return completion.choices[0].message.content
+
+    async def stream(self, messages, model=None, **params):
+        stream = await self.client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+        try:
+            async for chunk in stream:
+                content = chunk.choices[0].delta.content if chunk.choices else None
+                if content:
+                    yield content
+        finally:
+            # Hand the connection back to the pool even when the client disconnects mid-reply
+            await stream.close()
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+    def stats(self):
+        return {"backend": self.name, "max_connections": self.max_connections, "timeout_s": self.timeout}
+
+
+class FakeBackend:
+    name = "fake"
+
+    def __init__(self, first_token_delay=0.0, token_delay=0.0):
+        self.first_token_delay = float(first_token_delay)
+        self.token_delay = float(token_delay)
+
+    async def complete(self, messages, model=None, **params):
+        reply = fake_reply(messages)
+        await asyncio.sleep(self.first_token_delay + self.token_delay * (len(split_tokens(reply)) - 1))
+        return reply
+
+    async def stream(self, messages, model=None, **params):
+        await asyncio.sleep(self.first_token_delay)
+        for i, token in enumerate(split_tokens(fake_reply(messages))):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield token
+
+    async def aclose(self):
+        pass
+
+    def stats(self):
+        return {"backend": self.name, "first_token_delay_s": self.first_token_delay,
+                "token_delay_s": self.token_delay}
+
+
+BACKENDS = {"groq": GroqBackend, "fake": FakeBackend}
+
+
+def make_backend(name, **kwargs) -> LLMBackend:
+    try:
+        backend = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown LLM backend {name!r}; choose from {sorted(BACKENDS)}") from None
+    return backend(**kwargs)
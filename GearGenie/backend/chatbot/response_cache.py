@@ -0,0 +1,161 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from retrieval import normalize
+from vector_index import HashingEmbedder
+
+
+# -------------------------------------------------------
+# LLM RESPONSE CACHE (GET /health "response_cache")
+# -------------------------------------------------------
+# Many chat turns repeat ("how much is a brake job", greetings, ...), and each
+# one is a full Groq call with a prompt of more than 1k tokens. Cached replies
+# are keyed on:
+#
+#   scope    hash of the DATABASE RECORDS block the prompt was built from,
+#            plus the last `history_turns` messages (default 8, the same
+#            history the prompt carries). A reply is only reused when the
+#            model would have seen the same records and the same
+#            conversation, so a follow-up like "what about the cost" never
+#            gets another session's answer.
+#   message  normalize(message): lower-case words, punctuation dropped, so
+#            "Brake job cost?" and "brake job cost" are the same key
+#
+# With `similarity_threshold` below 1.0 (default 1.0, exact matches only), an
+# exact-key miss compares the other messages cached under the same scope by
+# cosine similarity of their hashed n-gram embeddings (the embedder from
+# vector_index.py); the best one at or above the threshold is a hit. Stop
+# words are not embedded, so "tell me more" and "tell me more about it" score
+# 1.0; keep the threshold at 0.95 or above if enabling it. Messages made only
+# of stop words and greetings embed to zero and can only hit exactly.
+#
+# Entries expire after `ttl` seconds. Beyond `max_entries`, the least
+# recently used entry is evicted.
+
+class _Entry:
+    __slots__ = ("scope", "message", "response", "vector", "expires")
+
+    def __init__(self, scope, message, response, vector, expires):
+        self.scope = scope
+        self.message = message
+        self.response = response
+        self.vector = vector
+        self.expires = expires
+
+
+class ResponseCache:
+    def __init__(self, max_entries=512, ttl=3600.0, similarity_threshold=1.0, history_turns=8,
+                 embedder=None):
+        self.max_entries = int(max_entries)
+        self.ttl = float(ttl)
+        self.similarity_threshold = float(similarity_threshold)
+        self.history_turns = int(history_turns)
+        self.embedder = embedder or HashingEmbedder()
+        self._entries = OrderedDict()   # (scope, message) -> _Entry, least recently used first
+        self._scopes = {}               # scope -> {message, ...}
+        self._lock = threading.Lock()
+        self.counters = {"lookups": 0, "exact_hits": 0, "similar_hits": 0, "misses": 0,
+                         "stores": 0, "evictions": 0, "expirations": 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def scope(self, database_context, history=()):
+        """Hash of everything besides the message that shapes the reply."""
+        h = hashlib.blake2b(database_context.encode(), digest_size=16)
+        if self.history_turns > 0:
+            for turn in list(history)[-self.history_turns:]:
+                h.update(b"\x00" + turn["role"].encode() + b"\x00" + turn["content"].encode())
+        return h.hexdigest()
+
+    # ---------------- internals (caller holds the lock) ----------------
+    def _drop(self, key, counter):
+        entry = self._entries.pop(key)
+        messages = self._scopes[entry.scope]
+        messages.discard(entry.message)
+        if not messages:
+            del self._scopes[entry.scope]
+        self.counters[counter] += 1
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires <= now:
+            self._drop(key, "expirations")
+            return None
+        return entry
+
+    def _similar(self, scope, vector, now):
+        candidates = []
+        for message in list(self._scopes.get(scope, ())):
+            entry = self._live((scope, message), now)
+            if entry is not None and entry.vector is not None:
+                candidates.append(entry)
+        if not candidates:
+            return None, 0.0
+        scores = np.stack([entry.vector for entry in candidates]) @ vector
+        best = int(np.argmax(scores))
+        return candidates[best], float(scores[best])
+
+    # ---------------- public API ----------------
+    def get(self, message, scope):
+        """Cached reply for `message` under `scope`, or None."""
+        if not self.enabled:
+            return None
+        key = (scope, normalize(message))
+        now = time.monotonic()
+        with self._lock:
+            self.counters["lookups"] += 1
+            entry = self._live(key, now)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.counters["exact_hits"] += 1
+                return entry.response
+            if self.similarity_threshold < 1.0:
+                vector = self.embedder.embed(key[1])
+                if vector.any():
+                    entry, score = self._similar(scope, vector, now)
+                    if entry is not None and score >= self.similarity_threshold:
+                        self._entries.move_to_end((scope, entry.message))
+                        self.counters["similar_hits"] += 1
+                        return entry.response
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, message, scope, response):
+        if not self.enabled:
+            return
+        message = normalize(message)
+        vector = self.embedder.embed(message) if self.similarity_threshold < 1.0 else None
+        key = (scope, message)
+        with self._lock:
+            self._entries.pop(key, None)  # re-inserting moves it to the most recent end
+            self._entries[key] = _Entry(scope, message, response,
+                                        vector if vector is not None and vector.any() else None,
+                                        time.monotonic() + self.ttl)
+            self._scopes.setdefault(scope, set()).add(message)
+            self.counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)), "evictions")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._scopes.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["lookups"]
+            hits = self.counters["exact_hits"] + self.counters["similar_hits"]
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl,
+                "similarity_threshold": self.similarity_threshold,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+            }
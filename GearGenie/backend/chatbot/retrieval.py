@@ -0,0 +1,304 @@
+import argparse
+import csv
+import os
+import re
+import threading
+import time
+
+from pymongo import ASCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+
+# -------------------------------------------------------
+# INDEXED VEHICLE RETRIEVAL (replaces the seven-field $regex scan)
+# -------------------------------------------------------
+# The old lookup ran the raw chat message as an unanchored, case-insensitive
+# $regex against seven fields, which scans every document on every turn
+# (and lets regex metacharacters in a message blow up the scan). Instead:
+#
+#   1. The message is tokenized. Vehicle IDs (e.g. Syn_15_00000) and known
+#      makes, models and failure categories are pulled out of it. The known
+#      values come from `distinct()` on the indexed fields, plus
+#      failure_repair_costs.csv.
+#   2. Those go to exact-match indexes ({"vehicle_id": {"$in": ...}} etc.).
+#      The remaining content words go to the "vehicles_text" text index.
+#      Greetings and stop words alone never touch the database.
+#   3. Only PROMPT_FIELDS are projected. Hits are merged and ranked: exact
+#      vehicle ID > failure category > model > make, then text score and
+#      word overlap.
+#
+# `python retrieval.py build-indexes` creates the indexes (idempotent).
+# Without the text index, the exact-match lookups still work.
+
+PROMPT_FIELDS = tuple(
+    f.strip() for f in os.getenv(
+        "CHAT_CONTEXT_FIELDS",
+        "vehicle_id,make,model,service_type,failure_category,customer_name,repair_justification,"
+        "repair_hours,repair_cost_usd"
+    ).split(",") if f.strip()
+)
+EXACT_FIELDS = ("vehicle_id", "make", "model", "failure_category")
+TEXT_INDEX_NAME = "vehicles_text"
+TEXT_WEIGHTS = {
+    "failure_category": 8, "service_type": 5, "make": 4, "model": 4,
+    "vehicle_id": 4, "customer_name": 2, "repair_justification": 1
+}
+REPAIR_COSTS_CSV = os.getenv(
+    "REPAIR_COSTS_CSV",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "failure_repair_costs.csv")
+)
+
+# Bonus per kind of exact match; text score and word overlap only break ties within a kind
+MATCH_WEIGHTS = {"vehicle_id": 100.0, "failure_category": 30.0, "model": 20.0, "make": 10.0}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+VEHICLE_ID_PATTERN = re.compile(r"\b[A-Za-z]{1,5}(?:[_-]?\d+)+(?:[_-][A-Za-z0-9]+)*\b")
+STOPWORDS = frozenset("""
+a about an and any are as at be been but by can could did do does for from get got had has have hello hey hi
+how i if in is it its me much my of on or our please so some than thanks thank that the their them then there
+these they this to up us was we what when where which who why will with would you your
+""".split())
+
+
+def normalize(text):
+    """Lower-case words joined by single spaces: 'Mercedes-Benz' -> 'mercedes benz'."""
+    return " ".join(TOKEN_PATTERN.findall(str(text).lower()))
+
+
+def tokenize(text):
+    """Content words of a message, stop words and greetings removed, in order."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def extract_vehicle_ids(text):
+    """Vehicle-ID-looking tokens (letters then digits), as typed plus upper-cased."""
+    ids = []
+    for match in VEHICLE_ID_PATTERN.findall(text):
+        for candidate in (match, match.upper()):
+            if candidate not in ids:
+                ids.append(candidate)
+    return ids
+
+
+def load_repair_categories(path=REPAIR_COSTS_CSV):
+    try:
+        with open(path, newline="") as f:
+            return [row["failure_category"] for row in csv.DictReader(f) if row.get("failure_category")]
+    except (FileNotFoundError, KeyError):
+        return []
+
+
+def format_context(docs):
+    """The DATABASE RECORDS block of the system prompt (same layout as before)."""
+    context_text = "=== DATABASE RECORDS FOUND ===\n\n"
+    for idx, doc in enumerate(docs, 1):
+        context_text += f"RECORD #{idx}:\n"
+        for key in PROMPT_FIELDS:
+            if key in doc:
+                formatted_key = key.replace('_', ' ').title()
+                context_text += f"  • {formatted_key}: {doc[key]}\n"
+        context_text += "\n" + "=" * 50 + "\n\n"
+    return context_text
+
+
+class QueryTerms:
+    __slots__ = ("tokens", "vehicle_ids", "matches")
+
+    def __init__(self, tokens, vehicle_ids, matches):
+        self.tokens = tokens
+        self.vehicle_ids = vehicle_ids
+        self.matches = matches  # field -> [stored values]
+
+    def __repr__(self):
+        return f"QueryTerms(tokens={self.tokens}, vehicle_ids={self.vehicle_ids}, matches={self.matches})"
+
+
+class VehicleRetriever:
+    """Message -> ranked vehicle documents, through indexes only."""
+
+    def __init__(self, collection, limit=5, candidate_limit=50, vocabulary_ttl=300.0,
+                 repair_categories=None):
+        self.collection = collection
+        self.limit = limit
+        self.candidate_limit = candidate_limit
+        self.vocabulary_ttl = vocabulary_ttl
+        self.repair_categories = load_repair_categories() if repair_categories is None else repair_categories
+        self.projection = {field: 1 for field in PROMPT_FIELDS}
+        self._phrases = {}  # normalized phrase -> {field: {stored value, ...}}
+        self._max_phrase = 1
+        self._vocabulary_at = None
+        self._lock = threading.Lock()          # counters and the vocabulary swap
+        self._refresh_lock = threading.Lock()  # one distinct() pass at a time
+        self.text_index = True
+        self.counters = {"searches": 0, "no_terms": 0, "exact_queries": 0, "text_queries": 0, "hits": 0}
+        self.total_ms = 0.0
+
+    def _count(self, counter, n=1):
+        with self._lock:
+            self.counters[counter] += n
+
+    # ---------------- vocabulary ----------------
+    def _stale(self):
+        at = self._vocabulary_at
+        return at is None or time.monotonic() - at >= self.vocabulary_ttl
+
+    def _refresh_vocabulary(self):
+        if not self._stale():
+            return
+        # The first load blocks every caller; later refreshes run in one thread while
+        # the others keep using the current vocabulary
+        if not self._refresh_lock.acquire(blocking=self._vocabulary_at is None):
+            return
+        try:
+            if self._stale():  # not refreshed by the thread we waited for
+                self._load_vocabulary()
+        finally:
+            self._refresh_lock.release()
+
+    def _load_vocabulary(self):
+        values = {field: self.collection.distinct(field) for field in ("make", "model", "failure_category")}
+        values["failure_category"] = list(values["failure_category"]) + list(self.repair_categories)
+        phrases = {}
+        for field, stored in values.items():
+            for value in stored:
+                if not isinstance(value, str):
+                    continue
+                phrase = normalize(value)
+                if phrase and phrase not in STOPWORDS:
+                    phrases.setdefault(phrase, {}).setdefault(field, set()).add(value)
+        with self._lock:
+            self.text_index = True  # retry text search, in case the index was built since
+            self._phrases = phrases
+            self._max_phrase = max((p.count(" ") + 1 for p in phrases), default=1)
+            self._vocabulary_at = time.monotonic()
+
+    def parse(self, message):
+        """Tokens, vehicle IDs and known make / model / failure category values in a message."""
+        self._refresh_vocabulary()
+        words = TOKEN_PATTERN.findall(message.lower())
+        matches = {}
+        for n in range(min(self._max_phrase, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                for field, stored in self._phrases.get(" ".join(words[i:i + n]), {}).items():
+                    found = matches.setdefault(field, [])
+                    found.extend(v for v in sorted(stored) if v not in found)
+        return QueryTerms(tokenize(message), extract_vehicle_ids(message), matches)
+
+    # ---------------- search ----------------
+    def _exact(self, terms):
+        clauses = []
+        if terms.vehicle_ids:
+            clauses.append({"vehicle_id": {"$in": terms.vehicle_ids}})
+        for field in ("failure_category", "model", "make"):
+            if terms.matches.get(field):
+                clauses.append({field: {"$in": terms.matches[field]}})
+        if not clauses:
+            return []
+        self._count("exact_queries")
+        query = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+        return list(self.collection.find(query, self.projection).limit(self.candidate_limit))
+
+    def _text(self, terms):
+        if not self.text_index or not terms.tokens:
+            return []
+        self._count("text_queries")
+        projection = {**self.projection, "score": {"$meta": "textScore"}}
+        try:
+            cursor = self.collection.find({"$text": {"$search": " ".join(terms.tokens)}}, projection)
+            return list(cursor.sort([("score", {"$meta": "textScore"})]).limit(self.candidate_limit))
+        except OperationFailure as e:
+            # No text index yet: keep serving the exact-match lookups
+            self.text_index = False
+            print(f"⚠ Text search disabled ({e}); run `python retrieval.py build-indexes`")
+            return []
+
+    def _rank(self, terms, docs):
+        wanted = {field: set(values) for field, values in terms.matches.items()}
+        wanted["vehicle_id"] = set(terms.vehicle_ids)
+        tokens = set(terms.tokens)
+
+        def score(doc):
+            s = sum(weight for field, weight in MATCH_WEIGHTS.items() if doc.get(field) in wanted.get(field, ()))
+            s += doc.get("score", 0.0)
+            words = set(TOKEN_PATTERN.findall(" ".join(str(doc.get(f, "")) for f in PROMPT_FIELDS).lower()))
+            return s + 0.1 * len(tokens & words)
+
+        return sorted(docs, key=score, reverse=True)
+
+    def search(self, message, limit=None):
+        """Up to `limit` documents (PROMPT_FIELDS only), best match first."""
+        t0 = time.perf_counter()
+        self._count("searches")
+        terms = self.parse(message)
+        if not terms.tokens and not terms.vehicle_ids:
+            self._count("no_terms")
+            return []
+        exact = self._exact(terms)
+        # Enough exact hits (e.g. a vehicle ID's records) make the text query redundant
+        text = self._text(terms) if len(exact) < self.limit else []
+        merged = {}
+        for doc in exact + text:
+            key = doc.get("_id", id(doc))
+            if key in merged:
+                merged[key]["score"] = max(merged[key].get("score", 0.0), doc.get("score", 0.0))
+            else:
+                merged[key] = doc
+        ranked = self._rank(terms, list(merged.values()))[:limit or self.limit]
+        for doc in ranked:
+            doc.pop("_id", None)
+            doc.pop("score", None)
+        with self._lock:
+            self.counters["hits"] += bool(ranked)
+            self.total_ms += (time.perf_counter() - t0) * 1000.0
+        return ranked
+
+    def stats(self):
+        with self._lock:
+            searches = self.counters["searches"]
+            return {
+                **self.counters,
+                "text_index": self.text_index,
+                "vocabulary": len(self._phrases),
+                "mean_ms": round(self.total_ms / searches, 3) if searches else 0.0
+            }
+
+
+# -------------------------------------------------------
+# INDEX BUILDER
+# -------------------------------------------------------
+def build_indexes(collection):
+    """Create the exact-match and text indexes retrieval relies on. Safe to re-run."""
+    created = []
+    for field in EXACT_FIELDS:
+        created.append(collection.create_index([(field, ASCENDING)], name=f"{field}_1"))
+    try:
+        created.append(collection.create_index(
+            [(field, TEXT) for field in TEXT_WEIGHTS],
+            name=TEXT_INDEX_NAME, weights=TEXT_WEIGHTS, default_language="english"
+        ))
+    except OperationFailure as e:
+        # A collection has at most one text index; keep whichever already exists
+        print(f"⚠ Text index not created: {e}")
+    return created
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Indexes and test queries for chatbot retrieval")
+    parser.add_argument("command", choices=["build-indexes", "search"])
+    parser.add_argument("query", nargs="?", default="")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"))
+    parser.add_argument("--database", default="geargeniedb")
+    args = parser.parse_args()
+
+    vehicles = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)[args.database]["vehicles"]
+    if args.command == "build-indexes":
+        for name in build_indexes(vehicles):
+            print(f"✓ {name}")
+    else:
+        retriever = VehicleRetriever(vehicles)
+        print(retriever.parse(args.query))
+        print(format_context(retriever.search(args.query)))
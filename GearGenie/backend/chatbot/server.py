@@ -1,24 +1,84 @@
+import json
 import os
-from flask import Flask, request, jsonify
+import time
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from pymongo import MongoClient
 from groq import Groq
 from dotenv import load_dotenv
+from retrieval import VehicleRetriever, format_context
+from vector_index import VectorIndex, merge_hits
+from response_cache import ResponseCache
+from chat_metrics import LatencyStats
 
 # Load environment variables
 load_dotenv()
 
+# Retrieval mode: "hybrid" (keyword hits, topped up by the vector index),
+# "vector" (vector index only) or "mongo" (keyword hits only)
+CHAT_RETRIEVAL = os.getenv("CHAT_RETRIEVAL", "hybrid")
+CHAT_VECTOR_INDEX = os.getenv("CHAT_VECTOR_INDEX", "vector_index.npz")
+CHAT_VECTOR_MIN_SCORE = float(os.getenv("CHAT_VECTOR_MIN_SCORE", "0.25"))
+
+# Reply cache (see response_cache.py); CHAT_CACHE_SIZE=0 disables it
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("CHAT_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("CHAT_CACHE_TTL", "3600")),
+    similarity_threshold=float(os.getenv("CHAT_CACHE_SIMILARITY", "1.0")),
+    history_turns=int(os.getenv("CHAT_CACHE_HISTORY_TURNS", "8"))
+)
+
+# Groq completion settings shared by /chat and /chat/stream
+LLM_MODEL = "llama-3.3-70b-versatile"
+LLM_PARAMS = {"temperature": 0.7, "max_tokens": 1024, "top_p": 0.9}
+
+# /chat/stream timings: time to first token and to the end of the reply
+stream_metrics = LatencyStats(("ttft_ms", "total_ms"))
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React Native
 
 # Global variables for connections
 groq_client = None
 collection = None
+retriever = None
+vector_index = None
 chat_histories = {}  # Store chat histories per session
 
+def connect_database(mongo_uri, **client_options):
+    """
+    Connect to MongoDB and set up retrieval (keyword retriever plus the
+    optional vector index). Shared with async_server.py; `client_options`
+    go to MongoClient (e.g. maxPoolSize).
+    """
+    global collection, retriever, vector_index
+    
+    # Initialize MongoDB client
+    mongo_client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000, **client_options)
+    
+    # Test MongoDB connection
+    mongo_client.admin.command('ping')
+    print("✓ Successfully connected to MongoDB")
+    
+    db = mongo_client["geargeniedb"]
+    collection = db["vehicles"]
+    
+    # Check if collection has data
+    doc_count = collection.count_documents({})
+    print(f"✓ Found {doc_count} vehicle records in database")
+    
+    retriever = VehicleRetriever(collection)
+    
+    # Optional vector index, built offline by `python vector_index.py build`
+    if CHAT_RETRIEVAL != "mongo" and os.path.exists(CHAT_VECTOR_INDEX):
+        vector_index = VectorIndex.load(CHAT_VECTOR_INDEX)
+        print(f"✓ Loaded vector index with {len(vector_index)} documents")
+    elif CHAT_RETRIEVAL != "mongo":
+        print(f"⚠ No vector index at {CHAT_VECTOR_INDEX}; using keyword retrieval only")
+
 def initialize_connections():
     """Initialize and validate API and database connections."""
-    global groq_client, collection
+    global groq_client
     
     try:
         # Validate environment variables
@@ -30,22 +90,10 @@ def initialize_connections():
         if not mongo_uri:
             raise Exception("MONGO_URI not found in .env file")
         
-        # Initialize Groq client
-        groq_client = Groq(api_key=groq_api_key)
-        
-        # Initialize MongoDB client
-        mongo_client = MongoClient(mongo_uri, serverSelectionTimeoutMS=5000)
-        
-        # Test MongoDB connection
-        mongo_client.admin.command('ping')
-        print("✓ Successfully connected to MongoDB")
+        # Initialize Groq client (GROQ_BASE_URL points it at e.g. fake_llm_server.py)
+        groq_client = Groq(api_key=groq_api_key, base_url=os.getenv("GROQ_BASE_URL") or None)
         
-        db = mongo_client["geargeniedb"]
-        collection = db["vehicles"]
-        
-        # Check if collection has data
-        doc_count = collection.count_documents({})
-        print(f"✓ Found {doc_count} vehicle records in database")
+        connect_database(mongo_uri)
         
         return True
         
@@ -55,43 +103,25 @@ def initialize_connections():
 
 def get_context_from_mongo(query):
     """
-    Intelligent search across multiple fields in MongoDB.
-    Searches for: Vehicle IDs, Service Types, Customer Names, Failure Categories.
+    Indexed search of the vehicles collection (see retrieval.py).
+    Matches vehicle IDs, makes, models and failure categories exactly, then
+    the text index for the remaining words, and ranks the hits. When a
+    vector index is loaded, its closest records fill any remaining slots
+    (or replace the keyword hits entirely with CHAT_RETRIEVAL=vector).
     """
     try:
-        # Clean and prepare query
-        clean_query = query.strip()
-        
-        # Build flexible search query
-        search_query = {"$or": [
-            {"vehicle_id": {"$regex": clean_query, "$options": "i"}},
-            {"make": {"$regex": clean_query, "$options": "i"}},
-            {"model": {"$regex": clean_query, "$options": "i"}},
-            {"service_type": {"$regex": clean_query, "$options": "i"}},
-            {"failure_category": {"$regex": clean_query, "$options": "i"}},
-            {"customer_name": {"$regex": clean_query, "$options": "i"}},
-            {"repair_justification": {"$regex": clean_query, "$options": "i"}}
-        ]}
+        if retriever is None:
+            # No database configured (e.g. async_server.py load tests)
+            return "No matching vehicle records found in database.", False
         
-        # Find matching documents
-        results = list(collection.find(search_query).limit(5))
+        results = retriever.search(query) if CHAT_RETRIEVAL != "vector" or vector_index is None else []
+        if vector_index is not None:
+            results = merge_hits(results, vector_index, query, retriever.limit, CHAT_VECTOR_MIN_SCORE)
         
         if not results:
             return "No matching vehicle records found in database.", False
         
-        # Format context with all relevant information
-        context_text = "=== DATABASE RECORDS FOUND ===\n\n"
-        for idx, doc in enumerate(results, 1):
-            doc.pop('_id', None)  # Remove MongoDB internal ID
-            context_text += f"RECORD #{idx}:\n"
-            
-            # Format each field clearly
-            for key, value in doc.items():
-                formatted_key = key.replace('_', ' ').title()
-                context_text += f"  • {formatted_key}: {value}\n"
-            context_text += "\n" + "="*50 + "\n\n"
-        
-        return context_text, True
+        return format_context(results), True
         
     except Exception as e:
         return f"Database search error: {str(e)}", False
@@ -190,6 +220,28 @@ Remember:
     
     return prompt
 
+def build_messages(session_id, database_context, has_results, user_message):
+    """System prompt with the database context, recent history, then the new message."""
+    return [
+        {"role": "system", "content": create_system_prompt(database_context, has_results)},
+        *chat_histories[session_id][-8:],  # Keep last 8 messages for context
+        {"role": "user", "content": user_message}
+    ]
+
+def remember_turn(session_id, user_message, response):
+    """Append a finished exchange to the session history."""
+    chat_histories[session_id].append({"role": "user", "content": user_message})
+    chat_histories[session_id].append({"role": "assistant", "content": response})
+    
+    # Keep history manageable (last 10 messages)
+    if len(chat_histories[session_id]) > 10:
+        chat_histories[session_id] = chat_histories[session_id][-10:]
+
+def cache_reply(user_message, cache_scope, database_context, response):
+    # Database errors are transient; don't pin a reply built without records
+    if not database_context.startswith("Database search error"):
+        response_cache.put(user_message, cache_scope, response)
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Handle chat requests from the frontend."""
@@ -208,37 +260,28 @@ def chat():
         # Search database for relevant context
         database_context, has_results = get_context_from_mongo(user_message)
         
-        # Create system prompt with context
-        system_prompt = create_system_prompt(database_context, has_results)
-        
-        # Build messages for API
-        messages = [
-            {"role": "system", "content": system_prompt},
-            *chat_histories[session_id][-8:],  # Keep last 8 messages for context
-            {"role": "user", "content": user_message}
-        ]
+        # Same question over the same records: reuse the earlier reply
+        cache_scope = response_cache.scope(database_context, chat_histories[session_id])
+        response = response_cache.get(user_message, cache_scope)
+        cached = response is not None
         
-        # Call Groq API
-        completion = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=1024,
-            top_p=0.9
-        )
-        
-        response = completion.choices[0].message.content
+        if not cached:
+            # Call Groq API
+            completion = groq_client.chat.completions.create(
+                model=LLM_MODEL,
+                messages=build_messages(session_id, database_context, has_results, user_message),
+                **LLM_PARAMS
+            )
+            
+            response = completion.choices[0].message.content
+            cache_reply(user_message, cache_scope, database_context, response)
         
         # Update chat history
-        chat_histories[session_id].append({"role": "user", "content": user_message})
-        chat_histories[session_id].append({"role": "assistant", "content": response})
-        
-        # Keep history manageable (last 10 messages)
-        if len(chat_histories[session_id]) > 10:
-            chat_histories[session_id] = chat_histories[session_id][-10:]
+        remember_turn(session_id, user_message, response)
         
         return jsonify({
             'response': response,
+            'cached': cached,
             'status': 'success'
         })
     
@@ -249,13 +292,104 @@ def chat():
             'details': str(e)
         }), 500
 
+def sse(event, payload):
+    """One server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Same request as /chat, but the reply arrives as server-sent events while
+    Groq generates it:
+        event: token   data: {"content": "<next piece of text>"}
+        event: done    data: {"response", "cached", "ttft_ms", "total_ms"}
+        event: error   data: {"error", "details"}
+    History and the response cache are updated only once the stream has
+    completed; a client that disconnects mid-reply leaves both untouched.
+    """
+    started = time.perf_counter()
+    data = request.json or {}
+    user_message = data.get('message', '').strip()
+    session_id = data.get('session_id', 'default')
+    
+    if not user_message:
+        return jsonify({'error': 'Message is required'}), 400
+    
+    if session_id not in chat_histories:
+        chat_histories[session_id] = []
+    
+    def generate():
+        ttft_ms = total_ms = None
+        outcome = 'errors'
+        try:
+            database_context, has_results = get_context_from_mongo(user_message)
+            cache_scope = response_cache.scope(database_context, chat_histories[session_id])
+            response = response_cache.get(user_message, cache_scope)
+            cached = response is not None
+            
+            if cached:
+                ttft_ms = (time.perf_counter() - started) * 1000.0
+                yield sse('token', {'content': response})
+            else:
+                stream = groq_client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=build_messages(session_id, database_context, has_results, user_message),
+                    stream=True,
+                    **LLM_PARAMS
+                )
+                parts = []
+                for chunk in stream:
+                    content = chunk.choices[0].delta.content if chunk.choices else None
+                    if not content:
+                        continue
+                    if ttft_ms is None:
+                        ttft_ms = (time.perf_counter() - started) * 1000.0
+                    parts.append(content)
+                    yield sse('token', {'content': content})
+                response = "".join(parts)
+                cache_reply(user_message, cache_scope, database_context, response)
+            
+            # Only a completed reply becomes part of the conversation
+            remember_turn(session_id, user_message, response)
+            total_ms = (time.perf_counter() - started) * 1000.0
+            ttft_ms = ttft_ms if ttft_ms is not None else total_ms
+            outcome = 'completed'
+            yield sse('done', {
+                'response': response,
+                'cached': cached,
+                'ttft_ms': round(ttft_ms, 1),
+                'total_ms': round(total_ms, 1)
+            })
+        
+        except GeneratorExit:
+            outcome = 'disconnects'
+            raise
+        except Exception as e:
+            print(f"Error in chat stream: {str(e)}")
+            yield sse('error', {
+                'error': 'An error occurred processing your request',
+                'details': str(e)
+            })
+        finally:
+            # Failed and abandoned replies count towards latency too
+            if total_ms is None:
+                total_ms = (time.perf_counter() - started) * 1000.0
+            stream_metrics.record(outcome, ttft_ms=ttft_ms, total_ms=total_ms)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint."""
     return jsonify({
         'status': 'healthy',
         'groq_connected': groq_client is not None,
-        'mongodb_connected': collection is not None
+        'mongodb_connected': collection is not None,
+        'retrieval': retriever.stats() if retriever is not None else None,
+        'vector_index': vector_index.stats() if vector_index is not None else None,
+        'response_cache': response_cache.stats(),
+        'streaming': stream_metrics.stats()
     })
 
 @app.route('/clear-history', methods=['POST'])
@@ -0,0 +1,431 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+
+import numpy as np
+
+from retrieval import PROMPT_FIELDS, REPAIR_COSTS_CSV, TOKEN_PATTERN, STOPWORDS
+
+
+# -------------------------------------------------------
+# LOCAL VECTOR-SIMILARITY INDEX (no network, NumPy only)
+# -------------------------------------------------------
+# Keyword retrieval misses paraphrases, e.g. "my car won't start in the cold"
+# vs a record that says "CCA less than limit". This index embeds every
+# `vehicles` record and every failure_repair_costs.csv category. For
+# categories it also embeds a short symptom description (CATEGORY_SYMPTOMS),
+# which is what links everyday wording to the category name.
+#
+#   HashingEmbedder  character 3-5-grams and word uni/bigrams, hashed into
+#                    `dim` signed buckets, sublinear tf, L2-normalized
+#   VectorIndex      float32 row matrix. Top-k is one matmul plus
+#                    argpartition. With ivf_lists > 0 the rows are clustered
+#                    by spherical k-means, and queries scan only the
+#                    `n_probe` closest clusters
+#
+# Updates are incremental. upsert() re-embeds a single document, writing over
+# its row or reusing a freed one; remove() frees a row. New rows join their
+# nearest cluster. `sync()` re-embeds only the documents whose text hash
+# changed. `python vector_index.py watch` applies a Mongo change stream as
+# events arrive (needs a replica set). It saves on exit, and the saved file
+# keeps the stream's resume token, so the next `watch` starts where it stopped
+# (`build` starts over, e.g. once the token has aged out of the oplog). With
+# no index file yet, `watch` first syncs every record.
+#
+#   python vector_index.py build  --output vector_index.npz
+#   python vector_index.py sync   --output vector_index.npz
+#   python vector_index.py search "my car won't start in the cold"
+
+FORMAT_VERSION = 1
+VEHICLE, REPAIR = "vehicle", "repair"
+KINDS = (VEHICLE, REPAIR)
+
+CATEGORY_SYMPTOMS = {
+    "CCA less than limit": "battery cold cranking amps low, car won't start in the cold, slow crank on winter mornings, weak battery",
+    "Low on Charge": "battery low charge, dead battery, car won't start, needs a jump start, dim lights, alternator not charging",
+    "ABS sensor failure": "abs warning light on, anti-lock brake sensor fault, wheel speed sensor, abs light",
+    "Brakes worn out": "brake job, brake pads worn, squealing or grinding brakes, longer stopping distance, brake pad replacement",
+    "Catalytic Converter Failure": "check engine light, rotten egg smell, exhaust restriction, failed emissions test, loss of power",
+    "Coolant Leak": "engine overheating, temperature gauge high, coolant puddle under car, sweet smell, steam from hood",
+    "Engine Oil Replacement": "oil change, oil service, low oil pressure warning, dirty engine oil, routine maintenance",
+    "Fuel Injector Failure": "rough idle, engine misfire, poor fuel economy, hesitation when accelerating, fuel injector clogged",
+    "Fuel Pump Failure": "engine cranks but won't start, sputtering at high speed, losing power, fuel pressure low, stalling",
+    "Ignition Coil Failure": "engine misfire, check engine light flashing, rough running, hard starting, ignition coil",
+    "Mass Airflow Sensor Failure": "maf sensor, hesitation, stalling after start, poor acceleration, lean running, check engine light",
+    "Oxygen Sensor Failure": "o2 sensor, bad gas mileage, check engine light, failed emissions, rough idle",
+    "Spark Plug Failure": "spark plugs, misfire, hard starting, rough idle, poor acceleration, tune up",
+    "Timing Chain Failure": "rattling noise at startup, timing chain stretched, engine won't run, check engine light, timing belt",
+    "Transmission Failure": "gearbox problems, slipping gears, delayed or harsh shifting, transmission fluid leak, won't go into gear",
+}
+
+
+def _text_hash(text):
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+class HashingEmbedder:
+    """Text -> L2-normalized float32 vector. Deterministic across processes (crc32, not hash())."""
+
+    def __init__(self, dim=512, char_ngrams=(3, 5), word_ngrams=2):
+        self.dim = int(dim)
+        self.char_ngrams = tuple(char_ngrams)
+        self.word_ngrams = int(word_ngrams)
+
+    def config(self):
+        return {"dim": self.dim, "char_ngrams": list(self.char_ngrams), "word_ngrams": self.word_ngrams}
+
+    def features(self, text):
+        words = [w for w in TOKEN_PATTERN.findall(str(text).lower()) if w not in STOPWORDS]
+        grams = []
+        for n in range(1, self.word_ngrams + 1):
+            grams += ["w:" + " ".join(words[i:i + n]) for i in range(len(words) - n + 1)]
+        lo, hi = self.char_ngrams
+        for word in words:
+            padded = f"<{word}>"
+            for n in range(lo, hi + 1):
+                grams += [padded[i:i + n] for i in range(len(padded) - n + 1)]
+        return grams
+
+    def embed(self, text):
+        counts = {}
+        for gram in self.features(text):
+            h = zlib.crc32(gram.encode())
+            bucket = (h >> 1) % self.dim
+            counts[bucket] = counts.get(bucket, 0.0) + (1.0 if h & 1 else -1.0)
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if counts:
+            buckets = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            vector[buckets] = np.sign(values) * np.log1p(np.abs(values))
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector /= norm
+        return vector
+
+
+def vehicle_document(doc):
+    """(id, text, payload) for a vehicles record; payload is what the prompt prints."""
+    payload = {f: doc[f] for f in PROMPT_FIELDS if f in doc and doc[f] is not None}
+    text = " ".join(str(v) for v in payload.values())
+    return f"{VEHICLE}:{doc['_id']}", text, payload
+
+
+def repair_documents(path=REPAIR_COSTS_CSV):
+    import csv
+
+    documents = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            category = row["failure_category"]
+            payload = {"failure_category": category,
+                       "repair_hours": float(row["repair_hours"]),
+                       "repair_cost_usd": float(row["repair_cost_usd"])}
+            text = f"{category}. {CATEGORY_SYMPTOMS.get(category, '')}"
+            documents.append((f"{REPAIR}:{category}", text, payload))
+    return documents
+
+
+class VectorIndex:
+    def __init__(self, embedder=None, ivf_lists=0, n_probe=4, ivf_min_rows=2048):
+        self.embedder = embedder or HashingEmbedder()
+        self.ivf_lists = int(ivf_lists)
+        self.n_probe = int(n_probe)
+        self.ivf_min_rows = int(ivf_min_rows)
+        self._matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._kinds = np.zeros(0, dtype=np.int8)
+        self._ids = []            # row -> document id (None when free)
+        self._payloads = []       # row -> payload
+        self._hashes = []         # row -> text hash
+        self._rows = {}           # document id -> row
+        self._free = []
+        self._centroids = None    # (ivf_lists, dim) when clustered
+        self._assign = np.zeros(0, dtype=np.int32)
+        self.resume_token = None  # change-stream position the rows are current up to
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    # ---------------- updates ----------------
+    def _grow(self):
+        capacity = max(64, 2 * len(self._ids))
+        pad = capacity - len(self._ids)
+        self._matrix = np.vstack([self._matrix, np.zeros((pad, self.embedder.dim), dtype=np.float32)])
+        self._alive = np.concatenate([self._alive, np.zeros(pad, dtype=bool)])
+        self._kinds = np.concatenate([self._kinds, np.zeros(pad, dtype=np.int8)])
+        self._assign = np.concatenate([self._assign, np.full(pad, -1, dtype=np.int32)])
+        self._free.extend(range(capacity - 1, len(self._ids) - 1, -1))
+        self._ids += [None] * pad
+        self._payloads += [None] * pad
+        self._hashes += [None] * pad
+
+    def upsert(self, doc_id, text, payload, kind=VEHICLE):
+        """Embed and store one document. Returns False if its text is unchanged (nothing re-embedded)."""
+        text_hash = _text_hash(text)
+        with self._lock:
+            row = self._rows.get(doc_id)
+            if row is not None and self._hashes[row] == text_hash:
+                self._payloads[row] = payload
+                return False
+        vector = self.embedder.embed(text)
+        with self._lock:
+            row = self._rows.get(doc_id)
+            if row is None:
+                if not self._free:
+                    self._grow()
+                row = self._free.pop()
+                self._rows[doc_id] = row
+            self._matrix[row] = vector
+            self._alive[row] = True
+            self._kinds[row] = KINDS.index(kind)
+            self._ids[row] = doc_id
+            self._payloads[row] = payload
+            self._hashes[row] = text_hash
+            if self._centroids is not None:
+                self._assign[row] = int(np.argmax(self._centroids @ vector))
+        return True
+
+    def remove(self, doc_id):
+        with self._lock:
+            row = self._rows.pop(doc_id, None)
+            if row is None:
+                return False
+            self._matrix[row] = 0.0
+            self._alive[row] = False
+            self._assign[row] = -1
+            self._ids[row] = self._payloads[row] = self._hashes[row] = None
+            self._free.append(row)
+            return True
+
+    def sync(self, documents, kind=VEHICLE):
+        """Make the `kind` rows equal `documents` [(id, text, payload)]: only changed texts are re-embedded."""
+        seen, embedded = set(), 0
+        for doc_id, text, payload in documents:
+            seen.add(doc_id)
+            embedded += self.upsert(doc_id, text, payload, kind)
+        with self._lock:
+            stale = [d for d, row in self._rows.items() if self._kinds[row] == KINDS.index(kind) and d not in seen]
+        for doc_id in stale:
+            self.remove(doc_id)
+        return {"documents": len(seen), "embedded": embedded, "removed": len(stale)}
+
+    # ---------------- IVF partitioning ----------------
+    def build_ivf(self, n_lists=None, iterations=10, seed=0):
+        """Spherical k-means over the live rows; later upserts join their nearest list."""
+        n_lists = int(n_lists or self.ivf_lists)
+        with self._lock:
+            rows = np.flatnonzero(self._alive)
+            if n_lists <= 1 or len(rows) < n_lists:
+                self._centroids = None
+                return False
+            X = self._matrix[rows]
+            rng = np.random.default_rng(seed)
+            centroids = X[rng.choice(len(rows), n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                assign = np.argmax(X @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, X)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                empty = norms[:, 0] == 0
+                centroids = np.where(empty[:, None], centroids, sums / np.where(norms == 0, 1, norms))
+            self._centroids = centroids.astype(np.float32)
+            self._assign[:] = -1
+            self._assign[rows] = np.argmax(X @ self._centroids.T, axis=1)
+            self.ivf_lists = n_lists
+            return True
+
+    # ---------------- search ----------------
+    def search(self, query, k=5, kind=None, min_score=0.0, n_probe=None):
+        """[(score, id, payload)] best first; cosine similarity since every row is unit length."""
+        q = self.embedder.embed(query)
+        if not q.any():
+            return []
+        with self._lock:
+            mask = self._alive.copy()
+            if kind is not None:
+                mask &= self._kinds == KINDS.index(kind)
+            if self._centroids is not None and len(self._rows) >= self.ivf_min_rows:
+                probe = np.argsort(self._centroids @ q)[::-1][:n_probe or self.n_probe]
+                rows = np.flatnonzero(mask & np.isin(self._assign, probe))
+                scores = self._matrix[rows] @ q
+            else:
+                # One matvec over the whole matrix beats gathering the selected rows first
+                rows = np.flatnonzero(mask)
+                scores = (self._matrix @ q)[rows]
+            if not len(rows):
+                return []
+            top = min(k, len(rows))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            return [(float(scores[i]), self._ids[rows[i]], self._payloads[rows[i]])
+                    for i in best if scores[i] >= min_score]
+
+    # ---------------- persistence ----------------
+    def save(self, path):
+        with self._lock:
+            rows = np.flatnonzero(self._alive)
+            meta = {
+                "format_version": FORMAT_VERSION,
+                "embedder": self.embedder.config(),
+                "ivf_lists": self.ivf_lists if self._centroids is not None else 0,
+                "ids": [self._ids[r] for r in rows],
+                "payloads": [self._payloads[r] for r in rows],
+                "hashes": [self._hashes[r] for r in rows],
+                "resume_token": self.resume_token
+            }
+            arrays = {"matrix": self._matrix[rows].astype(np.float16), "kinds": self._kinds[rows],
+                      "meta": np.frombuffer(json.dumps(meta, default=str).encode(), dtype=np.uint8)}
+            if self._centroids is not None:
+                arrays["centroids"] = self._centroids
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".npz")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode())
+            if meta.get("format_version") != FORMAT_VERSION:
+                raise ValueError(f"{path}: format_version {meta.get('format_version')}, expected {FORMAT_VERSION}")
+            config = meta["embedder"]
+            index = cls(HashingEmbedder(config["dim"], config["char_ngrams"], config["word_ngrams"]),
+                        ivf_lists=meta["ivf_lists"], **kwargs)
+            n = len(meta["ids"])
+            index._matrix = data["matrix"].astype(np.float32)
+            index._kinds = data["kinds"].astype(np.int8)
+            index._alive = np.ones(n, dtype=bool)
+            index._assign = np.full(n, -1, dtype=np.int32)
+            if "centroids" in data:
+                index._centroids = data["centroids"].astype(np.float32)
+                index._assign = np.argmax(index._matrix @ index._centroids.T, axis=1).astype(np.int32)
+        index._ids = list(meta["ids"])
+        index._payloads = list(meta["payloads"])
+        index._hashes = list(meta["hashes"])
+        index._rows = {doc_id: row for row, doc_id in enumerate(index._ids)}
+        index.resume_token = meta.get("resume_token")
+        return index
+
+    def stats(self):
+        with self._lock:
+            return {
+                "documents": len(self._rows),
+                "vehicles": int((self._alive & (self._kinds == KINDS.index(VEHICLE))).sum()),
+                "repairs": int((self._alive & (self._kinds == KINDS.index(REPAIR))).sum()),
+                "dim": self.embedder.dim,
+                "ivf_lists": self.ivf_lists if self._centroids is not None else 0,
+                "matrix_mb": round(self._matrix.nbytes / 1e6, 2)
+            }
+
+
+# -------------------------------------------------------
+# CHAT CONTEXT (vector hits alongside the Mongo search)
+# -------------------------------------------------------
+def merge_hits(docs, index, message, limit=5, min_score=0.25):
+    """Keyword hits first, then the closest vector hits not already present, up to `limit`."""
+    seen = {doc.get("vehicle_id") for doc in docs if doc.get("vehicle_id")}
+    merged = list(docs)
+    for _, _, payload in index.search(message, k=limit * 2, min_score=min_score):
+        if len(merged) >= limit:
+            break
+        key = payload.get("vehicle_id")
+        if key is not None and key in seen:
+            continue
+        if key is not None:
+            seen.add(key)
+        merged.append(dict(payload))
+    return merged
+
+
+def sync_from_sources(index, collection=None, repair_csv=REPAIR_COSTS_CSV):
+    report = {REPAIR: index.sync(repair_documents(repair_csv), REPAIR)}
+    if collection is not None:
+        projection = {f: 1 for f in PROMPT_FIELDS}
+        report[VEHICLE] = index.sync((vehicle_document(d) for d in collection.find({}, projection)), VEHICLE)
+    if index.ivf_lists and len(index) >= index.ivf_min_rows:
+        index.build_ivf()
+    return report
+
+
+def watch_changes(index, collection, path, save_every=100):
+    """Apply a Mongo change stream, resuming after `index.resume_token`; saves every `save_every` changes and on exit."""
+    projection = {f: 1 for f in PROMPT_FIELDS}
+    changes = 0
+    try:
+        with collection.watch(full_document="updateLookup", resume_after=index.resume_token) as stream:
+            for event in stream:
+                doc_id = event["documentKey"]["_id"]
+                if event["operationType"] == "delete" or event.get("fullDocument") is None:
+                    index.remove(f"{VEHICLE}:{doc_id}")
+                else:
+                    doc = {k: v for k, v in event["fullDocument"].items() if k in projection or k == "_id"}
+                    index.upsert(*vehicle_document(doc), kind=VEHICLE)
+                index.resume_token = stream.resume_token
+                changes += 1
+                if changes % save_every == 0:
+                    index.save(path)
+                    print(f"✓ Saved {path} after {changes} changes")
+    finally:
+        if changes % save_every:
+            index.save(path)
+            print(f"✓ Saved {path} after {changes} changes")
+
+
+def seed_for_watch(index, collection, path):
+    """Full sync of a new index for `watch`; the resume token is taken first, so changes during the scan replay."""
+    with collection.watch(full_document="updateLookup") as stream:
+        index.resume_token = stream.resume_token
+    report = sync_from_sources(index, collection)
+    index.save(path)
+    return report
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Offline vector index over vehicles + repair categories")
+    parser.add_argument("command", choices=["build", "sync", "watch", "search"])
+    parser.add_argument("query", nargs="?", default="")
+    parser.add_argument("--output", default=os.getenv("CHAT_VECTOR_INDEX", "vector_index.npz"))
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI"))
+    parser.add_argument("--database", default="geargeniedb")
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--ivf-lists", type=int, default=0, help="k-means partitions (0 = brute force only)")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+    if args.command == "watch" and not args.mongo_uri:
+        parser.error("watch needs a Mongo replica set: pass --mongo-uri or set MONGO_URI")
+
+    if args.command == "search":
+        index = VectorIndex.load(args.output)
+        for score, doc_id, payload in index.search(args.query, args.k):
+            print(f"{score:.3f}  {doc_id}  {payload}")
+    else:
+        collection = None
+        if args.mongo_uri:
+            from pymongo import MongoClient
+            collection = MongoClient(args.mongo_uri, serverSelectionTimeoutMS=5000)[args.database]["vehicles"]
+        created = args.command == "build" or not os.path.exists(args.output)
+        if created:
+            index = VectorIndex(HashingEmbedder(args.dim), ivf_lists=args.ivf_lists)
+        else:
+            index = VectorIndex.load(args.output)
+        if args.command == "watch":
+            if created:
+                report = seed_for_watch(index, collection, args.output)
+                print(f"✓ {report} -> {args.output} ({index.stats()})")
+            try:
+                watch_changes(index, collection, args.output)
+            except KeyboardInterrupt:
+                pass
+        else:
+            report = sync_from_sources(index, collection)
+            index.save(args.output)
+            print(f"✓ {report} -> {args.output} ({index.stats()})")
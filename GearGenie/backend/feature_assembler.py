@@ -0,0 +1,72 @@
+import threading
+import numpy as np
+
+
+# -------------------------------------------------------
+# FEATURE ASSEMBLY WITHOUT PANDAS
+# -------------------------------------------------------
+# Built once at startup from component_features and the baseline medians.
+# Missing (None / absent) fields take the per-subsystem default; a value that
+# float() rejects marks the row invalid, which callers treat exactly like the
+# old DataFrame path did when sklearn failed to convert it.
+
+class FeatureAssembler:
+    def __init__(self, component_features: dict, defaults):
+        self.features = {sub: list(features) for sub, features in component_features.items()}
+        self.column_index = {
+            sub: {name: j for j, name in enumerate(features)}
+            for sub, features in self.features.items()
+        }
+        self.default_vectors = {}
+        for sub, features in self.features.items():
+            vector = np.empty(len(features), dtype=np.float64)
+            for j, f in enumerate(features):
+                default_key = 'mileage_km' if f == 'odometer_reading' and 'mileage_km' in defaults else f
+                vector[j] = float(defaults.get(default_key, 0.0))
+            vector.setflags(write=False)
+            self.default_vectors[sub] = vector
+        self._local = threading.local()
+
+    def _buffer(self, sub: str):
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None:
+            buffers = self._local.buffers = {
+                s: np.empty((1, len(f)), dtype=np.float64) for s, f in self.features.items()
+            }
+        return buffers[sub]
+
+    def _fill(self, sub: str, sample: dict, row):
+        """Returns (valid, number of fields taken from the defaults)."""
+        row[:] = self.default_vectors[sub]
+        valid = True
+        defaulted = 0
+        for j, f in enumerate(self.features[sub]):
+            value = sample.get(f, None)
+            if value is None:
+                defaulted += 1
+                continue
+            try:
+                row[j] = float(value)
+            except (TypeError, ValueError):
+                valid = False
+        return valid, defaulted
+
+    def assemble(self, sub: str, sample: dict):
+        """Fill this thread's (1, n_features) buffer for one payload -> (X, valid, defaulted).
+
+        The buffer is reused by the next call on the same thread, so copy it
+        if it has to outlive the current prediction.
+        """
+        X = self._buffer(sub)
+        valid, defaulted = self._fill(sub, sample, X[0])
+        return X, valid, defaulted
+
+    def assemble_batch(self, sub: str, samples: list):
+        """(X, valid mask, total defaulted fields) for many payloads."""
+        X = np.empty((len(samples), len(self.features[sub])), dtype=np.float64)
+        valid = np.ones(len(samples), dtype=bool)
+        defaulted = 0
+        for i, sample in enumerate(samples):
+            valid[i], n = self._fill(sub, sample, X[i])
+            defaulted += n
+        return X, valid, defaulted
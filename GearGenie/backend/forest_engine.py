@@ -0,0 +1,257 @@
+import numpy as np
+
+
+# -------------------------------------------------------
+# ARRAY-COMPILED RANDOM FOREST
+# -------------------------------------------------------
+# Every tree of a fitted sklearn forest is copied into one set of contiguous
+# node arrays. Leaves point at themselves, so a fixed number of
+# "follow the split" steps (the deepest tree's depth) lands every
+# (row, tree) pair on its leaf without any per-tree Python dispatch.
+
+ARRAY_FIELDS = ("roots", "feature", "threshold", "left", "right", "nan_left", "value")
+
+
+class CompiledForest:
+    def __init__(self, arrays: dict, n_features: int, max_depth: int, classes=None, class_names=None,
+                 feature_names=None):
+        self.roots = arrays["roots"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.nan_left = arrays["nan_left"]
+        self.value = arrays["value"]
+        self.n_trees = len(self.roots)
+        self.n_features = int(n_features)
+        self.max_depth = int(max_depth)
+        self.has_nan_routing = bool(self.nan_left.any())
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+        self.is_classifier = classes is not None
+        self.classes = np.asarray(classes) if self.is_classifier else None
+        # Decoded label per forest class, so no LabelEncoder.inverse_transform at request time
+        self.class_names = np.asarray(class_names, dtype=object) if class_names is not None else None
+
+        # Tree-path decomposition (explain): the change in node value taken by
+        # each branch, credited to the split feature. Leaves point at
+        # themselves, so their deltas are 0.
+        if not self.is_classifier:
+            self.delta_left = self.value[self.left] - self.value
+            self.delta_right = self.value[self.right] - self.value
+            self.bias = float(self.value[self.roots].mean())
+
+    @classmethod
+    def from_forest(cls, forest, class_names=None):
+        if getattr(forest, "n_outputs_", 1) != 1:
+            raise ValueError("Only single-output forests can be compiled")
+
+        trees = [est.tree_ for est in forest.estimators_]
+        is_classifier = hasattr(forest, "classes_")
+        offsets = np.cumsum([0] + [t.node_count for t in trees[:-1]])
+
+        feature, threshold, left, right, nan_left, value = [], [], [], [], [], []
+        for offset, t in zip(offsets, trees):
+            leaf = t.children_left == -1
+            own = np.arange(t.node_count) + offset
+            feature.append(np.where(leaf, 0, t.feature))
+            threshold.append(np.where(leaf, 0.0, t.threshold))
+            left.append(np.where(leaf, own, t.children_left + offset))
+            right.append(np.where(leaf, own, t.children_right + offset))
+            missing_left = getattr(t, "missing_go_to_left", None)
+            nan_left.append(np.zeros(t.node_count, dtype=bool) if missing_left is None else missing_left.astype(bool))
+
+            v = t.value[:, 0, :]
+            if is_classifier:
+                # Same normalisation as DecisionTreeClassifier.predict_proba
+                totals = v.sum(axis=1, keepdims=True)
+                totals[totals == 0] = 1.0
+                value.append(v / totals)
+            else:
+                value.append(v[:, 0])
+
+        arrays = {
+            "roots": offsets.astype(np.intp),
+            "feature": np.ascontiguousarray(np.concatenate(feature), dtype=np.intp),
+            "threshold": np.ascontiguousarray(np.concatenate(threshold), dtype=np.float64),
+            "left": np.ascontiguousarray(np.concatenate(left), dtype=np.intp),
+            "right": np.ascontiguousarray(np.concatenate(right), dtype=np.intp),
+            "nan_left": np.ascontiguousarray(np.concatenate(nan_left)),
+            "value": np.ascontiguousarray(np.concatenate(value), dtype=np.float64),
+        }
+        classes = np.asarray(forest.classes_) if is_classifier else None
+        if classes is not None and class_names is not None:
+            class_names = np.asarray(class_names, dtype=object)[classes.astype(int)]
+        else:
+            class_names = None
+        return cls(
+            arrays,
+            n_features=forest.n_features_in_,
+            max_depth=max(int(t.max_depth) for t in trees),
+            classes=classes,
+            class_names=class_names,
+            feature_names=getattr(forest, "feature_names_in_", None),
+        )
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in ARRAY_FIELDS}
+
+    def metadata(self):
+        return {
+            "n_trees": self.n_trees,
+            "n_features": self.n_features,
+            "max_depth": self.max_depth,
+            "classes": self.classes.tolist() if self.is_classifier else None,
+            "class_names": [str(c) for c in self.class_names] if self.class_names is not None else None,
+            "feature_names": [str(f) for f in self.feature_names] if self.feature_names is not None else None,
+        }
+
+    @property
+    def nbytes(self):
+        return sum(int(a.nbytes) for a in self.arrays().values())
+
+    def _validate(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, but the forest expects {self.n_features}")
+        if np.isinf(X).any():
+            raise ValueError("Input X contains infinity")
+        # sklearn trees split on float32 inputs against float64 thresholds
+        return X.astype(np.float32)
+
+    def apply(self, X, trees=None):
+        """Leaf node index (into the flat arrays) for every (row, tree) pair.
+
+        `trees` (a slice or index array) restricts the walk to those trees.
+        """
+        X = self._validate(X)
+        n_rows = X.shape[0]
+        roots = self.roots if trees is None else self.roots[trees]
+        nodes = np.broadcast_to(roots, (n_rows, len(roots))).copy()
+        rows = np.arange(n_rows)[:, None]
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            if self.has_nan_routing:
+                go_left |= np.isnan(x) & self.nan_left[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def explain(self, X):
+        """Tree-path decomposition of the regressor's prediction, from one walk of every tree.
+
+        Returns (leaves, contributions, bias):
+          leaves         the same (n_rows, n_trees) node indices as apply()
+          contributions  (n_rows, n_features) value change each feature's splits produced, averaged over trees
+          bias           the mean root value (the training-set mean)
+        For each row, bias + contributions.sum() equals predict() up to float rounding.
+        """
+        if self.is_classifier:
+            raise ValueError("explanations are for regressors")
+        X = self._validate(X)
+        n_rows = X.shape[0]
+        nodes = np.broadcast_to(self.roots, (n_rows, self.n_trees)).copy()
+        rows = np.arange(n_rows)[:, None]
+        cells = rows * self.n_features
+        contributions = np.zeros(n_rows * self.n_features)
+        for _ in range(self.max_depth):
+            feature = self.feature[nodes]
+            x = X[rows, feature]
+            go_left = x <= self.threshold[nodes]
+            if self.has_nan_routing:
+                go_left |= np.isnan(x) & self.nan_left[nodes]
+            delta = np.where(go_left, self.delta_left[nodes], self.delta_right[nodes])
+            contributions += np.bincount((cells + feature).ravel(), weights=delta.ravel(),
+                                         minlength=len(contributions))
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes, contributions.reshape(n_rows, self.n_features) / self.n_trees, self.bias
+
+    def predict_trees(self, X):
+        """Per-tree outputs: (n_rows, n_trees) for regressors, (n_rows, n_trees, n_classes) for classifiers."""
+        return self.value[self.apply(X)]
+
+    def predict_proba(self, X):
+        return self.predict_trees(X).sum(axis=1) / self.n_trees
+
+    def predict(self, X):
+        if self.is_classifier:
+            return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+        return self.predict_trees(X).sum(axis=1) / self.n_trees
+
+    def predict_cascade(self, X, low: float, high: float, stages=(16,), z: float = 3.0, min_std: float = 0.0,
+                        return_trees: bool = False):
+        """Regressor mean over trees, stopping early for rows confidently outside [low, high].
+
+        Trees are walked in stages of cumulative size stages[0], stages[1], ...,
+        n_trees. After each stage, a row stops when the interval
+        mean +- z * standard error lies entirely at or above `high` or at or
+        below `low`. The standard error of the partial mean includes the
+        finite-population correction, because the target is the mean over all
+        n_trees. Per-tree outputs can be heavy-tailed: a few trees can sit far
+        from an otherwise tight cluster. `min_std` floors the between-tree
+        standard deviation so a small sample that happens to agree does not
+        look certain. Rows that might still land inside the band go on to the
+        next stage. A row that reaches the last stage gets predict()'s value,
+        up to float summation order.
+
+        Returns (predictions, trees evaluated per row). With return_trees it also
+        returns the (n_rows, n_trees) per-tree outputs, with NaN for trees a row
+        never reached.
+        """
+        if self.is_classifier:
+            raise ValueError("cascade inference is for regressors")
+        X = self._validate(X)
+        n_rows, n = X.shape[0], self.n_trees
+        bounds = sorted({min(max(1, int(k)), n) for k in stages} | {n})
+        total = np.zeros(n_rows)
+        total_sq = np.zeros(n_rows)
+        evaluated = np.zeros(n_rows, dtype=np.intp)
+        per_tree = np.full((n_rows, n), np.nan) if return_trees else None
+        active = np.arange(n_rows)
+        start = 0
+        for stop in bounds:
+            values = self.value[self.apply(X[active], slice(start, stop))]
+            if per_tree is not None:
+                per_tree[active, start:stop] = values
+            total[active] += values.sum(axis=1)
+            total_sq[active] += np.square(values).sum(axis=1)
+            evaluated[active] = stop
+            start = stop
+            if stop == n:
+                break
+            mean = total[active] / stop
+            var = np.maximum(total_sq[active] / stop - mean * mean, 0.0) * stop / max(stop - 1, 1)
+            var = np.maximum(var, min_std * min_std)
+            margin = z * np.sqrt(var / stop * (n - stop) / (n - 1))
+            outside = (mean - margin >= high) | (mean + margin <= low)
+            active = active[~outside]
+            if not len(active):
+                break
+        if return_trees:
+            return total / evaluated, evaluated, per_tree
+        return total / evaluated, evaluated
+
+    def predict_labels(self, X):
+        """Decoded failure category names (requires class_names at compile time)."""
+        return self.class_names[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def tree_spread(per_tree, quantiles=()):
+    """Std and quantiles across trees for every row of (n_rows, n_trees) outputs.
+
+    NaN entries (trees a cascade never reached) are skipped. Returns
+    (std (n_rows,), quantiles (n_rows, len(quantiles))).
+    """
+    partial = np.isnan(per_tree).any()
+    std = (np.nanstd if partial else np.std)(per_tree, axis=1)
+    if not len(quantiles):
+        return std, np.empty((len(per_tree), 0))
+    q = (np.nanquantile if partial else np.quantile)(per_tree, quantiles, axis=1)
+    return std, q.T
+
+
+def compile_forest(forest, label_encoder=None):
+    class_names = label_encoder.classes_ if label_encoder is not None else None
+    return CompiledForest.from_forest(forest, class_names=class_names)
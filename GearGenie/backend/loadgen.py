@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlparse
+
+import httpx
+import numpy as np
+
+from benchmark import SAMPLE_FILES, load_rows
+from metrics import Histogram
+
+
+# -------------------------------------------------------
+# OPEN-LOOP HTTP LOAD GENERATOR (localhost only)
+# -------------------------------------------------------
+# Requests are fired on a fixed schedule (uniform or Poisson arrivals at
+# --rps) whether or not earlier ones have finished, and latency is measured
+# from each request's *scheduled* send time. A server that falls behind
+# therefore shows its queueing delay instead of silently slowing the
+# generator down (coordinated omission).
+#
+#   python loadgen.py --start-server --rps 200 --duration 30 \
+#       --mix predict=0.8,service-estimate=0.1,health=0.1 --partial-fraction 0.2
+#
+# Prints one line per --interval window and writes per-window latency
+# histograms plus an error breakdown to --output.
+#
+# The chat / chat-stream endpoints target the chatbot instead (e.g.
+# chatbot/async_server.py with CHAT_LLM_BACKEND=fake on --url :5001); their
+# bodies cycle through CHAT_MESSAGES, one session per request.
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+LOADGEN_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+ENDPOINTS = {
+    "predict": ("POST", "/predict"),
+    "service-estimate": ("POST", "/service-estimate"),
+    "health": ("GET", "/health"),
+    "metrics": ("GET", "/metrics"),
+    "chat": ("POST", "/chat"),
+    "chat-stream": ("POST", "/chat/stream"),
+}
+CHAT_ENDPOINTS = {"chat", "chat-stream"}
+CHAT_MESSAGES = (
+    "hi", "How much is a brake job?", "my car won't start in the cold", "coolant leak repair cost",
+    "how long does a transmission repair take", "check engine light is on", "oil change price",
+    "what does CCA less than limit mean"
+)
+
+
+def parse_mix(text: str):
+    """'predict=0.8,health=0.2' -> [(name, weight)], weights normalized to 1."""
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint '{name}', expected one of {sorted(ENDPOINTS)}")
+        mix.append((name, float(weight or 1)))
+    total = sum(w for _, w in mix)
+    if total <= 0:
+        raise ValueError("mix weights must sum to more than 0")
+    return [(name, w / total) for name, w in mix]
+
+
+def partial_payload(row: dict, drop_fraction: float, rng: random.Random):
+    """Drop a random share of sensor fields so the server falls back to its defaults."""
+    keep = [k for k in row if k == "vehicle_id" or rng.random() >= drop_fraction]
+    return {k: row[k] for k in keep}
+
+
+class Window:
+    def __init__(self):
+        self.latencies_ms = []
+        self.histogram = Histogram(LOADGEN_BUCKETS_MS)
+        self.errors = Counter()
+        self.by_endpoint = Counter()
+
+    def record(self, endpoint: str, latency_ms: float, error: str = None):
+        self.latencies_ms.append(latency_ms)
+        self.histogram.observe(latency_ms)
+        self.by_endpoint[endpoint] += 1
+        if error:
+            self.errors[f"{endpoint}:{error}"] += 1
+
+    def summary(self, start_s: float, length_s: float):
+        ms = np.asarray(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+        return {
+            "start_s": round(start_s, 3),
+            "completed": len(self.latencies_ms),
+            "throughput_per_s": round(len(self.latencies_ms) / length_s, 2),
+            "errors": sum(self.errors.values()),
+            "p50_ms": round(float(p50), 3),
+            "p90_ms": round(float(p90), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(ms.max()), 3),
+            "by_endpoint": dict(self.by_endpoint),
+            "histogram_ms": self.histogram.snapshot()["buckets"]
+        }
+
+
+class LoadGenerator:
+    def __init__(self, base_url: str, rows: list, rps: float, duration_s: float, mix, partial_fraction=0.0,
+                 partial_drop=0.3, poisson=False, interval_s=1.0, timeout_s=30.0, max_connections=256, seed=0):
+        self.base_url = base_url.rstrip("/")
+        self.rows = rows
+        self.rps = float(rps)
+        self.duration_s = float(duration_s)
+        self.mix = mix
+        self.partial_fraction = partial_fraction
+        self.partial_drop = partial_drop
+        self.poisson = poisson
+        self.interval_s = float(interval_s)
+        self.timeout_s = timeout_s
+        self.max_connections = max_connections
+        self.rng = random.Random(seed)
+        self.windows = defaultdict(Window)
+        self.total = Window()
+        self.max_schedule_lag_ms = 0.0
+        self.sent = 0
+
+    def schedule(self):
+        """Offsets (s from start) of every request; fixed up front so the run is reproducible."""
+        offsets, t = [], 0.0
+        while True:
+            t += self.rng.expovariate(self.rps) if self.poisson else 1.0 / self.rps
+            if t >= self.duration_s:
+                return offsets
+            offsets.append(t)
+
+    def _request(self, i: int):
+        names, weights = zip(*self.mix)
+        endpoint = self.rng.choices(names, weights)[0]
+        method, path = ENDPOINTS[endpoint]
+        body = None
+        if endpoint in CHAT_ENDPOINTS:
+            body = {"message": CHAT_MESSAGES[i % len(CHAT_MESSAGES)], "session_id": f"loadgen-{i}"}
+        elif method == "POST":
+            row = self.rows[i % len(self.rows)]
+            if self.partial_fraction and self.rng.random() < self.partial_fraction:
+                row = partial_payload(row, self.partial_drop, self.rng)
+            body = {"data": row}
+        return endpoint, method, path, body
+
+    async def _fire(self, client, scheduled_at: float, endpoint: str, method: str, path: str, body):
+        error = None
+        try:
+            response = await client.request(method, path, json=body)
+            if response.status_code >= 400:
+                error = f"http_{response.status_code}"
+            elif response.headers.get("content-type", "").startswith("application/json"):
+                payload = response.json()
+                if isinstance(payload, dict) and "error" in payload:
+                    error = "app_error"
+            elif response.headers.get("content-type", "").startswith("text/event-stream"):
+                if "event: error" in response.text:
+                    error = "app_error"
+        except httpx.TimeoutException:
+            error = "timeout"
+        except httpx.ConnectError:
+            error = "connect_error"
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        done = time.perf_counter()
+        latency_ms = (done - scheduled_at) * 1000.0
+        window = int((scheduled_at - self.started_at) // self.interval_s)
+        self.windows[window].record(endpoint, latency_ms, error)
+        self.total.record(endpoint, latency_ms, error)
+
+    async def run(self):
+        offsets = self.schedule()
+        requests = [self._request(i) for i in range(len(offsets))]
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout_s, limits=limits) as client:
+            tasks = []
+            reporter = asyncio.create_task(self._report())
+            self.started_at = time.perf_counter()
+            for offset, request in zip(offsets, requests):
+                scheduled_at = self.started_at + offset
+                delay = scheduled_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    self.max_schedule_lag_ms = max(self.max_schedule_lag_ms, -delay * 1000.0)
+                tasks.append(asyncio.create_task(self._fire(client, scheduled_at, *request)))
+                self.sent += 1
+            await asyncio.gather(*tasks)
+            reporter.cancel()
+        self.finished_at = time.perf_counter()
+        return self.report()
+
+    async def _report(self):
+        shown = 0
+        while True:
+            await asyncio.sleep(self.interval_s)
+            current = int((time.perf_counter() - self.started_at) // self.interval_s)
+            # a window is printed once the next one has started; late completions still land in the JSON
+            for w in range(shown, current):
+                s = self.windows[w].summary(w * self.interval_s, self.interval_s)
+                print(f"[{s['start_s']:>7.1f}s] done={s['completed']:>6} err={s['errors']:>4} "
+                      f"p50={s['p50_ms']:>9.2f}ms p90={s['p90_ms']:>9.2f}ms p99={s['p99_ms']:>9.2f}ms "
+                      f"max={s['max_ms']:>9.2f}ms", file=sys.stderr)
+            shown = max(shown, current)
+
+    def report(self):
+        elapsed = self.finished_at - self.started_at
+        windows = [self.windows[w].summary(w * self.interval_s, self.interval_s) for w in sorted(self.windows)]
+        overall = self.total.summary(0.0, elapsed)
+        overall.pop("start_s")
+        return {
+            "config": {
+                "base_url": self.base_url,
+                "target_rps": self.rps,
+                "duration_s": self.duration_s,
+                "arrivals": "poisson" if self.poisson else "uniform",
+                "mix": dict(self.mix),
+                "partial_fraction": self.partial_fraction,
+                "partial_drop": self.partial_drop,
+                "interval_s": self.interval_s
+            },
+            "sent": self.sent,
+            "achieved_send_rps": round(self.sent / self.duration_s, 2),
+            "max_schedule_lag_ms": round(self.max_schedule_lag_ms, 3),
+            "overall": overall,
+            "errors": dict(self.total.errors),
+            "windows": windows
+        }
+
+
+def start_server(host: str, port: int, env=None, ready_timeout_s: float = 120.0):
+    """Start `uvicorn main:app` from this directory and wait for /health."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env={**os.environ, **(env or {})}
+    )
+    deadline = time.time() + ready_timeout_s
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"http://{host}:{port}/health", timeout=1.0).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError("server did not become ready")
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Open-loop load generator for the ML engine (localhost only)")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=50.0, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--mix", default="predict=0.8,service-estimate=0.1,health=0.1")
+    parser.add_argument("--csv", action="append", help="sample CSV(s) to replay (default: OBD + baseline samples)")
+    parser.add_argument("--partial-fraction", type=float, default=0.0,
+                        help="share of payloads with fields removed to exercise the defaults path")
+    parser.add_argument("--partial-drop", type=float, default=0.3, help="share of fields removed from those")
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of a fixed interval")
+    parser.add_argument("--interval", type=float, default=1.0, help="histogram window length in seconds")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadgen_results.json")
+    parser.add_argument("--start-server", action="store_true", help="launch uvicorn main:app on --url first")
+    args = parser.parse_args(argv)
+
+    url = urlparse(args.url)
+    if url.hostname not in LOCAL_HOSTS:
+        parser.error(f"refusing to send load to {url.hostname}; only {sorted(LOCAL_HOSTS)} are allowed")
+
+    rows = load_rows(args.csv or SAMPLE_FILES, seed=args.seed)
+    generator = LoadGenerator(
+        args.url, rows, args.rps, args.duration, parse_mix(args.mix),
+        partial_fraction=args.partial_fraction, partial_drop=args.partial_drop, poisson=args.poisson,
+        interval_s=args.interval, timeout_s=args.timeout, max_connections=args.max_connections, seed=args.seed
+    )
+
+    server = start_server(url.hostname, url.port or 80) if args.start_server else None
+    try:
+        report = asyncio.run(generator.run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    o = report["overall"]
+    print(f"✅ sent={report['sent']} completed={o['completed']} errors={o['errors']} "
+          f"p50={o['p50_ms']}ms p99={o['p99_ms']}ms max schedule lag={report['max_schedule_lag_ms']}ms "
+          f"-> {args.output}", file=sys.stderr)
+    for kind, count in sorted(report["errors"].items(), key=lambda kv: -kv[1]):
+        print(f"   {kind}: {count}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
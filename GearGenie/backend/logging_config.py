@@ -0,0 +1,49 @@
+import logging
+import os
+import random
+
+
+# -------------------------------------------------------
+# LEVELED, SAMPLED LOGGING
+# -------------------------------------------------------
+# Every backend module logs under the "geargenie" logger tree.
+#   LOG_LEVEL        DEBUG / INFO (default) / WARNING / ERROR, or OFF
+#   LOG_SAMPLE_RATE  fraction (0..1, default 1) of records below WARNING
+#                    that are written; warnings and errors are never dropped
+# Per-request lines are logged at DEBUG with lazy %-arguments, so at the
+# default level they cost one isEnabledFor() check and are never formatted.
+
+LOGGER_NAME = "geargenie"
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = min(max(float(rate), 0.0), 1.0)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+def configure_logging(level: str = None, sample_rate: float = None):
+    """Attach one sampled stderr handler to the "geargenie" logger (idempotent)."""
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1") if sample_rate is None else sample_rate)
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.propagate = False
+    if level == "OFF":
+        logger.setLevel(logging.CRITICAL + 1)
+    else:
+        logger.setLevel(getattr(logging, level, logging.INFO))
+
+    handler = next((h for h in logger.handlers if getattr(h, "_geargenie", False)), None)
+    if handler is None:
+        handler = logging.StreamHandler()
+        handler._geargenie = True
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+    handler.filters = [SamplingFilter(sample_rate)]
+    return logger
@@ -1,15 +1,36 @@
-from fastapi import FastAPI
+from startup_profile import StartupProfile
+startup_profile = StartupProfile()  # first, so the imports below are timed too
+
+from fastapi import FastAPI, Request, WebSocket
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
 import numpy as np
 import joblib
-from fastapi.responses import StreamingResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from typing import List, Optional
 import io
+import os
+import time
+import logging
+import warnings
+from model_registry import ModelRegistry
+from forest_engine import tree_spread
+from feature_assembler import FeatureAssembler
+from prediction_cache import PredictionCache
+from repair_costs import RepairCostIndex
+from pdf_renderer import PdfRenderService
+from micro_batcher import MicroBatcher
+from stream_ingest import TelemetryStreamService
+from vehicle_state import VehicleStateStore
+from persistence import WriteBehindQueue, make_sink, utcnow, PREDICTIONS, SERVICE_ESTIMATES
+from trend_features import TREND_STATS
+from baseline_defaults import ARTIFACT_NAME as DEFAULTS_ARTIFACT_NAME, load_defaults
+from metrics import MetricsRegistry, RequestTimingMiddleware, histogram_lines, sample_lines
+from logging_config import configure_logging
+from starlette.concurrency import run_in_threadpool
+import json
+
+startup_profile.mark("imports")
 
 
 # -------------------------------------------------------
@@ -26,30 +47,67 @@ app.add_middleware(
 )
 
 
+# -------------------------------------------------------
+# LOGGING + METRICS (scraped from GET /metrics)
+# -------------------------------------------------------
+configure_logging()
+log = logging.getLogger("geargenie.ml")
+
+metrics = MetricsRegistry()
+stage_latency = metrics.histogram(
+    "geargenie_stage_latency_seconds",
+    "Time spent in each inference stage.",
+    ("stage", "subsystem", "mode")
+)
+request_latency = metrics.histogram(
+    "geargenie_http_request_duration_seconds",
+    "End-to-end HTTP request latency.",
+    ("path", "method", "status")
+)
+default_fallbacks = metrics.counter(
+    "geargenie_default_fallbacks_total",
+    "Values served from a default: missing_feature (baseline median), rul_default (100 km), failure_unknown.",
+    ("subsystem", "kind")
+)
+exceptions_total = metrics.counter(
+    "geargenie_exceptions_total",
+    "Exceptions caught while serving, by stage.",
+    ("stage", "subsystem")
+)
+app.add_middleware(RequestTimingMiddleware, histogram=request_latency)
+
+
+def observe_payload_parsing(request: Request):
+    """Time from the request hitting the app to the validated payload reaching the endpoint."""
+    received_at = getattr(request.state, "received_at", None)
+    if received_at is not None:
+        stage_latency.observe(time.perf_counter() - received_at, "payload_parsing", "all", "request")
+
+
 # -------------------------------------------------------
 # LOAD CLASSIFIER AND RUL MODELS
 # -------------------------------------------------------
+MODEL_DIR = os.getenv("MODEL_DIR", "../../saved_models")
+MODEL_STORE_DIR = os.getenv("MODEL_STORE_DIR", f"{MODEL_DIR}/compiled")
+
+# ML_BACKEND=compiled evaluates flattened forests (forest_engine.py), memory-mapped
+# from the model store when `python model_store.py convert` has been run;
+# ML_BACKEND=sklearn calls the pickled estimators directly.
+ML_BACKEND = os.getenv("ML_BACKEND", "compiled").lower()
+if ML_BACKEND not in ("compiled", "sklearn"):
+    raise ValueError(f"Unknown ML_BACKEND '{ML_BACKEND}', expected 'compiled' or 'sklearn'")
+
+# Models are fitted on DataFrames; the numpy matrices handed to sklearn here
+# carry the same column order, so the feature-name warning is just noise.
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
 try:
-    classifier_models = {
-        "engine":  joblib.load("../../saved_models/classifier_engine_model.pkl"),
-        "brake":   joblib.load("../../saved_models/classifier_brake_model.pkl"),
-        "battery": joblib.load("../../saved_models/classifier_battery_model.pkl")
-    }
-    label_encoders = {
-        "engine":  joblib.load("../../saved_models/classifier_engine_le.pkl"),
-        "brake":   joblib.load("../../saved_models/classifier_brake_le.pkl"),
-        "battery": joblib.load("../../saved_models/classifier_battery_le.pkl")
-    }
-    rul_models = {
-        "engine":  joblib.load("../../saved_models/rul_engine_regressor.pkl"),
-        "brake":   joblib.load("../../saved_models/rul_brake_regressor.pkl"),
-        "battery": joblib.load("../../saved_models/rul_battery_regressor.pkl")
-    }
-    repair_costs_df = pd.read_csv("../../failure_repair_costs.csv")
-    print("✅ All hierarchical models, encoders, and repair data loaded successfully")
+    repair_costs = RepairCostIndex("../../failure_repair_costs.csv")
+    log.info("✅ Repair cost data loaded successfully")
 except FileNotFoundError as e:
-    print(f"❌ Error loading models or data: {e}")
+    log.error("❌ Error loading repair data: %s", e)
     raise
+startup_profile.mark("repair_costs")
 
 # Required features for input
 base_features = [
@@ -78,65 +136,317 @@ component_features = {
 }
 
 RUL_THRESHOLD = 30
+CRITICAL_RUL = 20
+
+
+# -------------------------------------------------------
+# CASCADE RUL INFERENCE (optional, compiled backend)
+# -------------------------------------------------------
+# RUL_CASCADE_TREES=8 (or "16,48" for more stages) averages that many trees
+# of each RUL forest first. A row stops there when its mean, +- RUL_CASCADE_Z
+# standard errors, is clear of the CRITICAL_RUL-RUL_THRESHOLD (20-30 km) band.
+# The between-tree std is floored at RUL_CASCADE_MIN_STD km. All other rows
+# go on to the full forest. Unset or 0 walks every tree. ML/test_cascade.py
+# measures how often a setting changes a status.
+RUL_CASCADE_STAGES = tuple(int(k) for k in os.getenv("RUL_CASCADE_TREES", "0").split(",") if k.strip() and int(k) > 0)
+RUL_CASCADE_Z = float(os.getenv("RUL_CASCADE_Z", "3"))
+RUL_CASCADE_MIN_STD = float(os.getenv("RUL_CASCADE_MIN_STD", "20"))
+rul_trees_evaluated = metrics.counter(
+    "geargenie_rul_trees_evaluated_total",
+    "Regression trees walked; divided by geargenie_rul_rows_scored_total gives the average per row.",
+    ("subsystem",)
+)
+rul_rows_scored = metrics.counter(
+    "geargenie_rul_rows_scored_total",
+    "Rows scored by the RUL forests, by whether the cascade stopped early.",
+    ("subsystem", "exit")
+)
+
+
+# -------------------------------------------------------
+# PREDICTION UNCERTAINTY (from the same forest pass)
+# -------------------------------------------------------
+# PREDICTION_UNCERTAINTY=1 (default) adds three fields to each subsystem's
+# prediction:
+#   rul_std_km          std of the RUL forest's per-tree outputs
+#   rul_quantiles_km    those outputs' RUL_QUANTILES (default "0.1,0.9"), keyed "p10", "p90"
+#   failure_confidence  the winning class's share of the classifier's averaged
+#                       tree votes; None when the classifier isn't run
+# All three come from the per-tree values the mean is computed from, so they
+# cost no extra traversal. Rows the cascade stopped early are summarized
+# over the trees they reached. On ML_BACKEND=sklearn the per-tree values come
+# from the compiled copy each snapshot builds for explanations; without one,
+# the RUL fields are None.
+PREDICTION_UNCERTAINTY = os.getenv("PREDICTION_UNCERTAINTY", "1") == "1"
+RUL_QUANTILES = tuple(float(q) for q in os.getenv("RUL_QUANTILES", "0.1,0.9").split(",") if q.strip())
+RUL_QUANTILE_NAMES = [f"p{q * 100:g}" for q in RUL_QUANTILES]
+
+
+# -------------------------------------------------------
+# RUL EXPLANATIONS (POST /predict?explain=true&top_k=3)
+# -------------------------------------------------------
+# Tree-path decomposition (forest_engine.CompiledForest.explain). Every
+# branch taken changes the node value, and that change is credited to the
+# split's sensor, using per-node deltas computed when the model loads. The
+# contributions plus baseline_km (the training mean) add up to the
+# unclipped RUL. The walk that produces them also yields the per-tree RUL,
+# so an explained row is not scored a second time. Explained rows always use
+# the full forest (no cascade). Each explained prediction is cached as a
+# single entry next to the plain one.
+EXPLAIN_TOP_K = int(os.getenv("EXPLAIN_TOP_K", "3"))
+
+
+def rul_explanations(features, contributions, bias: float):
+    """Per row: {"baseline_km", "top_sensors": [{"sensor", "contribution_km"}, ...]}, largest |contribution| first."""
+    order = np.argsort(-np.abs(contributions), axis=1, kind="stable")
+    values = np.round(np.take_along_axis(contributions, order, axis=1), 2).tolist()
+    names = np.asarray(features, dtype=object)[order].tolist()
+    baseline = round(bias, 2)
+    return [
+        {"baseline_km": baseline,
+         "top_sensors": [{"sensor": n, "contribution_km": v} for n, v in zip(row_names, row_values)]}
+        for row_names, row_values in zip(names, values)
+    ]
+
+
+def top_explanation(explanation, top_k: int):
+    if explanation is None:
+        return None
+    return {**explanation, "top_sensors": explanation["top_sensors"][:max(0, top_k)]}
+
+
+def predict_rul(sub: str, bundle, X, explain: bool = False):
+    """[(rul, std, quantiles, explanation), ...] per row of X, through the cascade when RUL_CASCADE_TREES is set.
+
+    std (rounded) and quantiles ({"p10": ..., ...}) are None when PREDICTION_UNCERTAINTY
+    is off or the regressor isn't a forest; explanation is None unless explain is set.
+    """
+    per_tree = None
+    explained = [None] * len(X)
+    if explain and bundle.can_explain:
+        per_tree, contributions, bias = bundle.explain_rul(X)
+        explained = rul_explanations(bundle.features, contributions, bias)
+        rul = per_tree.sum(axis=1) / per_tree.shape[1]
+        trees = np.full(len(rul), per_tree.shape[1])
+        if not PREDICTION_UNCERTAINTY:
+            per_tree = None
+    elif RUL_CASCADE_STAGES:
+        rul, trees, *rest = bundle.predict_rul_cascade(X, CRITICAL_RUL, RUL_THRESHOLD, RUL_CASCADE_STAGES,
+                                                       RUL_CASCADE_Z, RUL_CASCADE_MIN_STD,
+                                                       return_trees=PREDICTION_UNCERTAINTY)
+        per_tree = rest[0] if rest else None
+    else:
+        per_tree = bundle.predict_rul_trees(X) if PREDICTION_UNCERTAINTY else None
+        rul = bundle.predict_rul(X) if per_tree is None else per_tree.sum(axis=1) / per_tree.shape[1]
+        trees = np.full(len(rul), bundle.rul_trees)
+    early = int((trees < bundle.rul_trees).sum())
+    rul_trees_evaluated.inc(sub, amount=int(trees.sum()))
+    rul_rows_scored.inc(sub, "early", amount=early)
+    rul_rows_scored.inc(sub, "full", amount=len(trees) - early)
+    if per_tree is None:
+        return [(r, None, None, e) for r, e in zip(rul, explained)]
+    std, quantiles = tree_spread(per_tree, RUL_QUANTILES)
+    quantiles = [dict(zip(RUL_QUANTILE_NAMES, q)) for q in np.round(np.maximum(quantiles, 0.0), 2).tolist()]
+    return list(zip(rul, np.round(std, 2).tolist(), quantiles, explained))
+
+
+def predict_failure(bundle, X):
+    """[(failure category, confidence or None), ...] per row of X."""
+    if PREDICTION_UNCERTAINTY:
+        labels, confidence = bundle.predict_failure_confidence(X)
+        return list(zip(labels, np.round(confidence, 4).tolist()))
+    return [(label, None) for label in bundle.predict_failure(X)]
+
+
+def uncertainty_fields(std=None, quantiles=None, confidence=None):
+    """The prediction keys PREDICTION_UNCERTAINTY adds ({} when it is off)."""
+    if not PREDICTION_UNCERTAINTY:
+        return {}
+    return {"rul_std_km": std, "rul_quantiles_km": quantiles, "failure_confidence": confidence}
+
+
+def cascade_stats():
+    subsystems = {}
+    for sub in component_features:
+        early, full = rul_rows_scored.value(sub, "early"), rul_rows_scored.value(sub, "full")
+        rows = early + full
+        subsystems[sub] = {
+            "rows": rows,
+            "avg_trees": round(rul_trees_evaluated.value(sub) / rows, 2) if rows else None,
+            "early_exit_rate": round(early / rows, 4) if rows else 0.0
+        }
+    return {"stages": list(RUL_CASCADE_STAGES), "z": RUL_CASCADE_Z, "min_std": RUL_CASCADE_MIN_STD,
+            "subsystems": subsystems}
 
 
 # -------------------------------------------------------
 # DEFAULT FALLBACK VALUES FOR MISSING FIELDS
 # -------------------------------------------------------
+# Baseline CSV medians, precomputed by training into MODEL_DIR/baseline_defaults.json
+# (see baseline_defaults.py); without that file they are computed from the CSV.
 try:
-    defaults = pd.read_csv("baseline/synthetic_hierarchical_data.csv")
-    if 'mileage_km' in defaults.columns and 'odometer_reading' not in defaults.columns:
-        defaults.rename(columns={'mileage_km': 'odometer_reading'}, inplace=True)
-    defaults = defaults.select_dtypes(include=np.number).median()
-    print("✅ Baseline defaults loaded successfully")
+    defaults, defaults_info = load_defaults(os.getenv("DEFAULTS_PATH", f"{MODEL_DIR}/{DEFAULTS_ARTIFACT_NAME}"),
+                                            "baseline/synthetic_hierarchical_data.csv")
+    log.info("✅ Baseline defaults loaded successfully from %s", defaults_info["source"])
 except FileNotFoundError as e:
-    print(f"❌ Error loading baseline CSV: {e}")
+    log.error("❌ Error loading baseline CSV: %s", e)
     raise
+startup_profile.mark("defaults")
+
+feature_assembler = FeatureAssembler(component_features, defaults)
+
+
+# -------------------------------------------------------
+# ROLLING TREND FEATURES (per vehicle, see trend_features.py)
+# -------------------------------------------------------
+# Every sensor any subsystem uses, in a fixed order. Training with
+# TREND_FEATURES=1 writes the window and alpha it used to
+# MODEL_DIR/trend_features.json; env vars override it. The file only counts
+# once a loaded model has trend columns (checked after the models load), so a
+# stale one never keeps per-vehicle state. Without either, none is kept
+# (TREND_WINDOW=0).
+trend_sensors = list(dict.fromkeys(f for features in component_features.values() for f in features))
+trend_assembler = FeatureAssembler({"trend": trend_sensors}, defaults)
+trend_sensor_index = {sensor: i for i, sensor in enumerate(trend_sensors)}
+TREND_SLOPE = TREND_STATS.index("slope")
+
+
+def with_trend_features(bundle, X, trends=None):
+    """Append the trend columns a trend-aware model was trained with.
+
+    trends[i] is RollingWindow.stats() over trend_sensors for row i; rows with no
+    history get single-reading stats (mean = min = max = ewma = value, slope = 0).
+    """
+    if not bundle.trend_features:
+        return X
+    stat_positions = np.array(bundle.trend_stat_positions)
+    out = X[:, bundle.trend_base_positions].copy()
+    out[:, stat_positions == TREND_SLOPE] = 0.0
+    if trends is not None:
+        sensor_positions = [trend_sensor_index[sensor] for sensor, _ in bundle.trend_columns]
+        for i, stats in enumerate(trends):
+            if stats is not None:
+                out[i] = stats[stat_positions, sensor_positions]
+    return np.hstack([X, out])
+
+
+def trend_fields(stats):
+    """Response form of RollingWindow.stats(): {sensor: {stat: value}}."""
+    return {
+        sensor: {stat: round(float(stats[k, j]), 4) for k, stat in enumerate(TREND_STATS)}
+        for j, sensor in enumerate(trend_sensors)
+    }
+
+
+# -------------------------------------------------------
+# PREDICTION CACHE (shared by /predict and /service-estimate)
+# -------------------------------------------------------
+# PREDICTION_CACHE_QUANTIZATION is a JSON object of feature -> step, e.g.
+# '{"engine_temp_c": 0.5, "odometer_reading": 10}'. Unlisted features match exactly.
+prediction_cache = PredictionCache(
+    component_features,
+    max_entries=int(os.getenv("PREDICTION_CACHE_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL", "30")),
+    quantization=json.loads(os.getenv("PREDICTION_CACHE_QUANTIZATION", "{}"))
+)
+
+
+
+# -------------------------------------------------------
+# MODEL REGISTRY (versioned bundles, hot swap, degraded subsystems)
+# -------------------------------------------------------
+model_registry = ModelRegistry(
+    component_features, MODEL_DIR, MODEL_STORE_DIR, ML_BACKEND,
+    verify_store=os.getenv("MODEL_STORE_VERIFY", "1") == "1"
+)
+model_registry.on_swap(lambda old, new: prediction_cache.invalidate())
+model_registry.load()
+startup_profile.mark("models")
+
+trend_config = {}
+if any(bundle.trend_features for bundle in model_registry.current().bundles.values()):
+    try:
+        with open(os.path.join(MODEL_DIR, "trend_features.json")) as f:
+            trend_config = json.load(f)
+    except (FileNotFoundError, ValueError):
+        pass
+TREND_WINDOW = int(os.getenv("TREND_WINDOW", trend_config.get("window", 0)))
+TREND_ALPHA = float(os.getenv("TREND_ALPHA", trend_config.get("alpha", 0.3)))
+
+UNAVAILABLE_STATUS = "⚪ Unavailable - model not loaded"
+
+
+def unavailable_prediction():
+    return {
+        "rul_km": None,
+        "health_percent": None,
+        "status": UNAVAILABLE_STATUS,
+        "predicted_failure": "Unknown",
+        **uncertainty_fields()
+    }
 
 
 # -------------------------------------------------------
 # HIERARCHICAL PREDICTION CORE FUNCTION
 # -------------------------------------------------------
-def predict_subsystem(sub: str, sample: dict):
+def predict_subsystem(sub: str, sample: dict, models=None, explain: bool = False):
     features = component_features[sub]
-    classifier = classifier_models[sub]
-    le = label_encoders[sub]
-    regressor = rul_models[sub]
-
-    input_data = {}
-    for f in features:
-        value = sample.get(f, None)
-        if value is None:
-            default_key = 'mileage_km' if f == 'odometer_reading' and 'mileage_km' in defaults else f
-            value = float(defaults.get(default_key, 0.0))
-        input_data[f] = value
-    
-    X = pd.DataFrame([input_data])
-    print(f"🔄 Predicting {sub} with {len(features)} features...")
+    bundle = (models or model_registry.current())[sub]
+    if not bundle.can_predict_rul:
+        return {**unavailable_prediction(), "rul_explanation": None} if explain else unavailable_prediction()
 
-    try:
-        rul_km = float(regressor.predict(X)[0])
-        rul_km = round(max(0.0, rul_km), 2)
-    except Exception as e:
-        print(f"❌ RUL prediction error for {sub}: {e}")
-        rul_km = 100.0 
+    t0 = time.perf_counter()
+    X, valid, defaulted = feature_assembler.assemble(sub, sample)
+    X = with_trend_features(bundle, X)
+    stage_latency.observe(time.perf_counter() - t0, "feature_assembly", sub, "single")
+    if defaulted:
+        default_fallbacks.inc(sub, "missing_feature", amount=defaulted)
+    cache_key = prediction_cache.key(sub, X[0], bundle.version) if valid and prediction_cache.enabled else None
+    if cache_key is not None:
+        cached = prediction_cache.get(cache_key + ("explanation",) if explain else cache_key)
+        if cached is not None:
+            return cached
+
+    log.debug("🔄 Predicting %s with %d features...", sub, len(features))
+    rul_std = rul_quantiles = confidence = explanation = None
+
+    if not valid:
+        exceptions_total.inc("feature_assembly", sub)
+        default_fallbacks.inc(sub, "rul_default")
+        log.warning("❌ RUL prediction error for %s: could not convert feature values to float", sub)
+        rul_km = 100.0
+    else:
+        t0 = time.perf_counter()
+        try:
+            rul_km, rul_std, rul_quantiles, explanation = predict_rul(sub, bundle, X, explain)[0]
+            rul_km = round(max(0.0, float(rul_km)), 2)
+        except Exception as e:
+            exceptions_total.inc("rul_regression", sub)
+            default_fallbacks.inc(sub, "rul_default")
+            log.warning("❌ RUL prediction error for %s: %s", sub, e)
+            rul_km = 100.0
+            rul_std = rul_quantiles = explanation = None
+        stage_latency.observe(time.perf_counter() - t0, "rul_regression", sub, "single")
 
     failure_category = "No Failure"
     if rul_km < RUL_THRESHOLD:
+        t0 = time.perf_counter()
         try:
-            pred_class_encoded = classifier.predict(X)[0]
-            failure_category = le.inverse_transform([pred_class_encoded])[0]
+            failure_category, confidence = predict_failure(bundle, X)[0]
             if failure_category == "No Failure":
                 failure_category = "General Wear"
         except Exception as e:
-            print(f"❌ Classification error for {sub}: {e}")
+            exceptions_total.inc("classification", sub)
+            default_fallbacks.inc(sub, "failure_unknown")
+            log.warning("❌ Classification error for %s: %s", sub, e)
             failure_category = "Unknown"
+        stage_latency.observe(time.perf_counter() - t0, "classification", sub, "single")
     
     if failure_category == "No Failure":
         status = "🟢 Healthy"
         health = int(20 + (rul_km / 120.0) * 80)
     else:
-        if rul_km <= 20:
+        if rul_km <= CRITICAL_RUL:
             status = "⚠ Critical - immediate service required"
             health = int((rul_km / 20.0) * 20)
         else:
@@ -144,14 +454,248 @@ def predict_subsystem(sub: str, sample: dict):
             health = int(20 + ((rul_km - 20) / (RUL_THRESHOLD - 20)) * 20)
 
     health = min(max(health, 0), 100)
-    print(f"✅ {sub.upper()}: RUL={rul_km}km, Failure Class='{failure_category}', Health={health}%, Status='{status}'")
+    log.debug("✅ %s: RUL=%skm, Failure Class='%s', Health=%d%%, Status='%s'",
+              sub.upper(), rul_km, failure_category, health, status)
 
-    return {
+    prediction = {
         "rul_km": rul_km,
         "health_percent": health,
         "status": status,
-        "predicted_failure": failure_category
+        "predicted_failure": failure_category,
+        **uncertainty_fields(rul_std, rul_quantiles, confidence)
     }
+    if cache_key is not None:
+        prediction_cache.put(cache_key, prediction)
+    if explain:
+        prediction = {**prediction, "rul_explanation": explanation}
+        if cache_key is not None and explanation is not None:
+            prediction_cache.put(cache_key + ("explanation",), prediction)
+    return prediction
+
+
+# -------------------------------------------------------
+# VECTORIZED BATCH PREDICTION (one feature matrix per subsystem)
+# -------------------------------------------------------
+HEALTHY_STATUS = "🟢 Healthy"
+CRITICAL_STATUS = "⚠ Critical - immediate service required"
+ATTENTION_STATUS = "🟡 Attention soon"
+
+
+def _predict_rows(predict, X, fallback):
+    """Run predict once over all rows; if the batch is rejected, isolate the bad rows.
+
+    Rows holding a value that cannot be converted to float are dropped before this
+    by the assembler's valid mask; the single-row path fails on those the same way.
+    """
+    try:
+        return list(predict(X)), []
+    except Exception:
+        out, errors = [], []
+        for i in range(len(X)):
+            try:
+                out.append(predict(X[i:i + 1])[0])
+            except Exception as e:
+                out.append(fallback)
+                errors.append((i, e))
+        return out, errors
+
+
+def predict_subsystem_batch(sub: str, samples: list, models=None, trends=None, explain: bool = False):
+    n = len(samples)
+    bundle = (models or model_registry.current())[sub]
+    if not bundle.can_predict_rul:
+        if explain:
+            return [{**unavailable_prediction(), "rul_explanation": None} for _ in range(n)]
+        return [unavailable_prediction() for _ in range(n)]
+    t0 = time.perf_counter()
+    X, valid, defaulted = feature_assembler.assemble_batch(sub, samples)
+    X = with_trend_features(bundle, X, trends)
+    stage_latency.observe(time.perf_counter() - t0, "feature_assembly", sub, "batch")
+    if defaulted:
+        default_fallbacks.inc(sub, "missing_feature", amount=defaulted)
+
+    # Serve what the prediction cache already knows, score the rest
+    predictions = [None] * n
+    cache_keys = [None] * n
+    if prediction_cache.enabled:
+        for i in np.flatnonzero(valid):
+            cache_keys[i] = prediction_cache.key(sub, X[i], bundle.version)
+            predictions[i] = prediction_cache.get(cache_keys[i] + ("explanation",) if explain else cache_keys[i])
+    todo = np.array([i for i in range(n) if predictions[i] is None], dtype=np.intp)
+    if not len(todo):
+        return predictions
+    X, valid = X[todo], valid[todo]
+    m = len(todo)
+
+    rul = np.full(m, 100.0)
+    rul_std, rul_quantiles, confidence, explanations = [None] * m, [None] * m, [None] * m, [None] * m
+    valid_idx = np.flatnonzero(valid)
+    if len(valid_idx) < m:
+        exceptions_total.inc("feature_assembly", sub, amount=m - len(valid_idx))
+        default_fallbacks.inc(sub, "rul_default", amount=m - len(valid_idx))
+        log.warning("❌ RUL prediction error for %s: %d rows could not convert feature values to float",
+                    sub, m - len(valid_idx))
+    if len(valid_idx):
+        t0 = time.perf_counter()
+        preds, errors = _predict_rows(lambda rows: predict_rul(sub, bundle, rows, explain), X[valid_idx], None)
+        stage_latency.observe(time.perf_counter() - t0, "rul_regression", sub, "batch")
+        if errors:
+            exceptions_total.inc("rul_regression", sub, amount=len(errors))
+            default_fallbacks.inc(sub, "rul_default", amount=len(errors))
+        for i, e in errors:
+            log.warning("❌ RUL prediction error for %s (row %d): %s", sub, todo[valid_idx[i]], e)
+        for i, p in zip(valid_idx, preds):
+            if p is not None:
+                rul[i] = round(max(0.0, float(p[0])), 2)
+                rul_std[i], rul_quantiles[i], explanations[i] = p[1], p[2], p[3]
+
+    failure = np.full(m, "No Failure", dtype=object)
+    low_idx = np.flatnonzero(rul < RUL_THRESHOLD)
+    if len(low_idx):
+        t0 = time.perf_counter()
+        preds, errors = _predict_rows(lambda rows: predict_failure(bundle, rows), X[low_idx], None)
+        stage_latency.observe(time.perf_counter() - t0, "classification", sub, "batch")
+        if errors:
+            exceptions_total.inc("classification", sub, amount=len(errors))
+            default_fallbacks.inc(sub, "failure_unknown", amount=len(errors))
+        for i, e in errors:
+            log.warning("❌ Classification error for %s (row %d): %s", sub, todo[low_idx[i]], e)
+        for i, p in zip(low_idx, preds):
+            if p is None:
+                failure[i] = "Unknown"
+            else:
+                name, confidence[i] = p
+                failure[i] = "General Wear" if name == "No Failure" else name
+
+    healthy = failure == "No Failure"
+    critical = ~healthy & (rul <= CRITICAL_RUL)
+    status = np.where(healthy, HEALTHY_STATUS, np.where(critical, CRITICAL_STATUS, ATTENTION_STATUS))
+    health = np.select(
+        [healthy, critical],
+        [20 + (rul / 120.0) * 80, (rul / 20.0) * 20],
+        20 + ((rul - 20) / (RUL_THRESHOLD - 20)) * 20,
+    )
+    health = np.clip(np.trunc(health), 0, 100).astype(int)
+
+    for j, i in enumerate(todo):
+        predictions[i] = {
+            "rul_km": float(rul[j]),
+            "health_percent": int(health[j]),
+            "status": str(status[j]),
+            "predicted_failure": failure[j],
+            **uncertainty_fields(rul_std[j], rul_quantiles[j], confidence[j])
+        }
+        if cache_keys[i] is not None:
+            prediction_cache.put(cache_keys[i], predictions[i])
+        if explain:
+            predictions[i] = {**predictions[i], "rul_explanation": explanations[j]}
+            if cache_keys[i] is not None and explanations[j] is not None:
+                prediction_cache.put(cache_keys[i] + ("explanation",), predictions[i])
+    return predictions
+
+
+def predict_vehicles(samples: list, explain: bool = False):
+    """Full engine/brake/battery predictions for many payloads, one batched pass per subsystem.
+
+    Returns (results, model_version); every row is scored by the same model snapshot.
+    With explain, each prediction carries "rul_explanation" with every sensor ranked.
+    """
+    models = model_registry.current()
+    per_subsystem = {sub: predict_subsystem_batch(sub, samples, models, explain=explain)
+                     for sub in component_features}
+    results = [
+        {sub: per_subsystem[sub][i] for sub in ("engine", "brake", "battery")}
+        for i in range(len(samples))
+    ]
+    return results, models.version
+
+
+# -------------------------------------------------------
+# DELTA PAYLOADS (per-vehicle last-known state)
+# -------------------------------------------------------
+vehicle_states = VehicleStateStore(
+    component_features,
+    max_vehicles=int(os.getenv("VEHICLE_STATE_MAX", "10000")),
+    ttl_seconds=float(os.getenv("VEHICLE_STATE_TTL", "3600")),
+    trend_sensors=trend_sensors,
+    trend_window=TREND_WINDOW,
+    trend_alpha=TREND_ALPHA
+)
+
+
+def predict_vehicle_deltas(vehicle_ids: list, deltas: list, explain: bool = False):
+    """Merge each delta over its vehicle's last-known fields and rescore only subsystems whose inputs changed.
+
+    Returns (results, model_version, rescored, trends): rescored[i] lists the subsystems
+    scored for row i, trends[i] is its RollingWindow.stats() (None when trends are off).
+    Subsystems whose models use trend features, and every subsystem when explain is
+    set, are always rescored.
+    """
+    models = model_registry.current()
+    merged = [vehicle_states.merge(vid, delta) for vid, delta in zip(vehicle_ids, deltas)]
+    trends = [None] * len(deltas)
+    if vehicle_states.trends_enabled:
+        for i, (vid, (sample, _)) in enumerate(zip(vehicle_ids, merged)):
+            X, valid, _ = trend_assembler.assemble("trend", sample)
+            trends[i] = vehicle_states.push_trend(vid, X[0]) if valid else vehicle_states.trend_stats(vid)
+    results = [{} for _ in deltas]
+    rescored = [[] for _ in deltas]
+    for sub in ("engine", "brake", "battery"):
+        bundle = models[sub]
+        todo = []
+        for i, (vid, (_, signatures)) in enumerate(zip(vehicle_ids, merged)):
+            prediction = None
+            if not bundle.trend_features and not explain:
+                prediction = vehicle_states.reusable(vid, sub, signatures[sub], bundle.version)
+            if prediction is None:
+                todo.append(i)
+            else:
+                results[i][sub] = prediction
+        if not todo:
+            continue
+        predictions = predict_subsystem_batch(sub, [merged[i][0] for i in todo], models, [trends[i] for i in todo],
+                                              explain)
+        for i, prediction in zip(todo, predictions):
+            results[i][sub] = prediction
+            rescored[i].append(sub)
+            stored = {k: v for k, v in prediction.items() if k != "rul_explanation"}
+            vehicle_states.remember(vehicle_ids[i], sub, merged[i][1][sub], bundle.version, stored)
+    return results, models.version, rescored, trends
+
+
+def build_batch_service_estimates(results: list, mode: str = "batch"):
+    """Price every flagged failure in the batch with one vectorized repair cost lookup."""
+    t0 = time.perf_counter()
+    flagged = [
+        (i, component, prediction['status'], prediction['predicted_failure'])
+        for i, result in enumerate(results)
+        for component, prediction in result.items()
+        if prediction['predicted_failure'] != "No Failure"
+    ]
+    estimates = [None] * len(results)
+    if not flagged:
+        stage_latency.observe(time.perf_counter() - t0, "cost_lookup", "all", mode)
+        return estimates
+
+    hours, costs, found = repair_costs.lookup_many([f[3] for f in flagged])
+
+    for (row, component, status, failure), h, c, ok in zip(flagged, hours, costs, found):
+        if not ok:
+            continue
+        if estimates[row] is None:
+            estimates[row] = {"estimates": [], "totalEstimatedHours": 0, "totalEstimatedCostUSD": 0}
+        estimate = estimates[row]
+        estimate["totalEstimatedHours"] += float(h)
+        estimate["totalEstimatedCostUSD"] += float(c)
+        estimate["estimates"].append({
+            "component": component.capitalize(),
+            "status": status,
+            "recommendedService": failure,
+            "estimatedHours": float(h),
+            "estimatedCostUSD": float(c)
+        })
+    stage_latency.observe(time.perf_counter() - t0, "cost_lookup", "all", mode)
+    return estimates
 
 
 # -------------------------------------------------------
@@ -159,203 +703,431 @@ def predict_subsystem(sub: str, sample: dict):
 # -------------------------------------------------------
 class Payload(BaseModel):
     data: dict
+    # Set to send only changed fields; they are merged over this vehicle's last-known state
+    vehicle_id: Optional[str] = None
+
+
+class BatchPayload(BaseModel):
+    vehicles: List[dict]
+
+
+# -------------------------------------------------------
+# WRITE-BEHIND PERSISTENCE (PERSIST_SINK empty disables it)
+# -------------------------------------------------------
+# Endpoints only buffer documents; persistence.py flushes them in bulk off
+# the request path. serviceEstimate documents follow the booking API's
+# ServiceEstimate schema.
+_persist_sink = make_sink(os.getenv("PERSIST_SINK", ""), os.getenv("PERSIST_MONGO_DB", "geargeniedb"))
+persist_queue = WriteBehindQueue(
+    _persist_sink,
+    max_batch=int(os.getenv("PERSIST_BATCH_SIZE", "500")),
+    flush_interval_s=float(os.getenv("PERSIST_FLUSH_INTERVAL", "1")),
+    max_buffer=int(os.getenv("PERSIST_MAX_BUFFER", "10000")),
+    max_retries=int(os.getenv("PERSIST_MAX_RETRIES", "5"))
+) if _persist_sink is not None else None
+
+
+def persist_predictions(vehicle_ids: list, results: list, estimates: list, model_version: str, source: str):
+    """Queue one prediction document per vehicle, plus its serviceEstimate when one was priced."""
+    if persist_queue is None:
+        return
+    created_at = utcnow()
+    for vehicle_id, result, estimate in zip(vehicle_ids, results, estimates):
+        vehicle_id = str(vehicle_id) if vehicle_id is not None else "UnknownVehicle"
+        persist_queue.submit(PREDICTIONS, {
+            "vehicleId": vehicle_id,
+            "modelVersion": model_version,
+            "predictions": result,
+            "source": source,
+            "createdAt": created_at
+        })
+        if estimate is not None:
+            persist_queue.submit(SERVICE_ESTIMATES, {"vehicleId": vehicle_id, **estimate, "createdAt": created_at})
+
+
+# -------------------------------------------------------
+# MICRO-BATCHING (MICRO_BATCH_WINDOW_MS=0 disables it)
+# -------------------------------------------------------
+MICRO_BATCH_WINDOW_MS = float(os.getenv("MICRO_BATCH_WINDOW_MS", "2"))
+
+
+def _predict_vehicles_for_batcher(samples: list):
+    results, version = predict_vehicles(samples)
+    return [(result, version) for result in results]
+
+
+micro_batcher = MicroBatcher(
+    _predict_vehicles_for_batcher,
+    window_ms=MICRO_BATCH_WINDOW_MS,
+    max_batch=int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+) if MICRO_BATCH_WINDOW_MS > 0 else None
+
+
+def _predict_all(x: dict, explain: bool = False):
+    models = model_registry.current()
+    return {
+        "engine":  predict_subsystem("engine", x, models, explain),
+        "brake":   predict_subsystem("brake", x, models, explain),
+        "battery": predict_subsystem("battery", x, models, explain)
+    }, models.version
+
+
+async def predict_vehicle(x: dict, vehicle_id: str = None, explain: bool = False):
+    """(predictions, model_version, delta info or None) for one payload.
+
+    Delta info, for payloads with a vehicle_id, is {"rescored": [...], "trends": stats or None}.
+    Explained requests skip the micro-batcher.
+    """
+    if vehicle_id is not None:
+        results, version, rescored, trends = await run_in_threadpool(
+            predict_vehicle_deltas, [vehicle_id], [x], explain)
+        return results[0], version, {"rescored": rescored[0], "trends": trends[0]}
+    if micro_batcher is not None and not explain:
+        return (*await micro_batcher.submit(x), None)
+    return (*await run_in_threadpool(_predict_all, x, explain), None)
+
+
+def trim_explanations(result: dict, top_k: int):
+    """Cut each subsystem's ranked sensors to the requested top_k."""
+    return {
+        sub: {**p, "rul_explanation": top_explanation(p.get("rul_explanation"), top_k)}
+        for sub, p in result.items()
+    }
 
 
 # -------------------------------------------------------
 # PREDICTION ENDPOINT (Returns JSON with predictions + serviceEstimate)
 # -------------------------------------------------------
 @app.post("/predict")
-def predict(payload: Payload):
+async def predict(payload: Payload, request: Request, explain: bool = False, top_k: int = EXPLAIN_TOP_K,
+                  trends: bool = False):
     try:
+        observe_payload_parsing(request)
         x = payload.data
-        print(f"\n📨 Received prediction request with {len(x)} fields")
+        log.debug("📨 Received prediction request with %d fields", len(x))
         
-        result = {
-            "engine":  predict_subsystem("engine", x),
-            "brake":   predict_subsystem("brake", x),
-            "battery": predict_subsystem("battery", x)
-        }
+        result, model_version, delta = await predict_vehicle(x, payload.vehicle_id, explain)
+        if explain:
+            result = trim_explanations(result, top_k)
         
         # Format the service estimate data for embedding in booking
-        services_to_log = []
-        total_hours = 0
-        total_cost = 0
-
-        for component, prediction in result.items():
-            if prediction['predicted_failure'] != "No Failure":
-                failure = prediction['predicted_failure']
-                cost_row = repair_costs_df[repair_costs_df['failure_category'] == failure]
-                
-                if not cost_row.empty:
-                    hours = float(cost_row['repair_hours'].iloc[0])
-                    cost = float(cost_row['repair_cost_usd'].iloc[0])
-                    total_hours += hours
-                    total_cost += cost
-                    
-                    services_to_log.append({
-                        "component": component.capitalize(),
-                        "status": prediction['status'],
-                        "recommendedService": failure,
-                        "estimatedHours": hours,
-                        "estimatedCostUSD": cost
-                    })
-
-        estimate_data = {
-            "estimates": services_to_log,
-            "totalEstimatedHours": total_hours,
-            "totalEstimatedCostUSD": total_cost
-        } if services_to_log else None
+        estimate_data = build_batch_service_estimates([result], mode="single")[0]
+        if log.isEnabledFor(logging.DEBUG):
+            total_cost = estimate_data["totalEstimatedCostUSD"] if estimate_data else 0
+            services = len(estimate_data["estimates"]) if estimate_data else 0
+            log.debug("✅ Prediction complete! Services: %d, Total: $%.2f", services, total_cost)
         
-        print(f"✅ Prediction complete! Services: {len(services_to_log)}, Total: ${total_cost:.2f}")
+        persist_predictions([payload.vehicle_id or x.get("id")], [result], [estimate_data], model_version, "predict")
         
-        return {
+        response = {
             "predictions": result,
-            "serviceEstimate": estimate_data
+            "serviceEstimate": estimate_data,
+            "modelVersion": model_version
         }
+        if delta is not None:
+            response["rescoredSubsystems"] = delta["rescored"]
+            if trends and delta["trends"] is not None:
+                response["trends"] = trend_fields(delta["trends"])
+        return response
         
     except Exception as e:
-        print(f"❌ Prediction endpoint error: {e}")
+        exceptions_total.inc("predict_endpoint", "all")
+        log.error("❌ Prediction endpoint error: %s", e)
+        return {"error": str(e)}
+
+
+# -------------------------------------------------------
+# BATCH PREDICTION ENDPOINT (Same output as /predict, one entry per vehicle)
+# -------------------------------------------------------
+@app.post("/predict/batch")
+def predict_batch(payload: BatchPayload, request: Request, explain: bool = False, top_k: int = EXPLAIN_TOP_K):
+    try:
+        observe_payload_parsing(request)
+        samples = payload.vehicles
+        log.debug("📦 Received batch prediction request for %d vehicles", len(samples))
+
+        results, model_version = predict_vehicles(samples, explain)
+        if explain:
+            results = [trim_explanations(result, top_k) for result in results]
+        estimates = build_batch_service_estimates(results)
+
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("✅ Batch prediction complete! Vehicles needing service: %d",
+                      sum(e is not None for e in estimates))
+        persist_predictions([sample.get("vehicle_id", sample.get("id")) for sample in samples], results, estimates,
+                            model_version, "batch")
+
+        return {
+            "results": [
+                {"predictions": result, "serviceEstimate": estimate, "modelVersion": model_version}
+                for result, estimate in zip(results, estimates)
+            ]
+        }
+
+    except Exception as e:
+        exceptions_total.inc("batch_endpoint", "all")
+        log.error("❌ Batch prediction endpoint error: %s", e)
         return {"error": str(e)}
 
 
 # -------------------------------------------------------
 # PDF GENERATION
 # -------------------------------------------------------
-def generate_service_pdf(predictions: dict):
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=40, leftMargin=40, topMargin=40, bottomMargin=40)
-    styles = getSampleStyleSheet()
-    elements = []
-
-    # Title
-    elements.append(Paragraph("Service Estimate", styles['h1']))
-    elements.append(Spacer(1, 12))
-
-    # Summary
-    elements.append(Paragraph("Here is a summary of the recommended services for your vehicle based on the latest sensor data.", styles['Normal']))
-    elements.append(Spacer(1, 24))
-
-    # Table Data - using Paragraph objects for text wrapping
-    header_style = getSampleStyleSheet()['Normal']
-    header_style.textColor = colors.whitesmoke
-    header_style.fontName = 'Helvetica-Bold'
-    header_style.fontSize = 10
-    
-    body_style = getSampleStyleSheet()['Normal']
-    body_style.fontSize = 9
-    
-    data = [[
-        Paragraph("Component", header_style),
-        Paragraph("Status", header_style),
-        Paragraph("Recommended Service", header_style),
-        Paragraph("Est. Hours", header_style),
-        Paragraph("Est. Cost (USD)", header_style)
-    ]]
-    
-    total_cost = 0
-    total_hours = 0
+# Rendering lives in pdf_renderer.py so worker processes import reportlab only.
+# PDF_RENDER_WORKERS=0 renders on a single background thread instead; unset,
+# that is the choice on a single core, otherwise up to cpu_count - 1 processes.
+pdf_service = PdfRenderService(
+    workers=int(os.environ["PDF_RENDER_WORKERS"]) if os.getenv("PDF_RENDER_WORKERS") else None,
+    cache_size=int(os.getenv("PDF_CACHE_SIZE", "256")),
+    max_pending=int(os.getenv("PDF_MAX_PENDING", "8"))
+)
 
+
+def service_rows(predictions: dict):
+    """(component, status, failure, hours, cost) for every priced failure; doubles as the PDF cache key."""
+    t0 = time.perf_counter()
+    rows = []
     for component, result in predictions.items():
         if result['predicted_failure'] != "No Failure":
             failure = result['predicted_failure']
-            cost_row = repair_costs_df[repair_costs_df['failure_category'] == failure]
-            
-            if not cost_row.empty:
-                hours = cost_row['repair_hours'].iloc[0]
-                cost = cost_row['repair_cost_usd'].iloc[0]
-                total_hours += hours
-                total_cost += cost
-                
-                data.append([
-                    Paragraph(component.capitalize(), body_style),
-                    Paragraph(result['status'], body_style),
-                    Paragraph(failure, body_style),
-                    Paragraph(f"{hours:.1f}", body_style),
-                    Paragraph(f"${cost:,.2f}", body_style)
-                ])
-
-    # Create Table with auto-adjusting row heights
-    if len(data) > 1:
-        table = Table(data, colWidths=[80, 140, 160, 70, 90], repeatRows=1)
-        style = TableStyle([
-            # Header styling
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            
-            # Body styling
-            ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ecf0f1')),
-            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-            
-            # Alignment
-            ('ALIGN', (0, 0), (2, -1), 'LEFT'),
-            ('ALIGN', (3, 0), (4, -1), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            
-            # Padding
-            ('TOPPADDING', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+            repair = repair_costs.lookup(failure)
             
-            # Grid
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            
-            # Font
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ])
-        table.setStyle(style)
-        elements.append(table)
-        elements.append(Spacer(1, 30))
-
-        # Totals section with better formatting
-        total_style = getSampleStyleSheet()['Normal']
-        total_style.fontSize = 11
-        total_style.fontName = 'Helvetica-Bold'
-        total_style.alignment = 2  # Right align
-        
-        elements.append(Paragraph(f"<b>Total Estimated:</b> {total_hours:.1f} hours | <b>${total_cost:,.2f}</b>", total_style))
+            if repair is not None:
+                rows.append((component, result['status'], failure, repair.hours, repair.cost))
+    stage_latency.observe(time.perf_counter() - t0, "cost_lookup", "all", "single")
+    return tuple(rows)
 
-    else:
-        elements.append(Paragraph("No immediate service recommendations.", styles['h3']))
 
-    doc.build(elements)
-    buffer.seek(0)
-    return buffer
+def generate_service_pdf(predictions: dict):
+    return io.BytesIO(pdf_service.render_sync(service_rows(predictions)))
 
 
 # -------------------------------------------------------
 # PDF GENERATION ENDPOINT
 # -------------------------------------------------------
 @app.post("/service-estimate")
-def generate_pdf_endpoint(payload: Payload):
+async def generate_pdf_endpoint(payload: Payload, request: Request):
     try:
+        observe_payload_parsing(request)
         x = payload.data
         vehicle_id = x.get("id", "UnknownVehicle")
-        print(f"\n📄 Generating PDF for vehicle {vehicle_id}")
+        log.debug("📄 Generating PDF for vehicle %s", vehicle_id)
         
-        result = {
-            "engine":  predict_subsystem("engine", x),
-            "brake":   predict_subsystem("brake", x),
-            "battery": predict_subsystem("battery", x)
-        }
-        
-        pdf_buffer = generate_service_pdf(result)
+        result, model_version, _ = await predict_vehicle(x, payload.vehicle_id)
+        rows = service_rows(result)
+        persist_predictions([payload.vehicle_id or vehicle_id], [result],
+                            build_batch_service_estimates([result], mode="single"), model_version,
+                            "service_estimate")
+        t0 = time.perf_counter()
+        pdf_bytes = await pdf_service.render(rows)
+        stage_latency.observe(time.perf_counter() - t0, "pdf_build", "all", "single")
         
-        print(f"✅ PDF generated successfully!")
-        return StreamingResponse(pdf_buffer, media_type="application/pdf", headers={
-            "Content-Disposition": "inline; filename=service_estimate.pdf"
+        log.debug("✅ PDF generated successfully!")
+        return StreamingResponse(io.BytesIO(pdf_bytes), media_type="application/pdf", headers={
+            "Content-Disposition": "inline; filename=service_estimate.pdf",
+            "X-Model-Version": model_version
         })
         
     except Exception as e:
-        print(f"❌ PDF generation error: {e}")
+        exceptions_total.inc("service_estimate_endpoint", "all")
+        log.error("❌ PDF generation error: %s", e)
         return {"error": str(e)}
 
 
+# -------------------------------------------------------
+# STREAMING INGESTION (WebSocket, emits only status / failure changes)
+# -------------------------------------------------------
+def _predict_stream_readings(readings: list):
+    vehicle_ids = [str(r.get("vehicle_id", r.get("id"))) for r in readings]
+    results, version, _, _ = predict_vehicle_deltas(vehicle_ids, readings)
+    return results, version
+
+
+stream_service = TelemetryStreamService(
+    _predict_stream_readings,
+    build_batch_service_estimates,
+    max_pending=int(os.getenv("STREAM_MAX_PENDING", "256")),
+    max_batch=int(os.getenv("STREAM_MAX_BATCH", "64")),
+    max_vehicles=int(os.getenv("STREAM_MAX_VEHICLES", "10000")),
+    send_timeout=float(os.getenv("STREAM_SEND_TIMEOUT", "10"))
+)
+
+
+@app.websocket("/predict/stream")
+async def predict_stream(websocket: WebSocket):
+    await stream_service.handle(websocket)
+
+
+# -------------------------------------------------------
+# WARM-UP (runs before uvicorn starts accepting requests)
+# -------------------------------------------------------
+# Scores WARMUP_ROWS rows spread around the defaults through every model
+# once, so page faults on memory-mapped node arrays and NumPy's first-call
+# setup are paid before the server is ready. Bundles are called directly:
+# nothing reaches the prediction cache or the serving metrics.
+WARMUP_ROWS = int(os.getenv("WARMUP_ROWS", "64"))
+
+
+def warm_up_models(models=None):
+    models = models or model_registry.current()
+    scale = np.linspace(0.5, 1.5, max(WARMUP_ROWS, 1))[:, None]
+    for sub, bundle in models.bundles.items():
+        X = feature_assembler.default_vectors[sub] * scale
+        X = with_trend_features(bundle, X)
+        if bundle.can_predict_rul:
+            if RUL_CASCADE_STAGES:
+                bundle.predict_rul_cascade(X, CRITICAL_RUL, RUL_THRESHOLD, RUL_CASCADE_STAGES, RUL_CASCADE_Z,
+                                           RUL_CASCADE_MIN_STD, return_trees=PREDICTION_UNCERTAINTY)
+            elif not PREDICTION_UNCERTAINTY or bundle.predict_rul_trees(X) is None:
+                bundle.predict_rul(X)
+        if bundle.can_classify:
+            if PREDICTION_UNCERTAINTY:
+                bundle.predict_failure_confidence(X)
+            else:
+                bundle.predict_failure(X)
+
+
+startup_profile.mark("app_setup")
+
+
+@app.on_event("startup")
+def warm_up():
+    if WARMUP_ROWS > 0:
+        try:
+            warm_up_models()
+        except Exception as e:
+            # A failed warm-up only means a slower first request
+            log.warning("⚠ Warm-up prediction failed: %s", e)
+    startup_profile.mark("warm_up")
+    try:
+        pdf_service.start()
+    except Exception as e:
+        # The pool is created again on the first /service-estimate
+        log.warning("⚠ PDF render pool failed to start: %s", e)
+    startup_profile.mark("pdf_pool")
+    startup_profile.set_ready()
+    report = startup_profile.report()
+    log.info("✅ Ready in %.0f ms (%s)", report["total_ms"],
+             ", ".join(f"{phase} {ms:.0f}" for phase, ms in report["phases_ms"].items()))
+
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    pdf_service.shutdown()
+    if micro_batcher is not None:
+        await micro_batcher.shutdown()
+    if persist_queue is not None:
+        # Drain what the endpoints buffered before the process exits
+        await run_in_threadpool(persist_queue.close)
+
+
 # -------------------------------------------------------
 # HEALTH CHECK ENDPOINT
 # -------------------------------------------------------
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "models_loaded": True}
\ No newline at end of file
+    models = model_registry.current()
+    degraded = [sub for sub, bundle in models.bundles.items() if bundle.degraded]
+    return {
+        "status": "degraded" if degraded else "ok",
+        "models_loaded": any(bundle.can_predict_rul for bundle in models.bundles.values()),
+        "degraded_subsystems": degraded,
+        "backend": models.backend,
+        "model_version": models.version,
+        "model_store": models.store_report,
+        "prediction_cache": prediction_cache.stats(),
+        "pdf_renderer": pdf_service.stats(),
+        "micro_batcher": micro_batcher.stats() if micro_batcher is not None else None,
+        "stream": stream_service.stats(),
+        "vehicle_state": vehicle_states.stats(),
+        "rul_cascade": cascade_stats(),
+        "persistence": persist_queue.stats() if persist_queue is not None else None,
+        "defaults": defaults_info,
+        "startup": startup_profile.report()
+    }
+
+
+@app.delete("/vehicles/{vehicle_id}/state")
+def forget_vehicle_state(vehicle_id: str):
+    """Drop a vehicle's last-known fields, e.g. after a sensor swap; its next payload starts from the defaults."""
+    return {"vehicle_id": vehicle_id, "forgotten": vehicle_states.forget(vehicle_id)}
+
+
+# -------------------------------------------------------
+# MODEL REGISTRY ENDPOINTS
+# -------------------------------------------------------
+@app.get("/models")
+def models_status():
+    return model_registry.status()
+
+
+@app.post("/models/reload", status_code=202)
+def reload_models():
+    """Load MODEL_DIR in the background and swap it in; in-flight requests finish on the old snapshot."""
+    if not model_registry.reload_async():
+        return JSONResponse(status_code=409, content={"status": "reload already in progress"})
+    return {"status": "reloading", "current_version": model_registry.current().version}
+
+
+# -------------------------------------------------------
+# PROMETHEUS METRICS ENDPOINT
+# -------------------------------------------------------
+@metrics.collector
+def _component_metrics():
+    """Counters the cache, PDF service, micro-batcher and registry already keep, read at scrape time."""
+    cache = prediction_cache.stats()
+    pdf = pdf_service.stats()
+    models = model_registry.current()
+    lines = sample_lines(
+        "geargenie_prediction_cache_events_total", "counter", "Prediction cache lookups and removals.",
+        [({"event": e}, cache[e]) for e in ("hits", "misses", "evictions", "expirations", "invalidations")]
+    )
+    lines += sample_lines("geargenie_prediction_cache_entries", "gauge", "Entries held by the prediction cache.",
+                          [({}, cache["size"])])
+    lines += sample_lines(
+        "geargenie_pdf_events_total", "counter", "Service PDF cache hits, misses and renders.",
+        [({"event": e}, pdf[e]) for e in ("hits", "misses", "renders")]
+    )
+    lines += sample_lines("geargenie_pdf_renders_in_flight", "gauge", "PDF renders currently running.",
+                          [({}, pdf["in_flight"])])
+    if micro_batcher is not None:
+        lines += histogram_lines("geargenie_micro_batch_queue_wait_ms", "Time /predict calls wait for a micro-batch.",
+                                 [({}, micro_batcher.queue_wait_ms)])
+        lines += histogram_lines("geargenie_micro_batch_size", "Payloads per dispatched micro-batch.",
+                                 [({}, micro_batcher.batch_size)])
+    stream = stream_service.stats()
+    lines += sample_lines(
+        "geargenie_stream_events_total", "counter", "Streaming ingestion connections, readings and replies.",
+        [({"event": e}, stream[e]) for e in ("connections", "readings", "emitted", "suppressed",
+                                             "slow_consumer_disconnects")]
+    )
+    lines += sample_lines("geargenie_stream_active_connections", "gauge", "Open /predict/stream sockets.",
+                          [({}, stream["active_connections"])])
+    state = vehicle_states.stats()
+    lines += sample_lines("geargenie_vehicle_state_entries", "gauge", "Vehicles held by the last-known-state store.",
+                          [({}, state["vehicles"])])
+    lines += sample_lines(
+        "geargenie_vehicle_state_subsystems_total", "counter", "Delta-payload subsystems reused vs rescored.",
+        [({"outcome": "reused"}, state["subsystems_reused"]), ({"outcome": "rescored"}, state["subsystems_rescored"])]
+    )
+    if persist_queue is not None:
+        persist = persist_queue.stats()
+        lines += sample_lines(
+            "geargenie_persist_documents_total", "counter", "Write-behind documents queued, written and dropped.",
+            [({"event": e}, persist[e]) for e in ("submitted", "written", "dropped_overflow",
+                                                  "dropped_after_retries")]
+        )
+        lines += sample_lines("geargenie_persist_buffered", "gauge", "Documents waiting for the next flush.",
+                              [({}, persist["buffered"])])
+        lines += histogram_lines("geargenie_persist_flush_ms", "Bulk write latency per collection flush.",
+                                 [({}, persist_queue.flush_ms)])
+    lines += sample_lines("geargenie_model_info", "gauge", "Model snapshot currently serving.",
+                          [({"version": models.version, "backend": models.backend}, 1)])
+    lines += sample_lines("geargenie_subsystem_degraded", "gauge", "1 if the subsystem is served in degraded mode.",
+                          [({"subsystem": sub}, int(b.degraded)) for sub, b in sorted(models.bundles.items())])
+    return lines
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,198 @@
+import bisect
+import threading
+import time
+
+
+# -------------------------------------------------------
+# LIGHTWEIGHT IN-PROCESS HISTOGRAMS
+# -------------------------------------------------------
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics: bucket counts are `<= le`)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return {
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], cumulative)),
+            "sum": total,
+            "count": count
+        }
+
+    def summary(self):
+        snap = self.snapshot()
+        return {
+            "count": snap["count"],
+            "mean": round(snap["sum"] / snap["count"], 4) if snap["count"] else 0.0,
+            "buckets": snap["buckets"]
+        }
+
+
+# -------------------------------------------------------
+# LABELED METRICS + PROMETHEUS TEXT EXPOSITION
+# -------------------------------------------------------
+STAGE_BUCKETS_S = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict, le=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in labels.items()]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def histogram_lines(name: str, help: str, children):
+    """children: iterable of (labels_dict, Histogram)."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+    for labels, histogram in children:
+        snap = histogram.snapshot()
+        for le, count in snap["buckets"].items():
+            lines.append(f"{name}_bucket{_labels(labels, le)} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {snap['sum']}")
+        lines.append(f"{name}_count{_labels(labels)} {snap['count']}")
+    return lines
+
+
+def sample_lines(name: str, kind: str, help: str, samples):
+    """samples: iterable of (labels_dict, value) for counters and gauges."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(labels)} {value}")
+    return lines
+
+
+class LabeledHistogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=STAGE_BUCKETS_S):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def observe(self, value: float, *labelvalues):
+        self.labels(*labelvalues).observe(value)
+
+    def render(self):
+        children = sorted(self._children.items())
+        return histogram_lines(self.name, self.help, [
+            (dict(zip(self.labelnames, values)), child) for values, child in children
+        ])
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues):
+        return self._values.get(labelvalues, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return sample_lines(self.name, "counter", self.help, [
+            (dict(zip(self.labelnames, values)), amount) for values, amount in items
+        ])
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=STAGE_BUCKETS_S):
+        metric = LabeledHistogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """Register fn() -> list of exposition lines, called at scrape time."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            lines.extend(fn())
+        return "\n".join(lines) + "\n"
+
+
+class RequestTimingMiddleware:
+    """Pure ASGI middleware: stamps scope["state"]["received_at"] and times every HTTP request.
+
+    Paths that are not app routes are folded into "other" to keep label cardinality bounded.
+    """
+
+    def __init__(self, app, histogram: LabeledHistogram):
+        self.app = app
+        self.histogram = histogram
+        self._paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        scope.setdefault("state", {})["received_at"] = start
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if self._paths is None and "app" in scope:
+                self._paths = {getattr(route, "path", None) for route in scope["app"].routes}
+            path = scope["path"] if self._paths and scope["path"] in self._paths else "other"
+            self.histogram.observe(time.perf_counter() - start, path, scope["method"], str(status[0]))
@@ -0,0 +1,114 @@
+import asyncio
+import contextlib
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from metrics import Histogram, LATENCY_BUCKETS_MS, BATCH_SIZE_BUCKETS
+
+
+# -------------------------------------------------------
+# ASYNCIO MICRO-BATCHER FOR CONCURRENT /predict CALLS
+# -------------------------------------------------------
+# Requests are queued on the event loop and handed to `predict_batch` (a
+# sync function taking a list of payloads) in groups. When nothing is
+# being scored a request is dispatched immediately, so a lone caller pays
+# no batching window; while batches are running, arrivals accumulate for up
+# to `window_ms` or `max_batch` items and go out together.
+
+class MicroBatcher:
+    def __init__(self, predict_batch, window_ms: float = 2.0, max_batch: int = 64, max_inflight: int = 2):
+        self.predict_batch = predict_batch
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.max_inflight = max(1, int(max_inflight))
+        self.queue_wait_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self._queue = None
+        self._slots = None
+        self._worker = None
+        self._collecting = []  # batch being assembled, not yet dispatched
+        self._inflight = 0
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_inflight)
+            self._worker = loop.create_task(self._collect())
+
+    async def submit(self, sample: dict):
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((sample, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        while True:
+            first = await self._queue.get()
+            batch = self._collecting = [first]
+            deadline = first[2] + self.window
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                if self._inflight == 0:
+                    break  # idle: don't make a lone request wait for company
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            await self._slots.acquire()
+            self._inflight += 1
+            self._collecting = []
+            asyncio.get_running_loop().create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: list):
+        try:
+            started = time.perf_counter()
+            for _, _, enqueued_at in batch:
+                self.queue_wait_ms.observe((started - enqueued_at) * 1000.0)
+            self.batch_size.observe(len(batch))
+
+            try:
+                results = await run_in_threadpool(self.predict_batch, [sample for sample, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._inflight -= 1
+            self._slots.release()
+
+    async def shutdown(self):
+        """Stop collecting and fail every request not yet dispatched, so none waits forever."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._worker
+        self._worker = None
+        pending, self._collecting = self._collecting, []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        error = RuntimeError("server is shutting down")
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self):
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_batch": self.max_batch,
+            "inflight_batches": self._inflight,
+            "queue_wait_ms": self.queue_wait_ms.summary(),
+            "batch_size": self.batch_size.summary()
+        }
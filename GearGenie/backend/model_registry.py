@@ -0,0 +1,336 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+
+from forest_engine import compile_forest
+from model_store import ModelStore
+from trend_features import TREND_STATS, parse_trend_name
+
+log = logging.getLogger("geargenie.models")
+
+
+# -------------------------------------------------------
+# VERSIONED, HOT-SWAPPABLE MODEL REGISTRY
+# -------------------------------------------------------
+# A ModelSnapshot holds one SubsystemBundle (regressor, classifier, label
+# encoder, feature list, version) per subsystem. Requests grab
+# `registry.current()` once and use that snapshot to the end, while
+# `reload_async()` builds the next snapshot on a background thread and
+# publishes it with a single reference assignment. A subsystem whose
+# artifacts are missing or unusable keeps the previous snapshot's bundle if
+# there is one, otherwise it is served in degraded mode.
+
+class SubsystemBundle:
+    def __init__(self, subsystem: str, features: list, version: str, regressor=None,
+                 classifier=None, label_encoder=None, problems=(), trend_features=(), explainer=None):
+        self.subsystem = subsystem
+        self.features = list(features)
+        self.version = version
+        self.regressor = regressor
+        self.classifier = classifier
+        self.label_encoder = label_encoder
+        self.problems = list(problems)
+        # "<sensor>__<stat>" columns the models expect after the base features
+        self.trend_features = list(trend_features)
+        self.trend_columns = [parse_trend_name(name) for name in self.trend_features]
+        self.trend_base_positions = [self.features.index(sensor) for sensor, _ in self.trend_columns]
+        self.trend_stat_positions = [TREND_STATS.index(stat) for _, stat in self.trend_columns]
+        # CompiledForest used for RUL explanations: the regressor itself on the compiled
+        # backend, a compiled copy of it on the sklearn one. Trend columns credit their sensor.
+        self.explainer = explainer
+        self.explain_sensors = np.array(list(range(len(self.features))) + self.trend_base_positions, dtype=np.intp)
+
+    @property
+    def can_predict_rul(self):
+        return self.regressor is not None
+
+    @property
+    def can_classify(self):
+        return self.classifier is not None
+
+    @property
+    def can_explain(self):
+        return self.explainer is not None
+
+    @property
+    def degraded(self):
+        return bool(self.problems)
+
+    def predict_rul(self, X):
+        return self.regressor.predict(X)
+
+    @property
+    def rul_trees(self):
+        """Trees in the RUL forest (a full evaluation's cost)."""
+        n = getattr(self.regressor, "n_trees", None)
+        return n if n is not None else len(getattr(self.regressor, "estimators_", ()))
+
+    @property
+    def supports_cascade(self):
+        return hasattr(self.regressor, "predict_cascade")
+
+    def predict_rul_cascade(self, X, low: float, high: float, stages, z: float, min_std: float = 0.0,
+                            return_trees: bool = False):
+        """(rul, trees evaluated per row[, per-tree outputs]); the full forest when the backend has no cascade."""
+        if self.supports_cascade:
+            return self.regressor.predict_cascade(X, low, high, stages, z, min_std, return_trees)
+        per_tree = self.predict_rul_trees(X) if return_trees else None
+        rul = self.regressor.predict(X) if per_tree is None else per_tree.sum(axis=1) / per_tree.shape[1]
+        evaluated = np.full(len(rul), self.rul_trees)
+        return (rul, evaluated, per_tree) if return_trees else (rul, evaluated)
+
+    def predict_rul_trees(self, X):
+        """(n_rows, n_trees) per-tree RUL from one compiled traversal, or None without a compiled forest.
+
+        On the sklearn backend this is the explainer, compiled once per snapshot; sklearn's
+        estimators are never walked one Python call per tree on the request path.
+        """
+        if hasattr(self.regressor, "predict_trees"):
+            return self.regressor.predict_trees(X)
+        if self.explainer is not None:
+            return self.explainer.predict_trees(X)
+        return None
+
+    def predict_failure(self, X):
+        if self.classifier is None:
+            raise RuntimeError(f"no failure classifier loaded for {self.subsystem}")
+        if hasattr(self.classifier, "predict_labels"):
+            return self.classifier.predict_labels(X)
+        return self.label_encoder.inverse_transform(self.classifier.predict(X))
+
+    def explain_rul(self, X):
+        """(per-tree RUL (rows, trees), per-sensor contributions (rows, len(features)), baseline) from one walk."""
+        if self.explainer is None:
+            raise RuntimeError(f"no RUL explainer loaded for {self.subsystem}")
+        leaves, contributions, bias = self.explainer.explain(X)
+        if contributions.shape[1] != len(self.features):
+            by_sensor = np.zeros((len(contributions), len(self.features)))
+            np.add.at(by_sensor, (slice(None), self.explain_sensors), contributions)
+            contributions = by_sensor
+        return self.explainer.value[leaves], contributions, bias
+
+    def predict_failure_confidence(self, X):
+        """(labels, confidence): confidence is the winning class's share of the forest's averaged tree votes."""
+        if self.classifier is None:
+            raise RuntimeError(f"no failure classifier loaded for {self.subsystem}")
+        proba = self.classifier.predict_proba(X)
+        winner = np.argmax(proba, axis=1)
+        if hasattr(self.classifier, "predict_labels"):
+            labels = self.classifier.class_names[winner]
+        else:
+            labels = self.label_encoder.inverse_transform(self.classifier.classes_[winner])
+        return labels, proba[np.arange(len(winner)), winner]
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "rul_model": self.can_predict_rul,
+            "classifier": self.can_classify,
+            "degraded": self.degraded,
+            "problems": self.problems,
+            "trend_features": len(self.trend_features),
+            "explanations": self.can_explain
+        }
+
+
+class ModelSnapshot:
+    def __init__(self, bundles: dict, backend: str, model_dir: str, store_report: dict = None):
+        self.bundles = bundles
+        self.backend = backend
+        self.model_dir = model_dir
+        self.store_report = store_report or {}
+        self.loaded_at = time.time()
+        self.version = hashlib.sha256(
+            "|".join(f"{sub}:{b.version}" for sub, b in sorted(bundles.items())).encode()
+        ).hexdigest()[:12]
+
+    def __getitem__(self, sub: str):
+        return self.bundles[sub]
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "backend": self.backend,
+            "model_dir": self.model_dir,
+            "loaded_at": self.loaded_at,
+            "subsystems": {sub: b.describe() for sub, b in self.bundles.items()}
+        }
+
+
+def _artifact_digest(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        else:
+            digest.update(b"<missing>")
+    return digest.hexdigest()[:12]
+
+
+def _feature_names(model):
+    names = getattr(model, "feature_names_in_", None)
+    if names is None:
+        names = getattr(model, "feature_names", None)
+    return [str(n) for n in names] if names is not None else None
+
+
+def _trend_extras(model_features: list, features: list):
+    """Trend columns appended after the base features, or None if model_features don't fit that shape."""
+    if model_features[:len(features)] != list(features):
+        return None
+    extras = model_features[len(features):]
+    for name in extras:
+        parsed = parse_trend_name(name)
+        if parsed is None or parsed[0] not in features:
+            return None
+    return extras
+
+
+def load_bundle(sub: str, features: list, model_dir: str, backend: str, store: ModelStore):
+    regressor_path = os.path.join(model_dir, f"rul_{sub}_regressor.pkl")
+    classifier_path = os.path.join(model_dir, f"classifier_{sub}_model.pkl")
+    encoder_path = os.path.join(model_dir, f"classifier_{sub}_le.pkl")
+    version = _artifact_digest([regressor_path, classifier_path, encoder_path])
+    problems = []
+    trends = {}
+
+    def load(kind, name, path, label_encoder=None):
+        try:
+            if backend == "compiled":
+                model = store.load_forest(name, label_encoder)
+            else:
+                model = joblib.load(path)
+        except Exception as e:
+            problems.append(f"{kind}: {e}")
+            return None
+        model_features = _feature_names(model)
+        extras = _trend_extras(model_features, features) if model_features is not None else []
+        if extras is None:
+            problems.append(f"{kind}: trained on {model_features}, expected {list(features)} (+ trend features)")
+            return None
+        trends[kind] = extras
+        return model
+
+    try:
+        label_encoder = joblib.load(encoder_path)
+    except Exception as e:
+        problems.append(f"label encoder: {e}")
+        label_encoder = None
+
+    regressor = load("rul model", f"rul_{sub}_regressor", regressor_path)
+    classifier = None
+    if label_encoder is not None:
+        classifier = load("classifier", f"classifier_{sub}_model", classifier_path, label_encoder)
+    else:
+        problems.append("classifier: skipped without a label encoder")
+
+    trend_features = trends.get("rul model", [])
+    if classifier is not None and trends.get("classifier") != trend_features:
+        problems.append("classifier: trend features differ from the rul model's")
+        classifier = None
+
+    explainer = None
+    if hasattr(regressor, "explain"):
+        explainer = regressor
+    elif regressor is not None:
+        try:
+            explainer = compile_forest(regressor)
+        except Exception as e:
+            log.warning("⚠ %s: RUL explanations unavailable (%s)", sub, e)
+
+    return SubsystemBundle(sub, features, version, regressor, classifier, label_encoder, problems, trend_features,
+                           explainer)
+
+
+class ModelRegistry:
+    def __init__(self, component_features: dict, model_dir: str, store_dir: str, backend: str,
+                 verify_store: bool = True):
+        self.component_features = component_features
+        self.model_dir = model_dir
+        self.store_dir = store_dir
+        self.backend = backend
+        self.verify_store = verify_store
+        self._current = None
+        self._swap_listeners = []
+        self._reload_lock = threading.Lock()
+        self._reload_thread = None
+        self.last_error = None
+        self.reloads = 0
+
+    def current(self) -> ModelSnapshot:
+        return self._current
+
+    def on_swap(self, callback):
+        """Register callback(old_snapshot, new_snapshot), run after every swap."""
+        self._swap_listeners.append(callback)
+
+    def build_snapshot(self, model_dir: str = None) -> ModelSnapshot:
+        model_dir = model_dir or self.model_dir
+        store = ModelStore(model_dir, self.store_dir, verify=self.verify_store)
+        previous = self._current
+        bundles = {}
+        for sub, features in self.component_features.items():
+            bundle = load_bundle(sub, features, model_dir, self.backend, store)
+            old = previous.bundles.get(sub) if previous is not None else None
+            if not bundle.can_predict_rul and old is not None and old.can_predict_rul:
+                log.warning("⚠ %s: new artifacts unusable (%s), keeping version %s",
+                            sub, "; ".join(bundle.problems), old.version)
+                bundle = old
+            bundles[sub] = bundle
+        return ModelSnapshot(bundles, self.backend, model_dir, store.report())
+
+    def load(self, model_dir: str = None) -> ModelSnapshot:
+        """Build a snapshot on the calling thread and swap it in."""
+        snapshot = self.build_snapshot(model_dir)
+        old, self._current = self._current, snapshot
+        if model_dir:
+            self.model_dir = model_dir
+        self.reloads += 1
+        for callback in self._swap_listeners:
+            callback(old, snapshot)
+        for sub, bundle in snapshot.bundles.items():
+            if bundle.degraded:
+                log.warning("⚠ %s running degraded: %s", sub, "; ".join(bundle.problems))
+        log.info("✅ Model snapshot %s live (%s backend)", snapshot.version, snapshot.backend)
+        return snapshot
+
+    def reload_async(self, model_dir: str = None):
+        """Start a background reload; returns False if one is already running."""
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                self.load(model_dir)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                log.error("❌ Model reload failed, still serving %s: %s",
+                          self._current.version if self._current else "nothing", e)
+            finally:
+                self._reload_lock.release()
+
+        self._reload_thread = threading.Thread(target=run, name="model-reload", daemon=True)
+        self._reload_thread.start()
+        return True
+
+    @property
+    def reloading(self):
+        return self._reload_lock.locked()
+
+    def status(self):
+        snapshot = self._current
+        return {
+            "current": snapshot.describe() if snapshot is not None else None,
+            "reloading": self.reloading,
+            "reloads": self.reloads,
+            "last_error": self.last_error
+        }
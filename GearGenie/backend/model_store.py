@@ -0,0 +1,169 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import joblib
+import numpy as np
+
+from forest_engine import ARRAY_FIELDS, CompiledForest, compile_forest
+
+log = logging.getLogger("geargenie.models")
+
+
+# -------------------------------------------------------
+# MEMORY-MAPPED COMPILED MODEL STORE
+# -------------------------------------------------------
+# `python model_store.py convert` turns each forest in saved_models/ into
+# flat .npy node arrays:
+#
+#   <store>/<model_name>/<version>/{roots,feature,...}.npy + manifest.json
+#   <store>/<model_name>/CURRENT            -> "<version>"
+#
+# Workers np.load(..., mmap_mode="r") the arrays, so every uvicorn worker
+# shares the same pages through the OS page cache instead of holding a
+# private unpickled copy. The version is derived from the source .pkl bytes,
+# every array carries a sha256 in the manifest, and a model whose entry is
+# missing, stale or corrupt falls back to joblib.load + in-memory compile.
+
+FORMAT_VERSION = 1
+
+
+def _sha256_file(path: str):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: str, text: str):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class ModelStore:
+    def __init__(self, model_dir: str, store_dir: str, verify: bool = True):
+        self.model_dir = model_dir
+        self.store_dir = store_dir
+        self.verify = verify
+        self.loaded = {}  # model name -> report entry
+
+    def _pkl_path(self, name: str):
+        return os.path.join(self.model_dir, f"{name}.pkl")
+
+    # ---------------- conversion ----------------
+    def convert(self, name: str, label_encoder_name: str = None):
+        """Compile `<name>.pkl` into the store and point CURRENT at it. Returns the version."""
+        source = self._pkl_path(name)
+        version = _sha256_file(source)[:16]
+        label_encoder = joblib.load(self._pkl_path(label_encoder_name)) if label_encoder_name else None
+        compiled = compile_forest(joblib.load(source), label_encoder)
+
+        model_root = os.path.join(self.store_dir, name)
+        version_dir = os.path.join(model_root, version)
+        os.makedirs(version_dir, exist_ok=True)
+
+        checksums = {}
+        for field, array in compiled.arrays().items():
+            path = os.path.join(version_dir, f"{field}.npy")
+            np.save(path, np.ascontiguousarray(array), allow_pickle=False)
+            checksums[field] = _sha256_file(path)
+
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "model_version": version,
+            "source": os.path.basename(source),
+            "label_encoder": label_encoder_name,
+            "metadata": compiled.metadata(),
+            "sha256": checksums,
+        }
+        _write_atomic(os.path.join(version_dir, "manifest.json"), json.dumps(manifest, indent=2))
+        _write_atomic(os.path.join(model_root, "CURRENT"), version)
+        return version
+
+    # ---------------- loading ----------------
+    def _open_mapped(self, name: str):
+        model_root = os.path.join(self.store_dir, name)
+        with open(os.path.join(model_root, "CURRENT")) as f:
+            version = f.read().strip()
+        version_dir = os.path.join(model_root, version)
+        with open(os.path.join(version_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported store format {manifest.get('format_version')}")
+        source = self._pkl_path(name)
+        if os.path.exists(source) and _sha256_file(source)[:16] != version:
+            raise ValueError(f"{os.path.basename(source)} changed since conversion")
+
+        arrays = {}
+        for field in ARRAY_FIELDS:
+            path = os.path.join(version_dir, f"{field}.npy")
+            if self.verify and _sha256_file(path) != manifest["sha256"][field]:
+                raise ValueError(f"checksum mismatch for {field}.npy")
+            arrays[field] = np.load(path, mmap_mode="r", allow_pickle=False)
+
+        meta = manifest["metadata"]
+        forest = CompiledForest(
+            arrays,
+            n_features=meta["n_features"],
+            max_depth=meta["max_depth"],
+            classes=meta["classes"],
+            class_names=meta["class_names"],
+            feature_names=meta.get("feature_names"),
+        )
+        return forest, version
+
+    def load_forest(self, name: str, label_encoder=None):
+        """Mapped CompiledForest for `name`, or joblib.load + compile if it isn't in the store."""
+        try:
+            forest, version = self._open_mapped(name)
+            self.loaded[name] = {"source": "mmap", "version": version, "mapped_bytes": forest.nbytes}
+            return forest
+        except FileNotFoundError:
+            reason = "not converted"
+        except Exception as e:
+            reason = str(e)
+
+        if reason != "not converted":
+            log.warning("⚠ %s: model store unavailable (%s), falling back to joblib.load", name, reason)
+        source = self._pkl_path(name)
+        forest = compile_forest(joblib.load(source), label_encoder)
+        self.loaded[name] = {
+            "source": "joblib",
+            "version": _sha256_file(source)[:16],
+            "mapped_bytes": 0,
+            "heap_bytes": forest.nbytes,
+        }
+        return forest
+
+    def report(self):
+        return dict(self.loaded)
+
+
+def convert_all(model_dir: str, store_dir: str, subsystems=("engine", "brake", "battery")):
+    store = ModelStore(model_dir, store_dir)
+    for sub in subsystems:
+        for name, le_name in ((f"rul_{sub}_regressor", None),
+                              (f"classifier_{sub}_model", f"classifier_{sub}_le")):
+            if not os.path.exists(store._pkl_path(name)):
+                print(f"⚠ Skipping {name}: {store._pkl_path(name)} not found")
+                continue
+            version = store.convert(name, le_name)
+            print(f"✅ {name} -> {os.path.join(store_dir, name, version)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the memory-mapped compiled model store")
+    parser.add_argument("command", choices=["convert"])
+    parser.add_argument("--model-dir", default=os.getenv("MODEL_DIR", "../../saved_models"))
+    parser.add_argument("--store-dir", default=os.getenv("MODEL_STORE_DIR", "../../saved_models/compiled"))
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        convert_all(args.model_dir, args.store_dir)
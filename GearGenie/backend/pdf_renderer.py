@@ -0,0 +1,273 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from types import SimpleNamespace
+
+
+# -------------------------------------------------------
+# STYLES (reportlab is imported on the first render in each process)
+# -------------------------------------------------------
+# Importing reportlab and building the stylesheet costs tens of milliseconds,
+# so only the process that renders pays it: the render workers (or the render
+# thread) when PdfRenderService.start() runs at startup, never the event loop.
+_layout = None
+_layout_lock = threading.Lock()
+
+
+def _reportlab():
+    """Lazily import reportlab and build the styles once per process."""
+    global _layout
+    if _layout is not None:
+        return _layout
+    with _layout_lock:
+        if _layout is None:
+            from reportlab.lib import colors
+            from reportlab.lib.pagesizes import letter
+            from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
+            styles = getSampleStyleSheet()
+            _layout = SimpleNamespace(
+                letter=letter, SimpleDocTemplate=SimpleDocTemplate, Table=Table, Paragraph=Paragraph,
+                Spacer=Spacer, STYLES=styles,
+                HEADER_STYLE=ParagraphStyle(
+                    "EstimateHeader", parent=styles['Normal'],
+                    textColor=colors.whitesmoke, fontName='Helvetica-Bold', fontSize=10
+                ),
+                BODY_STYLE=ParagraphStyle("EstimateBody", parent=styles['Normal'], fontSize=9),
+                TOTAL_STYLE=ParagraphStyle(
+                    "EstimateTotal", parent=styles['Normal'],
+                    fontSize=11, fontName='Helvetica-Bold', alignment=2  # Right align
+                ),
+                TABLE_STYLE=TableStyle([
+                    # Header styling
+                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+
+                    # Body styling
+                    ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#ecf0f1')),
+                    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+
+                    # Alignment
+                    ('ALIGN', (0, 0), (2, -1), 'LEFT'),
+                    ('ALIGN', (3, 0), (4, -1), 'RIGHT'),
+                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+
+                    # Padding
+                    ('TOPPADDING', (0, 0), (-1, -1), 10),
+                    ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+                    ('LEFTPADDING', (0, 0), (-1, -1), 8),
+                    ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+
+                    # Grid
+                    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+
+                    # Font
+                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                    ('FONTSIZE', (0, 0), (-1, 0), 10),
+                    ('FONTSIZE', (0, 1), (-1, -1), 9),
+                ])
+            )
+    return _layout
+
+
+TABLE_HEADER = ["Component", "Status", "Recommended Service", "Est. Hours", "Est. Cost (USD)"]
+
+
+# -------------------------------------------------------
+# RENDERING
+# -------------------------------------------------------
+def render_service_pdf(rows: tuple) -> bytes:
+    """Render the service estimate for (component, status, failure, hours, cost) rows.
+
+    Pure function of its argument so it can run in a worker process.
+    """
+    rl = _reportlab()
+    buffer = io.BytesIO()
+    doc = rl.SimpleDocTemplate(buffer, pagesize=rl.letter, rightMargin=40, leftMargin=40, topMargin=40, bottomMargin=40)
+    elements = []
+
+    # Title
+    elements.append(rl.Paragraph("Service Estimate", rl.STYLES['h1']))
+    elements.append(rl.Spacer(1, 12))
+
+    # Summary
+    elements.append(rl.Paragraph("Here is a summary of the recommended services for your vehicle based on the latest sensor data.", rl.STYLES['Normal']))
+    elements.append(rl.Spacer(1, 24))
+
+    if rows:
+        # Table Data - using Paragraph objects for text wrapping
+        data = [[rl.Paragraph(title, rl.HEADER_STYLE) for title in TABLE_HEADER]]
+        total_cost = 0
+        total_hours = 0
+        for component, status, failure, hours, cost in rows:
+            total_hours += hours
+            total_cost += cost
+            data.append([
+                rl.Paragraph(component.capitalize(), rl.BODY_STYLE),
+                rl.Paragraph(status, rl.BODY_STYLE),
+                rl.Paragraph(failure, rl.BODY_STYLE),
+                rl.Paragraph(f"{hours:.1f}", rl.BODY_STYLE),
+                rl.Paragraph(f"${cost:,.2f}", rl.BODY_STYLE)
+            ])
+
+        # Create Table with auto-adjusting row heights
+        table = rl.Table(data, colWidths=[80, 140, 160, 70, 90], repeatRows=1)
+        table.setStyle(rl.TABLE_STYLE)
+        elements.append(table)
+        elements.append(rl.Spacer(1, 30))
+
+        elements.append(rl.Paragraph(f"<b>Total Estimated:</b> {total_hours:.1f} hours | <b>${total_cost:,.2f}</b>", rl.TOTAL_STYLE))
+
+    else:
+        elements.append(rl.Paragraph("No immediate service recommendations.", rl.STYLES['h3']))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def _worker_ready():
+    return os.getpid()
+
+
+def default_workers() -> int:
+    """Render processes for this host: none on a single core, where they would compete with
+    the event loop for it (the thread path is used instead), otherwise at most cpu_count - 1."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return min(2, cpus - 1) if cpus > 1 else 0
+
+
+def _pool_context():
+    # Never fork the server: by the time the pool starts it runs the anyio pool,
+    # micro-batcher and persist-writer threads, and a child could inherit a held lock.
+    # The fork server preloads this module and reportlab, not the app module.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["pdf_renderer", "reportlab.platypus"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+# -------------------------------------------------------
+# RENDER CACHE + BOUNDED WORKER POOL
+# -------------------------------------------------------
+class PdfRenderService:
+    """Serves identical estimates from an LRU of PDF bytes and renders misses in a process pool.
+
+    At most `max_pending` renders are queued or running at once; concurrent
+    requests for the same rows share a single render.
+    """
+
+    def __init__(self, workers: int = None, cache_size: int = 256, max_pending: int = 8):
+        self.workers = default_workers() if workers is None else max(0, int(workers))
+        self.cache_size = max(0, int(cache_size))
+        self.max_pending = max(1, int(max_pending))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._executor = None
+        self._slots = None
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.workers:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context(),
+                                                     initializer=_reportlab)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf",
+                                                    initializer=_reportlab)
+        return self._executor
+
+    def start(self):
+        """Create the pool and start its workers now (server startup) instead of on the first render."""
+        executor = self._get_executor()
+        try:
+            for future in [executor.submit(_worker_ready) for _ in range(max(self.workers, 1))]:
+                future.result()
+        except BaseException:
+            self.shutdown()  # a broken pool is rebuilt on the next render
+            raise
+
+    def cached(self, rows: tuple):
+        with self._lock:
+            pdf = self._cache.get(rows)
+            if pdf is not None:
+                self._cache.move_to_end(rows)
+                self.hits += 1
+            return pdf
+
+    def _store(self, rows: tuple, pdf: bytes):
+        if not self.cache_size:
+            return
+        with self._lock:
+            self._cache[rows] = pdf
+            self._cache.move_to_end(rows)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def render_sync(self, rows: tuple) -> bytes:
+        pdf = self.cached(rows)
+        if pdf is None:
+            with self._lock:
+                self.misses += 1
+                self.renders += 1
+            pdf = render_service_pdf(rows)
+            self._store(rows, pdf)
+        return pdf
+
+    async def render(self, rows: tuple) -> bytes:
+        pdf = self.cached(rows)
+        if pdf is not None:
+            return pdf
+
+        pending = self._inflight.get(rows)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[rows] = future
+        with self._lock:
+            self.misses += 1
+        try:
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(self.max_pending)
+            async with self._slots:
+                pdf = await loop.run_in_executor(self._get_executor(), render_service_pdf, rows)
+            with self._lock:
+                self.renders += 1
+            self._store(rows, pdf)
+            future.set_result(pdf)
+            return pdf
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._inflight.pop(rows, None)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "cache_size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "renders": self.renders,
+                "in_flight": len(self._inflight)
+            }
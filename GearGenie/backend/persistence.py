@@ -0,0 +1,268 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from metrics import Histogram, LATENCY_BUCKETS_MS
+
+log = logging.getLogger("geargenie.persistence")
+
+
+# -------------------------------------------------------
+# WRITE-BEHIND PERSISTENCE (predictions + serviceEstimates)
+# -------------------------------------------------------
+# Request handlers call `submit()`, which only appends the document to an
+# in-memory buffer. A background thread writes the buffer to the sink in
+# bulk, once `max_batch` documents are waiting or `flush_interval_s` has
+# passed, so the database is never on the request path.
+#
+# Memory is bounded by `max_buffer`: when the buffer is full, the oldest
+# documents are dropped (and counted). A failed write is put back at the
+# front of the buffer and retried with exponential backoff. After
+# `max_retries` failed attempts a document is dropped. `close()` stops
+# accepting documents and drains what is left.
+#
+# Every document gets its `_id` when it is submitted. A retry after a
+# partial bulk write therefore doesn't insert the same document twice
+# (except in the JSONL sink, which only appends).
+#
+# Sinks (PERSIST_SINK):
+#   mongodb://...        MongoSink, pymongo insert_many into MONGO_DB
+#   sqlite:/path/to.db   SqliteSink, one table of JSON documents
+#   jsonl:/path/to/dir   JsonlSink, <dir>/<collection>.jsonl
+
+PREDICTIONS = "predictions"
+SERVICE_ESTIMATES = "serviceestimates"  # the booking API's ServiceEstimate model
+
+
+def new_id():
+    """24 hex chars, so MongoSink can store it as an ObjectId the booking API reads natively."""
+    return os.urandom(12).hex()
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class JsonlSink:
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, collection: str, documents: list):
+        lines = "".join(json.dumps(doc, default=_json_default) + "\n" for doc in documents)
+        with open(os.path.join(self.directory, f"{collection}.jsonl"), "a") as f:
+            f.write(lines)
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return f"jsonl:{self.directory}"
+
+
+class SqliteSink:
+    def __init__(self, path: str):
+        self.path = path
+        # Only the writer thread uses the connection after construction
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id TEXT PRIMARY KEY, collection TEXT NOT NULL, created_at TEXT, body TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_collection ON documents (collection, created_at)")
+        self._conn.commit()
+
+    def write(self, collection: str, documents: list):
+        rows = [
+            (doc["_id"], collection, _json_default(doc.get("createdAt")), json.dumps(doc, default=_json_default))
+            for doc in documents
+        ]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO documents (id, collection, created_at, body) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def close(self):
+        self._conn.close()
+
+    def describe(self):
+        return f"sqlite:{self.path}"
+
+
+class MongoSink:
+    def __init__(self, uri: str, database: str = "geargeniedb", timeout_ms: int = 5000):
+        # Optional dependency: only needed when persisting to MongoDB
+        from pymongo import MongoClient
+        from bson import ObjectId
+        from pymongo.errors import BulkWriteError
+
+        self._object_id = ObjectId
+        self._bulk_write_error = BulkWriteError
+        self._client = MongoClient(uri, serverSelectionTimeoutMS=timeout_ms)
+        self._db = self._client[database]
+        self.database = database
+
+    def write(self, collection: str, documents: list):
+        documents = [{**doc, "_id": self._object_id(doc["_id"])} for doc in documents]
+        try:
+            self._db[collection].insert_many(documents, ordered=False)
+        except self._bulk_write_error as e:
+            # Duplicate keys are documents an earlier, partly failed attempt already wrote
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])) \
+                    or e.details.get("writeConcernErrors"):
+                raise
+
+    def close(self):
+        self._client.close()
+
+    def describe(self):
+        return f"mongodb:{self.database}"
+
+
+def make_sink(spec: str, mongo_db: str = "geargeniedb"):
+    """Sink for a PERSIST_SINK value, or None when it is empty."""
+    if not spec:
+        return None
+    if spec.startswith(("mongodb://", "mongodb+srv://")):
+        return MongoSink(spec, mongo_db)
+    kind, sep, target = spec.partition(":")
+    if sep and kind == "sqlite":
+        return SqliteSink(target)
+    if sep and kind == "jsonl":
+        return JsonlSink(target)
+    raise ValueError(f"Unknown PERSIST_SINK '{spec}', expected mongodb://..., sqlite:<path> or jsonl:<dir>")
+
+
+class WriteBehindQueue:
+    def __init__(self, sink, max_batch: int = 500, flush_interval_s: float = 1.0, max_buffer: int = 10000,
+                 max_retries: int = 5, retry_backoff_s: float = 0.5, max_backoff_s: float = 30.0):
+        self.sink = sink
+        self.max_batch = max(1, int(max_batch))
+        self.flush_interval_s = max(0.0, float(flush_interval_s))
+        self.max_buffer = max(1, int(max_buffer))
+        self.max_retries = max(0, int(max_retries))
+        self.retry_backoff_s = float(retry_backoff_s)
+        self.max_backoff_s = float(max_backoff_s)
+        self.flush_ms = Histogram(LATENCY_BUCKETS_MS)
+        self._buffer = deque()  # (collection, document, failed attempts), oldest first
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._last_flush = time.monotonic()
+        self.counters = {"submitted": 0, "written": 0, "dropped_overflow": 0, "dropped_after_retries": 0,
+                         "flushes": 0, "failed_flushes": 0}
+        self.last_error = None
+
+    # ---------------- request path ----------------
+    def submit(self, collection: str, document: dict):
+        """Buffer one document; never blocks on the sink. Returns False once closed."""
+        document.setdefault("_id", new_id())
+        with self._cond:
+            if self._closed:
+                return False
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="persist-writer", daemon=True)
+                self._thread.start()
+            if len(self._buffer) >= self.max_buffer:
+                self._buffer.popleft()
+                self.counters["dropped_overflow"] += 1
+            self._buffer.append((collection, document, 0))
+            self.counters["submitted"] += 1
+            if len(self._buffer) >= self.max_batch:
+                self._cond.notify()
+        return True
+
+    # ---------------- writer thread ----------------
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    waited = time.monotonic() - self._last_flush
+                    if len(self._buffer) >= self.max_batch or self._closed:
+                        break
+                    if self._buffer and waited >= self.flush_interval_s:
+                        break
+                    self._cond.wait(self.flush_interval_s - waited if self._buffer else None)
+                if self._closed and not self._buffer:
+                    return
+                batch = [self._buffer.popleft() for _ in range(min(self.max_batch, len(self._buffer)))]
+                self._last_flush = time.monotonic()
+            failed = self._write(batch)
+            if failed:
+                self._requeue(failed)
+
+    def _write(self, batch: list):
+        """Write one batch grouped by collection; returns the entries that failed."""
+        groups = {}
+        for entry in batch:
+            groups.setdefault(entry[0], []).append(entry)
+        failed = []
+        for collection, entries in groups.items():
+            t0 = time.perf_counter()
+            try:
+                self.sink.write(collection, [doc for _, doc, _ in entries])
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                failed.extend(entries)
+                with self._cond:
+                    self.counters["failed_flushes"] += 1
+                log.warning("⚠ Persisting %d %s documents failed: %s", len(entries), collection, e)
+                continue
+            self.flush_ms.observe((time.perf_counter() - t0) * 1000.0)
+            with self._cond:
+                self.counters["written"] += len(entries)
+                self.counters["flushes"] += 1
+        return failed
+
+    def _requeue(self, failed: list):
+        retry = [(c, doc, attempts + 1) for c, doc, attempts in failed if attempts + 1 <= self.max_retries]
+        dropped = len(failed) - len(retry)
+        if dropped:
+            log.error("❌ Dropping %d documents after %d failed attempts", dropped, self.max_retries + 1)
+        attempts = max((a for _, _, a in retry), default=0)
+        with self._cond:
+            self.counters["dropped_after_retries"] += dropped
+            self._buffer.extendleft(reversed(retry))
+            while len(self._buffer) > self.max_buffer:
+                self._buffer.popleft()
+                self.counters["dropped_overflow"] += 1
+            if retry and not self._closed:
+                # Back off before the next attempt; close() wakes this up to drain immediately
+                self._cond.wait(min(self.retry_backoff_s * 2 ** (attempts - 1), self.max_backoff_s))
+
+    # ---------------- lifecycle ----------------
+    def close(self, timeout_s: float = 30.0):
+        """Stop accepting documents, drain the buffer (retries still bounded) and close the sink."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout_s)
+            if thread.is_alive():
+                log.error("❌ Persistence drain timed out with %d documents buffered", len(self._buffer))
+                return False
+        self.sink.close()
+        return True
+
+    def stats(self):
+        with self._cond:
+            return {
+                "sink": self.sink.describe(),
+                "buffered": len(self._buffer),
+                "max_buffer": self.max_buffer,
+                **self.counters,
+                "last_error": self.last_error,
+                "flush_ms": self.flush_ms.summary()
+            }
@@ -0,0 +1,97 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+# -------------------------------------------------------
+# LRU + TTL CACHE OF PER-SUBSYSTEM PREDICTIONS
+# -------------------------------------------------------
+# Keys are a hash of the assembled feature vector. Features listed in
+# `quantization` are snapped to a multiple of their step first, so small
+# sensor jitter between two OBD snapshots still lands on the same entry.
+
+class PredictionCache:
+    def __init__(self, component_features: dict, max_entries: int = 4096,
+                 ttl_seconds: float = 30.0, quantization: dict = None):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self.quantization = dict(quantization or {})
+        self._steps = {
+            sub: np.array([float(self.quantization.get(f, 0.0)) for f in features])
+            for sub, features in component_features.items()
+        }
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def key(self, sub: str, row, model_version: str = ""):
+        steps = self._steps[sub]
+        row = np.asarray(row, dtype=np.float64)
+        if len(row) > len(steps):
+            # trend columns appended by trend-aware models are matched exactly
+            steps = np.pad(steps, (0, len(row) - len(steps)))
+        if steps.any():
+            row = np.where(steps > 0, np.round(row / np.where(steps > 0, steps, 1.0)), row)
+        # + 0.0 folds -0.0 into 0.0 so both hash the same
+        digest = hashlib.blake2b((row + 0.0).tobytes(), digest_size=16).digest()
+        return sub, model_version, digest
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(value)
+
+    def put(self, key, value: dict):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the models were reloaded."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,97 @@
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger("geargenie.repair_costs")
+
+
+# -------------------------------------------------------
+# INDEXED, HOT-RELOADABLE REPAIR COST TABLE
+# -------------------------------------------------------
+# failure_repair_costs.csv is parsed into a dict of failure_category ->
+# RepairCost plus aligned arrays for vectorized lookups. When the file's
+# mtime changes the table is re-read and the whole snapshot is swapped in a
+# single assignment, so readers never see a half-loaded table. If the new
+# file cannot be parsed the previous snapshot stays live.
+
+RepairCost = namedtuple("RepairCost", ["hours", "cost"])
+
+
+class _Snapshot:
+    def __init__(self, df: pd.DataFrame, mtime: float):
+        # First row wins for duplicated categories, same as cost_row.iloc[0]
+        df = df.drop_duplicates("failure_category", keep="first")
+        self.mtime = mtime
+        self.categories = pd.Index(df["failure_category"].astype(str))
+        self.hours = df["repair_hours"].to_numpy(dtype=np.float64)
+        self.costs = df["repair_cost_usd"].to_numpy(dtype=np.float64)
+        self.records = {
+            category: RepairCost(float(h), float(c))
+            for category, h, c in zip(self.categories, self.hours, self.costs)
+        }
+
+
+class RepairCostIndex:
+    def __init__(self, path: str, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._snapshot = self._read()
+
+    def _read(self):
+        mtime = os.stat(self.path).st_mtime
+        return _Snapshot(pd.read_csv(self.path), mtime)
+
+    def refresh_if_changed(self, force: bool = False):
+        """Re-read the CSV if its mtime moved. Returns True when a new table was swapped in."""
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False  # another thread is already checking
+        try:
+            self._next_check = now + self.check_interval
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except FileNotFoundError:
+                return False
+            if not force and mtime == self._snapshot.mtime:
+                return False
+            try:
+                snapshot = self._read()
+            except Exception as e:
+                log.error("❌ Keeping previous repair cost table, reload failed: %s", e)
+                return False
+            self._snapshot = snapshot
+            self.reloads += 1
+            log.info("✅ Repair cost table reloaded (%d categories)", len(snapshot.records))
+            return True
+        finally:
+            self._lock.release()
+
+    def lookup(self, failure: str):
+        """RepairCost for one failure category, or None if it isn't priced."""
+        self.refresh_if_changed()
+        return self._snapshot.records.get(failure)
+
+    def lookup_many(self, failures):
+        """Vectorized lookup: (hours, costs, found) arrays aligned with `failures`."""
+        self.refresh_if_changed()
+        snapshot = self._snapshot
+        positions = snapshot.categories.get_indexer(pd.Index(failures, dtype=object))
+        found = positions >= 0
+        hours = np.full(len(positions), np.nan)
+        costs = np.full(len(positions), np.nan)
+        hours[found] = snapshot.hours[positions[found]]
+        costs[found] = snapshot.costs[positions[found]]
+        return hours, costs, found
+
+    def __len__(self):
+        return len(self._snapshot.records)
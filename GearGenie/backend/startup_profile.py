@@ -0,0 +1,31 @@
+import time
+
+
+# -------------------------------------------------------
+# STARTUP PROFILE (GET /health "startup", startup_report.py)
+# -------------------------------------------------------
+# main.py imports this module first and calls `mark(phase)` as each startup
+# step finishes. Each phase records the milliseconds since the previous mark,
+# so the phases add up to the time from main's first line to ready.
+
+class StartupProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = {}
+        self.ready = False
+
+    def mark(self, phase: str):
+        now = time.perf_counter()
+        self.phases[phase] = round((now - self._last) * 1000.0, 2)
+        self._last = now
+
+    def set_ready(self):
+        self.ready = True
+
+    def report(self):
+        return {
+            "ready": self.ready,
+            "phases_ms": dict(self.phases),
+            "total_ms": round((self._last - self.started) * 1000.0, 2)
+        }
@@ -0,0 +1,161 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+
+# -------------------------------------------------------
+# COLD-START PROFILE (import time + startup phases)
+# -------------------------------------------------------
+# Run from GearGenie/backend:
+#
+#   python startup_report.py --output startup.json
+#   python startup_report.py --baseline startup_baseline.json --threshold 0.2
+#
+# Each run starts a fresh interpreter with `-X importtime`, imports main,
+# runs its startup handler (the warm-up) and reports:
+#   wall_ms         process spawn -> ready, measured from outside
+#   phases_ms       main.startup_profile: imports, repair_costs, defaults,
+#                   models, app_setup, warm_up
+#   packages_ms     self import time summed per top-level package
+#   main_imports_ms cumulative import time of each module main imports
+# Timings are the median over --runs. With --baseline, a total that got
+# slower than the baseline by more than --threshold (a fraction) exits 1.
+
+CHILD = (
+    "import json, main; main.warm_up(); "
+    "print('STARTUP_REPORT ' + json.dumps({'profile': main.startup_profile.report(), "
+    "'defaults': main.defaults_info, 'model_version': main.model_registry.current().version}))"
+)
+COMPARED = ("wall_ms", "total_ms")
+
+
+def parse_importtime(stderr: str):
+    """(self µs per top-level package, cumulative µs per module main imports directly)."""
+    packages = defaultdict(int)
+    main_imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        module = name.strip()
+        packages[module.split(".")[0]] += int(self_us)
+        if depth == 1:
+            main_imports[module] = int(cumulative_us)
+    return packages, main_imports
+
+
+def run_once(env: dict):
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD],
+                          capture_output=True, text=True, env=env)
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+    lines = [l for l in proc.stdout.splitlines() if l.startswith("STARTUP_REPORT ")]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(f"startup failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}")
+    result = json.loads(lines[-1][len("STARTUP_REPORT "):])
+    packages, main_imports = parse_importtime(proc.stderr)
+    return wall_ms, result, packages, main_imports
+
+
+def _median_ms(values):
+    return round(statistics.median(values), 2)
+
+
+def _git_commit():
+    with contextlib.suppress(Exception):
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    return None
+
+
+def build_report(runs: int, top: int):
+    env = {**os.environ, "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING")}
+    walls, totals, phases = [], [], defaultdict(list)
+    packages, main_imports = defaultdict(list), defaultdict(list)
+    result = None
+    for _ in range(runs):
+        wall_ms, result, run_packages, run_imports = run_once(env)
+        walls.append(wall_ms)
+        totals.append(result["profile"]["total_ms"])
+        for phase, ms in result["profile"]["phases_ms"].items():
+            phases[phase].append(ms)
+        for name, us in run_packages.items():
+            packages[name].append(us / 1000.0)
+        for name, us in run_imports.items():
+            main_imports[name].append(us / 1000.0)
+
+    def ranked(samples):
+        medians = {name: _median_ms(values) for name, values in samples.items()}
+        return dict(sorted(medians.items(), key=lambda item: -item[1])[:top])
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": runs,
+            "model_version": result["model_version"],
+            "defaults": result["defaults"]
+        },
+        "wall_ms": _median_ms(walls),
+        "total_ms": _median_ms(totals),
+        "phases_ms": {phase: _median_ms(values) for phase, values in phases.items()},
+        "packages_ms": ranked(packages),
+        "main_imports_ms": ranked(main_imports)
+    }
+
+
+def print_report(report: dict):
+    print(f"Ready after {report['wall_ms']:.0f} ms wall ({report['total_ms']:.0f} ms inside main.py), "
+          f"median of {report['meta']['runs']} runs")
+    for title, key in (("Startup phases", "phases_ms"), ("Import time by package (self)", "packages_ms"),
+                       ("Imports made by main.py (cumulative)", "main_imports_ms")):
+        print(f"\n{title}:")
+        for name, ms in report[key].items():
+            print(f"  {name:<40} {ms:>9.1f} ms")
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Profile the ML engine's cold start")
+    parser.add_argument("--output", default="startup_report.json", help="JSON report path")
+    parser.add_argument("--baseline", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed relative regression before failing (default 0.2 = 20%%)")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="rows per import table")
+    args = parser.parse_args(argv)
+
+    report = build_report(max(1, args.runs), args.top)
+    print_report(report)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✅ Wrote {args.output}", file=sys.stderr)
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = [(metric, baseline[metric], report[metric]) for metric in COMPARED
+                   if baseline.get(metric) and report[metric] > baseline[metric] * (1 + args.threshold)]
+    if regressions:
+        print(f"❌ Cold start slower than {args.baseline} by more than {args.threshold:.0%}:", file=sys.stderr)
+        for metric, old, new in regressions:
+            print(f"   {metric}: {old} -> {new} ({new / old - 1:+.1%})", file=sys.stderr)
+        return 1
+    print(f"✅ Cold start within {args.threshold:.0%} of {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
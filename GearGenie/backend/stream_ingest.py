@@ -0,0 +1,200 @@
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocketDisconnect
+
+from metrics import Histogram, BATCH_SIZE_BUCKETS
+
+
+# -------------------------------------------------------
+# STREAMING TELEMETRY INGESTION (WebSocket /predict/stream)
+# -------------------------------------------------------
+# A dongle keeps one socket open and pushes readings as JSON text frames,
+# either one object or an array of objects, each carrying `vehicle_id`:
+#
+#   -> {"vehicle_id": "V1", "engine_temp_c": 104.2, ...}
+#   <- {"type": "prediction", "vehicle_id": "V1", "seq": 0, "changed": ["engine", ...], ...}
+#
+# Per connection, readings pass through a bounded queue to a scorer that
+# drains whatever is waiting (up to `max_batch`) and scores it in one
+# batched pass. A prediction is sent back only when a subsystem's status or
+# failure class differs from the last one sent for that vehicle.
+#
+# Backpressure: when the queue is full the reader stops pulling frames, so
+# the socket's receive buffer fills and the client's sends block. Replies
+# are sent one at a time; a consumer that doesn't accept one within
+# `send_timeout` seconds is disconnected (1013) rather than buffered for.
+
+SEND_TIMEOUT_CLOSE_CODE = 1013
+_DONE = object()
+
+
+def _signature(result: dict):
+    return {sub: (p["status"], p["predicted_failure"]) for sub, p in result.items()}
+
+
+class StreamSession:
+    """One client connection: parse, queue, score in batches, emit changes."""
+
+    def __init__(self, service, websocket):
+        self.service = service
+        self.websocket = websocket
+        self.queue = asyncio.Queue(service.max_pending)
+        self.last_sent = OrderedDict()  # vehicle_id -> {sub: (status, failure)}
+        self.seq = 0
+        self.disconnected = False
+
+    async def run(self):
+        await self.websocket.accept()
+        reader = asyncio.create_task(self._read())
+        try:
+            await self._score()
+        finally:
+            reader.cancel()
+
+    async def _read(self):
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                text = message.get("text")
+                if text is None:
+                    text = (message.get("bytes") or b"").decode("utf-8", errors="replace")
+                try:
+                    payload = json.loads(text)
+                except ValueError as e:
+                    await self.queue.put(("error", None, f"invalid JSON: {e}"))
+                    continue
+                for reading in (payload if isinstance(payload, list) else [payload]):
+                    seq, self.seq = self.seq, self.seq + 1
+                    vehicle_id = reading.get("vehicle_id", reading.get("id")) if isinstance(reading, dict) else None
+                    if vehicle_id is None:
+                        await self.queue.put(("error", seq, "each reading needs a vehicle_id"))
+                    else:
+                        await self.queue.put(("reading", seq, reading))
+        finally:
+            # Also reached when receive() raises (abrupt drop, protocol error) or the
+            # reader is cancelled. The scorer must always wake up and stop, and this
+            # must not block: a full queue means the scorer still has items to take.
+            self.disconnected = True
+            try:
+                self.queue.put_nowait(_DONE)
+            except asyncio.QueueFull:
+                pass
+
+    async def _score(self):
+        while True:
+            items = [await self.queue.get()]
+            if self.disconnected:
+                return  # nobody left to answer; drop what was still queued
+            while len(items) < self.service.max_batch and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+            done = items[-1] is _DONE
+            if done:
+                items.pop()
+
+            readings = [(seq, reading) for kind, seq, reading in items if kind == "reading"]
+            errors = [{"type": "error", "seq": seq, "error": message}
+                      for kind, seq, message in items if kind == "error"]
+            events = errors + (await self._changes(readings) if readings else [])
+            for event in events:
+                if not await self._send(event):
+                    return
+            if done:
+                return
+
+    async def _changes(self, readings: list):
+        service = self.service
+        service.batch_size.observe(len(readings))
+        results, version = await run_in_threadpool(service.predict_batch, [r for _, r in readings])
+        service.count("readings", len(readings))
+
+        events, changed_results = [], []
+        for (seq, reading), result in zip(readings, results):
+            vehicle_id = str(reading.get("vehicle_id", reading.get("id")))
+            signature = _signature(result)
+            previous = self.last_sent.get(vehicle_id)
+            self.last_sent[vehicle_id] = signature
+            self.last_sent.move_to_end(vehicle_id)
+            while len(self.last_sent) > service.max_vehicles:
+                self.last_sent.popitem(last=False)
+            changed = [sub for sub in signature if previous is None or previous.get(sub) != signature[sub]]
+            if not changed:
+                continue
+            events.append({
+                "type": "prediction",
+                "vehicle_id": vehicle_id,
+                "seq": seq,
+                "changed": changed,
+                "predictions": result,
+                "modelVersion": version
+            })
+            changed_results.append(result)
+
+        if changed_results and service.build_estimates is not None:
+            for event, estimate in zip(events, service.build_estimates(changed_results)):
+                event["serviceEstimate"] = estimate
+        service.count("emitted", len(events))
+        service.count("suppressed", len(readings) - len(events))
+        return events
+
+    async def _send(self, event: dict):
+        try:
+            await asyncio.wait_for(self.websocket.send_text(json.dumps(event)), self.service.send_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.service.count("slow_consumer_disconnects")
+            try:
+                await self.websocket.close(code=SEND_TIMEOUT_CLOSE_CODE, reason="consumer too slow")
+            except Exception:
+                pass
+            return False
+        except (WebSocketDisconnect, RuntimeError, OSError):
+            return False
+
+
+class TelemetryStreamService:
+    """Shared settings and counters for every /predict/stream connection.
+
+    `predict_batch(samples)` -> (results, model_version) runs on a worker thread;
+    `build_estimates(results)` -> list of serviceEstimate dicts (or None).
+    """
+
+    def __init__(self, predict_batch, build_estimates=None, max_pending: int = 256, max_batch: int = 64,
+                 max_vehicles: int = 10000, send_timeout: float = 10.0):
+        self.predict_batch = predict_batch
+        self.build_estimates = build_estimates
+        self.max_pending = max(1, int(max_pending))
+        self.max_batch = max(1, int(max_batch))
+        self.max_vehicles = max(1, int(max_vehicles))
+        self.send_timeout = float(send_timeout)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self._lock = threading.Lock()
+        self.counters = {"connections": 0, "readings": 0, "emitted": 0, "suppressed": 0,
+                         "slow_consumer_disconnects": 0}
+        self.active = 0
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    async def handle(self, websocket):
+        self.count("connections")
+        self.active += 1
+        try:
+            await StreamSession(self, websocket).run()
+        finally:
+            self.active -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active_connections": self.active,
+                "max_pending": self.max_pending,
+                **self.counters,
+                "batch_size": self.batch_size.summary()
+            }
@@ -0,0 +1,133 @@
+import numpy as np
+
+
+# -------------------------------------------------------
+# ROLLING-WINDOW TREND FEATURES (shared by serving and training)
+# -------------------------------------------------------
+# A RollingWindow keeps the last `size` readings of n sensors in a NumPy
+# ring buffer and updates, per reading:
+#   mean, slope  running sum / index-weighted sum, adjusted for the evicted row
+#   ewma         e = alpha * x + (1 - alpha) * e, seeded with the first reading
+#   min, max     np.minimum / np.maximum; a column is rescanned only when the
+#                evicted value was its extreme
+# Slope is the least-squares slope per reading (not per second) over the
+# window. Trend features are named "<sensor>__<stat>". ML/training_RUL.py
+# builds its training columns with trend_matrix(), which pushes every
+# vehicle's readings through this same class, so offline and online values
+# are identical.
+
+TREND_STATS = ("mean", "min", "max", "slope", "ewma")
+SEPARATOR = "__"
+_REBASE_EVERY = 1 << 16  # pushes between exact recomputes of the running sums
+
+
+def trend_name(sensor: str, stat: str):
+    return f"{sensor}{SEPARATOR}{stat}"
+
+
+def parse_trend_name(name: str):
+    """'engine_temp_c__mean' -> ('engine_temp_c', 'mean'); None if not a trend feature."""
+    sensor, sep, stat = name.rpartition(SEPARATOR)
+    if not sep or stat not in TREND_STATS:
+        return None
+    return sensor, stat
+
+
+def trend_names(sensors):
+    return [trend_name(s, stat) for s in sensors for stat in TREND_STATS]
+
+
+class RollingWindow:
+    __slots__ = ("size", "alpha", "buffer", "count", "pushes", "sum", "tsum", "ewma", "min", "max")
+
+    def __init__(self, n_sensors: int, size: int = 16, alpha: float = 0.3):
+        self.size = max(1, int(size))
+        self.alpha = float(alpha)
+        self.buffer = np.zeros((self.size, n_sensors), dtype=np.float64)
+        self.count = 0
+        self.pushes = 0  # index of the next reading
+        self.sum = np.zeros(n_sensors)
+        self.tsum = np.zeros(n_sensors)
+        self.ewma = None
+        self.min = None
+        self.max = None
+
+    def push(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        slot = self.pushes % self.size
+        old = None
+        if self.count == self.size:
+            old = self.buffer[slot].copy()
+            self.sum -= old
+            self.tsum -= (self.pushes - self.size) * old
+        else:
+            self.count += 1
+        self.buffer[slot] = x
+        self.sum += x
+        self.tsum += self.pushes * x
+        self.pushes += 1
+
+        if self.ewma is None:
+            self.ewma, self.min, self.max = x.copy(), x.copy(), x.copy()
+        else:
+            self.ewma = self.alpha * x + (1.0 - self.alpha) * self.ewma
+            np.minimum(self.min, x, out=self.min)
+            np.maximum(self.max, x, out=self.max)
+            if old is not None:
+                stale = old <= self.min
+                if stale.any():
+                    self.min[stale] = self.buffer[:, stale].min(axis=0)
+                stale = old >= self.max
+                if stale.any():
+                    self.max[stale] = self.buffer[:, stale].max(axis=0)
+
+        if self.pushes >= _REBASE_EVERY:
+            self._rebase()
+
+    def _rebase(self):
+        """Shift reading indices back to near zero and recompute the sums exactly."""
+        shift = (self.pushes - self.count) // self.size * self.size
+        self.pushes -= shift
+        t = np.arange(self.pushes - self.count, self.pushes)
+        rows = self.buffer[t % self.size]
+        self.sum = rows.sum(axis=0)
+        self.tsum = (t[:, None] * rows).sum(axis=0)
+
+    def stats(self):
+        """(len(TREND_STATS), n_sensors) array, rows in TREND_STATS order."""
+        n = self.count
+        if n == 0:
+            raise ValueError("no readings pushed")
+        mean = self.sum / n
+        if n > 1:
+            t0 = self.pushes - n
+            s_t = n * t0 + n * (n - 1) / 2.0
+            s_tt = n * t0 * t0 + t0 * n * (n - 1) + (n - 1) * n * (2 * n - 1) / 6.0
+            slope = (n * self.tsum - s_t * self.sum) / (n * s_tt - s_t * s_t)
+        else:
+            slope = np.zeros_like(mean)
+        return np.vstack([mean, self.min, self.max, slope, self.ewma])
+
+
+def single_reading_stats(X):
+    """Trend stats of a vehicle with no history: (rows, stats, sensors) from (rows, sensors)."""
+    X = np.asarray(X, dtype=np.float64)
+    return np.stack([X, X, X, np.zeros_like(X), X], axis=1)
+
+
+def trend_matrix(values, vehicle_ids, size: int = 16, alpha: float = 0.3):
+    """Offline twin of serving: stats after each reading, per vehicle, rows already in reading order.
+
+    values: (rows, sensors) with no NaNs; returns (rows, sensors * len(TREND_STATS)) laid out
+    as trend_names(sensors).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty((len(values), values.shape[1] * len(TREND_STATS)))
+    windows = {}
+    for i, (vid, row) in enumerate(zip(vehicle_ids, values)):
+        window = windows.get(vid)
+        if window is None:
+            window = windows[vid] = RollingWindow(values.shape[1], size, alpha)
+        window.push(row)
+        out[i] = window.stats().T.ravel()
+    return out
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+
+from trend_features import RollingWindow
+
+
+# -------------------------------------------------------
+# PER-VEHICLE LAST-KNOWN STATE (delta payloads)
+# -------------------------------------------------------
+# Clients that identify a vehicle may send only the sensors that changed.
+# `merge()` lays those fields over the vehicle's last-known values (fields
+# never seen fall back to the baseline defaults as before) and returns one
+# signature per subsystem: the tuple of that subsystem's merged inputs. If a
+# signature equals the one the stored prediction was made from, under the
+# same model version, the stored prediction is reused instead of rescoring.
+#
+# Bounded by `max_vehicles` (least recently used evicted first) and
+# `ttl_seconds` since a vehicle was last seen. With `trend_window` > 0 each
+# vehicle also keeps a RollingWindow over `trend_sensors` (trend_features.py).
+
+class _VehicleState:
+    __slots__ = ("fields", "predictions", "seen_at", "trend")
+
+    def __init__(self):
+        self.fields = {}
+        self.predictions = {}  # sub -> (signature, model_version, prediction)
+        self.seen_at = 0.0
+        self.trend = None
+
+
+class VehicleStateStore:
+    def __init__(self, component_features: dict, max_vehicles: int = 10000, ttl_seconds: float = 3600.0,
+                 trend_sensors=(), trend_window: int = 0, trend_alpha: float = 0.3):
+        self.features = {sub: tuple(features) for sub, features in component_features.items()}
+        self.known_fields = frozenset(f for features in self.features.values() for f in features)
+        self.trend_sensors = tuple(trend_sensors)
+        self.trend_window = max(0, int(trend_window))
+        self.trend_alpha = float(trend_alpha)
+        self.max_vehicles = max(0, int(max_vehicles))
+        self.ttl_seconds = float(ttl_seconds)
+        self._vehicles = OrderedDict()
+        self._lock = threading.Lock()
+        self.merges = 0
+        self.reused = 0
+        self.rescored = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_vehicles > 0
+
+    def _get(self, vehicle_id, now: float, create: bool):
+        state = self._vehicles.get(vehicle_id)
+        if state is not None and now - state.seen_at > self.ttl_seconds:
+            del self._vehicles[vehicle_id]
+            self.expirations += 1
+            state = None
+        if state is None and create:
+            state = self._vehicles[vehicle_id] = _VehicleState()
+            while len(self._vehicles) > self.max_vehicles:
+                self._vehicles.popitem(last=False)
+                self.evictions += 1
+        if state is not None:
+            self._vehicles.move_to_end(vehicle_id)
+        return state
+
+    def merge(self, vehicle_id, delta: dict):
+        """Apply a (partial) payload -> (merged sample, {sub: signature})."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._get(vehicle_id, now, create=True)
+            state.seen_at = now
+            for field, value in delta.items():
+                if value is not None and field in self.known_fields:
+                    state.fields[field] = value
+            sample = dict(state.fields)
+            self.merges += 1
+        signatures = {sub: tuple(sample.get(f) for f in features) for sub, features in self.features.items()}
+        return sample, signatures
+
+    def reusable(self, vehicle_id, sub: str, signature: tuple, model_version: str):
+        """The stored prediction for `sub` if it was made from the same inputs and model, else None."""
+        with self._lock:
+            state = self._vehicles.get(vehicle_id)
+            stored = state.predictions.get(sub) if state is not None else None
+            if stored is not None and stored[0] == signature and stored[1] == model_version:
+                self.reused += 1
+                return dict(stored[2])
+            self.rescored += 1
+            return None
+
+    def remember(self, vehicle_id, sub: str, signature: tuple, model_version: str, prediction: dict):
+        with self._lock:
+            state = self._vehicles.get(vehicle_id)
+            if state is not None:
+                state.predictions[sub] = (signature, model_version, dict(prediction))
+
+    @property
+    def trends_enabled(self):
+        return self.trend_window > 0 and bool(self.trend_sensors)
+
+    def push_trend(self, vehicle_id, vector):
+        """Add one reading (ordered like trend_sensors) -> RollingWindow.stats(), or None if untracked."""
+        if not self.trends_enabled:
+            return None
+        with self._lock:
+            state = self._vehicles.get(vehicle_id)
+            if state is None:
+                return None
+            if state.trend is None:
+                state.trend = RollingWindow(len(self.trend_sensors), self.trend_window, self.trend_alpha)
+            state.trend.push(vector)
+            return state.trend.stats()
+
+    def trend_stats(self, vehicle_id):
+        with self._lock:
+            state = self._vehicles.get(vehicle_id)
+            if state is None or state.trend is None or not state.trend.count:
+                return None
+            return state.trend.stats()
+
+    def forget(self, vehicle_id):
+        with self._lock:
+            return self._vehicles.pop(vehicle_id, None) is not None
+
+    def stats(self):
+        with self._lock:
+            scored = self.reused + self.rescored
+            return {
+                "vehicles": len(self._vehicles),
+                "max_vehicles": self.max_vehicles,
+                "ttl_seconds": self.ttl_seconds,
+                "trend_window": self.trend_window if self.trends_enabled else 0,
+                "merges": self.merges,
+                "subsystems_reused": self.reused,
+                "subsystems_rescored": self.rescored,
+                "reuse_rate": round(self.reused / scored, 4) if scored else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
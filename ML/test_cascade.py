@@ -0,0 +1,90 @@
+import pandas as pd
+import numpy as np
+import joblib
+import os
+import sys
+from sklearn.model_selection import train_test_split
+
+# The cascade lives in the ML engine's forest backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GearGenie', 'backend'))
+from forest_engine import compile_forest
+
+# --- 1. Setup and Configuration ---
+# Compares the ML engine's cascade RUL inference (RUL_CASCADE_TREES) with the
+# full forest on test_RUL.py's test split: how often the status the engine
+# would report changes, and how many trees each row costs.
+print("--- Cascade Inference Check ---")
+
+MODELS_DIR = os.getenv('MODELS_DIR', '../saved_models')
+DATA_PATH = os.getenv('DATA_PATH', '../GearGenie/backend/baseline/synthetic_hierarchical_data.csv')
+RUL_THRESHOLD = 30
+CRITICAL_RUL = 20
+STAGES = [(8,), (16,), (32,), (16, 48)]
+MIN_STDS = [0.0, 10.0, 20.0, 30.0]
+Z = float(os.getenv('RUL_CASCADE_Z', '3'))
+
+try:
+    df = pd.read_csv(DATA_PATH)
+    print(f"Successfully loaded data from '{DATA_PATH}'")
+except FileNotFoundError:
+    print(f"Error: Dataset not found at '{DATA_PATH}'.")
+    exit()
+
+base_features = ['odometer_reading', 'vehicle_speed_kph', 'ambient_temp_c', 'humidity_percent']
+engine_features = base_features + [
+    'engine_temp_c', 'engine_rpm', 'oil_pressure_psi', 'coolant_temp_c',
+    'fuel_level_percent', 'fuel_consumption_lph', 'engine_load_percent',
+    'throttle_pos_percent', 'air_flow_rate_gps', 'exhaust_gas_temp_c',
+    'vibration_level', 'engine_hours'
+]
+brake_features = base_features + [
+    'brake_fluid_level_psi', 'brake_pad_wear_mm', 'brake_temp_c',
+    'abs_fault_indicator', 'brake_pedal_pos_percent', 'wheel_speed_fl_kph',
+    'wheel_speed_fr_kph', 'wheel_speed_rl_kph', 'wheel_speed_rr_kph'
+]
+battery_features = base_features + [
+    'battery_voltage_v', 'battery_current_a', 'battery_temp_c',
+    'alternator_output_v', 'battery_charge_percent', 'battery_health_percent'
+]
+
+components = {
+    'Engine': engine_features,
+    'Brake': brake_features,
+    'Battery': battery_features
+}
+
+
+def status_band(rul):
+    """0 = critical, 1 = attention, 2 = healthy, as main.py decides from the rounded RUL."""
+    rul = np.round(np.maximum(rul, 0.0), 2)
+    return np.where(rul >= RUL_THRESHOLD, 2, np.where(rul <= CRITICAL_RUL, 0, 1))
+
+
+# --- 2. Same test split as test_RUL.py ---
+_, df_test = train_test_split(df, test_size=0.2, random_state=42)
+print(f"Test set contains {len(df_test)} samples. z = {Z}")
+
+# --- 3. Cascade vs. full forest ---
+for comp_name, features in components.items():
+    model_path = os.path.join(MODELS_DIR, f'rul_{comp_name.lower()}_regressor.pkl')
+    try:
+        forest = compile_forest(joblib.load(model_path))
+    except FileNotFoundError:
+        print(f"\nCould not find RUL model for {comp_name} at '{model_path}'. Skipping.")
+        continue
+
+    X_test = df_test[features].to_numpy(dtype=np.float64)
+    full = forest.predict(X_test)
+    full_band = status_band(full)
+    print(f"\n{comp_name}: {forest.n_trees} trees, "
+          f"{np.mean(full_band == 1):.1%} of rows inside the {CRITICAL_RUL}-{RUL_THRESHOLD} km band")
+    print(f"  {'stages':<10} {'min std':>8} {'avg trees':>10} {'early exit':>11} {'status diff':>14} {'max |dRUL|':>11}")
+    for stages in STAGES:
+        for min_std in MIN_STDS:
+            rul, trees = forest.predict_cascade(X_test, CRITICAL_RUL, RUL_THRESHOLD, stages, Z, min_std)
+            changed = status_band(rul) != full_band
+            print(f"  {','.join(map(str, stages)):<10} {min_std:>8.1f} {trees.mean():>10.1f} "
+                  f"{np.mean(trees < forest.n_trees):>11.1%} "
+                  f"{changed.sum():>6} ({changed.mean():.2%}) {np.abs(rul - full).max():>10.2f}")
+
+print("\n--- Cascade Check Complete ---")
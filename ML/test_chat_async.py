@@ -0,0 +1,74 @@
+import asyncio
+import os
+import sys
+
+# The async chatbot server, run against its deterministic offline LLM backend and no Mongo
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GearGenie', 'backend', 'chatbot'))
+os.environ.update({
+    'CHAT_LLM_BACKEND': 'fake',
+    'CHAT_FAKE_FIRST_TOKEN_DELAY': '1.0',   # every reply outlives the request timeout below
+    'CHAT_REQUEST_TIMEOUT': '0.3',
+    'CHAT_MAX_CONCURRENCY': '1',
+    'CHAT_QUEUE_TIMEOUT': '0.1',
+    'CHAT_CACHE_SIZE': '0',
+    'MONGO_URI': ''
+})
+import httpx
+import async_server
+
+# --- 1. Setup and Configuration ---
+# Checks async_server.py's overload and timeout handling: with one slot, a
+# second concurrent chat gets 503, a chat slower than CHAT_REQUEST_TIMEOUT
+# gets 504 (an `error` event when streaming), history is left untouched,
+# slots are always released, and failed chats still reach the latency stats.
+print("--- Async Chat Server Check ---")
+
+failures = []
+
+
+def check(name, ok):
+    print(f"{'✅' if ok else '❌'} {name}")
+    if not ok:
+        failures.append(name)
+
+
+async def main():
+    await async_server.startup()
+    transport = httpx.ASGITransport(app=async_server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://chatbot") as client:
+        # --- 2. Concurrency limit and request timeout ---
+        first, second = await asyncio.gather(
+            client.post("/chat", json={"message": "brake job cost", "session_id": "a"}),
+            client.post("/chat", json={"message": "brake job cost", "session_id": "b"}))
+        check("chat slower than the timeout gets 504", first.status_code == 504)
+        check("chat that can't get a slot gets 503 with Retry-After",
+              second.status_code == 503 and "retry-after" in second.headers)
+
+        # --- 3. Streaming timeout ---
+        response = await client.post("/chat/stream", json={"message": "hi", "session_id": "s"})
+        check("stream slower than the timeout ends with an error event",
+              response.status_code == 200 and "event: error" in response.text and "timed out" in response.text)
+        check("timed-out turns never enter the history",
+              not any(async_server.core.chat_histories.get(s) for s in ("a", "b", "s")))
+
+        # --- 4. Health report ---
+        health = (await client.get("/health")).json()
+        check("every slot was released", health["concurrency"]["active"] == 0)
+        check("rejected request was counted", health["concurrency"]["rejected"] == 1)
+        check("timed-out chat is in the latency stats",
+              health["chat"].get("timeouts") == 1 and health["chat"]["total_ms"]["samples"] == 1)
+        check("timed-out stream is in the latency stats",
+              health["streaming"].get("timeouts") == 1 and health["streaming"]["total_ms"]["samples"] == 1)
+
+        # --- 5. A reply that fits the timeout ---
+        async_server.llm.first_token_delay = 0.0
+        ok = await client.post("/chat", json={"message": "brake job cost", "session_id": "c"})
+        check("fast chat succeeds deterministically", ok.status_code == 200 and ok.json()["response"].startswith(
+            'Thanks for asking about "brake job cost"'))
+        check("completed turn is in the history", len(async_server.core.chat_histories["c"]) == 2)
+    await async_server.shutdown()
+
+
+asyncio.run(main())
+print(f"\n--- Async Chat Check Complete: {len(failures)} failure(s) ---")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,83 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# The reply cache lives in the chatbot server
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GearGenie', 'backend', 'chatbot'))
+os.environ.setdefault('CHAT_CACHE_SIZE', '512')
+import server
+from response_cache import ResponseCache
+
+# --- 1. Setup and Configuration ---
+# Checks that the chatbot's response cache (response_cache.py) only reuses a
+# reply when the model would have seen the same records, the same
+# conversation and the same question. Runs offline: no Mongo (every session
+# shares the "No matching vehicle records" context, the riskiest case) and a
+# stand-in LLM client that numbers its replies.
+print("--- Chat Response Cache Check ---")
+
+failures = []
+
+
+def check(name, ok):
+    print(f"{'✅' if ok else '❌'} {name}")
+    if not ok:
+        failures.append(name)
+
+
+calls = []
+
+
+def create(**kwargs):
+    calls.append(kwargs)
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"reply {len(calls)}"))])
+
+
+server.groq_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+server.retriever = None
+client = server.app.test_client()
+
+
+def ask(session_id, message):
+    body = client.post('/chat', json={'message': message, 'session_id': session_id}).get_json()
+    return body['response'], body['cached']
+
+# --- 2. Follow-up turns across two sessions ---
+server.response_cache.clear()
+a1, _ = ask('alice', 'how much does a new battery cost')
+b1, _ = ask('bob', 'my brakes are squealing')
+a2, a2_cached = ask('alice', 'what about the cost')
+b2, b2_cached = ask('bob', 'what about the cost')
+check("follow-up in a different conversation is not served from the cache", not b2_cached and b2 != a2)
+check("each follow-up reached the LLM", len(calls) == 4)
+
+# --- 3. Same opening question in fresh sessions ---
+c1, _ = ask('carol', 'How much does a new battery cost?')
+check("identical first question (after normalization) reuses the reply", c1 == a1 and len(calls) == 4)
+d1, d1_cached = ask('dave', 'how much does a new battery cost for a truck')
+check("a different question is not a hit by default", not d1_cached and d1 != a1)
+ask('erin', 'tell me more')
+_, f_cached = ask('frank', 'tell me more about it')
+check("'tell me more' and 'tell me more about it' are different keys by default", not f_cached)
+
+# --- 4. Opt-in similarity matching stays inside the scope ---
+cache = ResponseCache(similarity_threshold=0.95)
+scope_a = cache.scope("records", [{"role": "user", "content": "battery"}])
+scope_b = cache.scope("records", [{"role": "user", "content": "brakes"}])
+check("different history gives a different scope", scope_a != scope_b)
+cache.put("brake job cost", scope_a, "x")
+check("similar question in the same scope hits", cache.get("cost of a brake job?", scope_a) == "x")
+check("similar question in another scope misses", cache.get("cost of a brake job?", scope_b) is None)
+check("below-threshold question misses", cache.get("how much does a brake job cost for a truck", scope_a) is None)
+
+# --- 5. Size and TTL bounds ---
+cache = ResponseCache(max_entries=2, ttl=60.0)
+for i, message in enumerate(["one", "two", "three"]):
+    cache.put(message, "s", str(i))
+check("least recently used entry is evicted", cache.get("one", "s") is None and cache.get("three", "s") == "2")
+cache = ResponseCache(ttl=0.0)
+cache.put("one", "s", "1")
+check("expired entries miss", cache.get("one", "s") is None and cache.stats()["expirations"] == 1)
+
+print(f"\n--- Chat Cache Check Complete: {len(failures)} failure(s) ---")
+sys.exit(1 if failures else 0)
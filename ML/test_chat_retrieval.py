@@ -0,0 +1,107 @@
+import os
+import sys
+import threading
+import time
+
+# The chatbot's Mongo retriever, run against a small in-memory collection
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GearGenie', 'backend', 'chatbot'))
+from retrieval import VehicleRetriever
+
+# --- 1. Setup and Configuration ---
+# Checks retrieval.py's VehicleRetriever under concurrent searches, as the
+# Flask threads and async_server.py's Mongo thread pool call it: counters
+# add up exactly, and an expired vocabulary is rebuilt by one distinct()
+# pass while the other threads keep searching with the old one.
+print("--- Chat Retrieval Check ---")
+
+THREADS = 16
+SEARCHES_PER_THREAD = 200
+DOCS = [
+    {"_id": i, "vehicle_id": f"VH{i:04d}", "make": make, "model": model, "failure_category": category}
+    for i, (make, model, category) in enumerate([
+        ("Toyota", "Corolla", "Brake System"),
+        ("Honda", "Civic", "Engine"),
+        ("Ford", "F-150", "Transmission"),
+    ])
+]
+
+failures = []
+
+
+def check(name, ok):
+    print(f"{'✅' if ok else '❌'} {name}")
+    if not ok:
+        failures.append(name)
+
+
+class Cursor(list):
+    def limit(self, n):
+        return Cursor(self[:n])
+
+    def sort(self, spec):
+        return self
+
+
+class SlowCollection:
+    """Exact `$in` lookups only (no text index); distinct() takes a while, like a real scan."""
+
+    def __init__(self, docs, distinct_delay=0.05):
+        self.docs = docs
+        self.distinct_delay = distinct_delay
+        self.distinct_calls = 0
+        self._lock = threading.Lock()
+
+    def distinct(self, field):
+        with self._lock:
+            self.distinct_calls += 1
+        time.sleep(self.distinct_delay)
+        return sorted({d[field] for d in self.docs})
+
+    def find(self, query, projection=None):
+        if "$text" in query:
+            return Cursor()
+        clauses = query.get("$or", [query])
+        return Cursor(dict(d) for d in self.docs
+                      if any(d.get(f) in c["$in"] for c in clauses for f, c in c.items()))
+
+
+def hammer(retriever, message):
+    barrier = threading.Barrier(THREADS)
+
+    def worker():
+        barrier.wait()
+        for _ in range(SEARCHES_PER_THREAD):
+            retriever.search(message)
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+collection = SlowCollection(DOCS)
+retriever = VehicleRetriever(collection, vocabulary_ttl=3600.0, repair_categories=[])
+
+# --- 2. First vocabulary load ---
+hammer(retriever, "my toyota corolla brakes squeal")
+check("first load runs distinct() once per field", collection.distinct_calls == 3)
+
+# --- 3. Counters under concurrent searches ---
+stats = retriever.stats()
+total = THREADS * SEARCHES_PER_THREAD
+check("every search is counted", stats["searches"] == total)
+check("every exact query is counted", stats["exact_queries"] == total)
+check("every hit is counted", stats["hits"] == total)
+check("vocabulary covers make, model and category", stats["vocabulary"] == 9)
+
+# --- 4. Refresh after the TTL expires ---
+collection.distinct_calls = 0
+retriever.vocabulary_ttl = 0.2
+time.sleep(0.25)
+hammer(retriever, "honda civic engine light")
+check("expired vocabulary is rebuilt by a single distinct() pass", collection.distinct_calls == 3)
+check("searches during the refresh still find records", retriever.stats()["hits"] == 2 * total)
+
+print(f"\n--- Chat Retrieval Check Complete: {len(failures)} failure(s) ---")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,160 @@
+import os
+import shutil
+import sys
+import tempfile
+
+# The chatbot's offline vector index
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GearGenie', 'backend', 'chatbot'))
+from vector_index import REPAIR, VEHICLE, HashingEmbedder, VectorIndex, repair_documents, seed_for_watch, \
+    vehicle_document, watch_changes
+
+# --- 1. Setup and Configuration ---
+# Checks vector_index.py end to end without Mongo: incremental upsert /
+# remove, the save/load round trip (rows, payloads, IVF partitions and the
+# change-stream resume token), IVF top-k against brute force, that `watch`
+# saves what it applied when interrupted and resumes from there, and that a
+# new index is fully synced before its first `watch`.
+print("--- Vector Index Check ---")
+
+MAKES = ["Toyota", "Honda", "Ford", "BMW", "Tesla", "Hyundai"]
+CATEGORIES = ["Brake System", "Engine", "Transmission", "Battery", "Suspension", "Cooling"]
+workdir = tempfile.mkdtemp()
+path = os.path.join(workdir, "vector_index.npz")
+
+failures = []
+
+
+def check(name, ok):
+    print(f"{'✅' if ok else '❌'} {name}")
+    if not ok:
+        failures.append(name)
+
+
+def vehicle(i, **changes):
+    doc = {"_id": i, "vehicle_id": f"VH{i:04d}", "make": MAKES[i % len(MAKES)],
+           "model": f"Model {i % 17}", "failure_category": CATEGORIES[(i // 3) % len(CATEGORIES)]}
+    return {**doc, **changes}
+
+
+def ids(hits):
+    return [doc_id for _, doc_id, _ in hits]
+
+
+index = VectorIndex(HashingEmbedder(256))
+index.sync(repair_documents(), REPAIR)
+report = index.sync((vehicle_document(vehicle(i)) for i in range(300)), VEHICLE)
+
+# --- 2. Paraphrase search ---
+check("every vehicle was embedded", report == {"documents": 300, "embedded": 300, "removed": 0})
+check("paraphrase finds its repair category",
+      ids(index.search("my car won't start in the cold", k=1, kind=REPAIR)) == ["repair:CCA less than limit"])
+
+# --- 3. Incremental updates ---
+check("unchanged text is not re-embedded", index.upsert(*vehicle_document(vehicle(7))) is False)
+check("changed text is re-embedded", index.upsert(*vehicle_document(vehicle(7, failure_category="Turbocharger"))))
+check("updated record is found by its new text", ids(index.search("VH0007 Turbocharger", k=1)) == ["vehicle:7"])
+check("removed record disappears", index.remove("vehicle:8") and "vehicle:8" not in ids(index.search("VH0008", k=20)))
+check("freed row is reused", index.upsert(*vehicle_document(vehicle(1000))) and len(index) == 15 + 300)
+
+# --- 4. Save / load round trip ---
+index.resume_token = {"_data": "8264A1B2C3000000012B022C0100296E5A1004"}
+index.save(path)
+loaded = VectorIndex.load(path)
+query = "Honda Model 3 transmission slipping"
+check("loaded index has the same documents", sorted(loaded._rows) == sorted(index._rows))
+check("loaded index ranks like the original", ids(loaded.search(query, k=10)) == ids(index.search(query, k=10)))
+check("payloads survive the round trip",
+      loaded.search("VH0007", k=1)[0][2] == vehicle_document(vehicle(7, failure_category="Turbocharger"))[2])
+check("resume token survives the round trip", loaded.resume_token == index.resume_token)
+
+# --- 5. IVF partitions ---
+ivf = VectorIndex.load(path, ivf_min_rows=1)
+ivf.build_ivf(n_lists=8)
+recall = []
+for i in range(0, 300, 10):
+    q = f"{vehicle(i)['make']} {vehicle(i)['model']} {vehicle(i)['failure_category']}"
+    exact = set(ids(loaded.search(q, k=5)))
+    recall.append(len(exact & set(ids(ivf.search(q, k=5, n_probe=4)))) / len(exact))
+check(f"IVF top-5 matches brute force (recall {sum(recall) / len(recall):.2f})", sum(recall) / len(recall) >= 0.8)
+check("IVF probing every list is exact", ids(ivf.search(query, k=10, n_probe=8)) == ids(loaded.search(query, k=10)))
+ivf.upsert(*vehicle_document(vehicle(2000, failure_category="Timing Belt")))
+check("new row joins a partition", ids(ivf.search("VH2000 Timing Belt", k=1)) == ["vehicle:2000"])
+ivf.save(path)
+check("partitions survive the round trip",
+      VectorIndex.load(path, ivf_min_rows=1).search(query, k=10, n_probe=4) == ivf.search(query, k=10, n_probe=4))
+
+
+# --- 6. Change stream: save on interrupt, then resume ---
+class ChangeStream:
+    def __init__(self, events, interrupt, start_token):
+        self.events = events
+        self.interrupt = interrupt
+        self.resume_token = start_token  # like postBatchResumeToken, known before the first event
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        for token, event in self.events:
+            self.resume_token = token
+            yield event
+        if self.interrupt:
+            raise KeyboardInterrupt
+
+
+class WatchedCollection:
+    def __init__(self, events, interrupt=True, docs=(), start_token=None):
+        self.events = events
+        self.interrupt = interrupt
+        self.docs = list(docs)
+        self.start_token = start_token
+        self.resume_after = []
+
+    def watch(self, full_document=None, resume_after=None):
+        self.resume_after.append(resume_after)
+        return ChangeStream(self.events, self.interrupt, self.start_token)
+
+    def find(self, query, projection=None):
+        return [{k: v for k, v in doc.items() if k in projection or k == "_id"} for doc in self.docs]
+
+
+events = [
+    ({"_data": "01"}, {"operationType": "update", "documentKey": {"_id": 3},
+                       "fullDocument": vehicle(3, failure_category="Head Gasket")}),
+    ({"_data": "02"}, {"operationType": "delete", "documentKey": {"_id": 4}}),
+    ({"_data": "03"}, {"operationType": "insert", "documentKey": {"_id": 3000}, "fullDocument": vehicle(3000)})
+]
+watched = WatchedCollection(events)
+try:
+    watch_changes(VectorIndex.load(path), watched, path, save_every=100)
+    interrupted = False
+except KeyboardInterrupt:
+    interrupted = True
+saved = VectorIndex.load(path)
+check("interrupt still propagates", interrupted)
+check("changes before the interrupt were saved",
+      ids(saved.search("VH0003 Head Gasket", k=1)) == ["vehicle:3"]
+      and "vehicle:4" not in saved._rows and "vehicle:3000" in saved._rows)
+check("last applied resume token was saved", saved.resume_token == {"_data": "03"})
+
+resumed = WatchedCollection([], interrupt=False)
+watch_changes(VectorIndex.load(path), resumed, path)
+check("next watch resumes after the saved token", resumed.resume_after == [{"_data": "03"}])
+
+# --- 7. First watch on a new index ---
+fresh_path = os.path.join(workdir, "fresh.npz")
+source = WatchedCollection([], interrupt=False, docs=[vehicle(i) for i in range(40)], start_token={"_data": "10"})
+fresh = VectorIndex(HashingEmbedder(256))
+report = seed_for_watch(fresh, source, fresh_path)
+check("new index starts with every record", report[VEHICLE]["documents"] == 40
+      and len(VectorIndex.load(fresh_path)) == 40 + report[REPAIR]["documents"])
+check("token is taken before the scan", VectorIndex.load(fresh_path).resume_token == {"_data": "10"})
+watch_changes(VectorIndex.load(fresh_path), source, fresh_path)
+check("first watch replays from that token", source.resume_after == [None, {"_data": "10"}])
+shutil.rmtree(workdir)
+
+print(f"\n--- Vector Index Check Complete: {len(failures)} failure(s) ---")
+sys.exit(1 if failures else 0)
@@ -6,19 +6,31 @@ from imblearn.ensemble import BalancedRandomForestClassifier
 from sklearn.metrics import mean_squared_error, classification_report
 from sklearn.preprocessing import LabelEncoder
 import joblib
+import json
 import os
+import sys
+
+# Trend features are computed by the ML engine's own module so training and serving match
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'GearGenie', 'backend'))
+from trend_features import trend_matrix, trend_names
+from baseline_defaults import ARTIFACT_NAME, build_artifact, write_artifact
 
 # --- 1. Setup and Configuration ---
 print("--- Script Start: Hierarchical Predictive Maintenance with Model Tuning ---")
 
 os.makedirs('saved_models', exist_ok=True)
 
+DATA_PATH = '/Users/saahilp/Hackathon/GearGenie/backend/baseline/synthetic_hierarchical_data.csv'
 try:
-    df = pd.read_csv('/Users/saahilp/Hackathon/GearGenie/backend/baseline/synthetic_hierarchical_data.csv')
+    df = pd.read_csv(DATA_PATH)
 except FileNotFoundError:
     print("Error: synthetic_hierarchical_data.csv not found. Please run generate_synthetic_data.py first.")
     exit()
 
+# Missing-field defaults for the ML engine, so it doesn't parse this CSV at startup
+write_artifact(build_artifact(df, DATA_PATH), f'saved_models/{ARTIFACT_NAME}')
+print(f"Saved missing-field defaults to saved_models/{ARTIFACT_NAME}")
+
 base_features = ['odometer_reading', 'vehicle_speed_kph', 'ambient_temp_c', 'humidity_percent']
 engine_features = base_features + [
     'engine_temp_c', 'engine_rpm', 'oil_pressure_psi', 'coolant_temp_c',
@@ -42,6 +54,32 @@ components = {
     'Battery': {'features': battery_features, 'rul_col': 'RUL_Battery'}
 }
 
+# --- Optional rolling-window trend features (TREND_FEATURES=1) ---
+# Each vehicle's readings are replayed in timestamp order through the same
+# RollingWindow the ML engine keeps per vehicle. Gaps are filled the way
+# serving fills them: the vehicle's last reading, then the dataset median.
+USE_TREND_FEATURES = os.getenv('TREND_FEATURES', '0') == '1'
+TREND_WINDOW = int(os.getenv('TREND_WINDOW', '16'))
+TREND_ALPHA = float(os.getenv('TREND_ALPHA', '0.3'))
+
+if USE_TREND_FEATURES:
+    print(f"\nAdding trend features (window={TREND_WINDOW}, alpha={TREND_ALPHA})")
+    df = df.sort_values(['vehicle_id', 'timestamp'], kind='stable').reset_index(drop=True)
+    trend_sensors = list(dict.fromkeys(engine_features + brake_features + battery_features))
+    filled = df.groupby('vehicle_id')[trend_sensors].ffill().fillna(df[trend_sensors].median())
+    trends = pd.DataFrame(
+        trend_matrix(filled.values, df['vehicle_id'].values, TREND_WINDOW, TREND_ALPHA),
+        columns=trend_names(trend_sensors), index=df.index
+    )
+    df = pd.concat([df, trends], axis=1)
+    for details in components.values():
+        details['features'] = details['features'] + trend_names(details['features'])
+    with open('saved_models/trend_features.json', 'w') as f:
+        json.dump({'window': TREND_WINDOW, 'alpha': TREND_ALPHA}, f)
+elif os.path.exists('saved_models/trend_features.json'):
+    # Left by an earlier trend run: these models have no trend columns
+    os.remove('saved_models/trend_features.json')
+
 # Define parameter grid for hyperparameter tuning
 # A smaller grid for faster demonstration
 param_grid_reg = {